@@ -0,0 +1,367 @@
+"""
+Measure how the dashboard server scales with the number of open dashboards.
+
+The server is started in a subprocess with the ``replay`` provider, which
+runs the real rocm-smi parsing path on the recorded outputs of the parser
+tests, so no GPU is needed; ``--replay`` serves a recording made with
+``--record`` instead. For every level of ``--sessions`` the harness
+opens that many headless Bokeh sessions per route, lets them settle and
+then reports, over ``--duration`` seconds:
+
+* the server's CPU use and resident memory, in total and per session added
+  since the previous level;
+* the IOLoop lag and the mean cost of every instrumented callback, from the
+  server's ``/stats.json``;
+* the websocket bytes per second received by the sessions.
+
+Run from the repository root::
+
+    python benchmarks/loadtest.py --sessions 1,10,50 --output report.json
+    python benchmarks/loadtest.py --sessions 1,10,50 --baseline report.json
+
+With ``--baseline`` the run fails when CPU per session or the IOLoop lag
+grew by more than ``--tolerance`` over the baseline report.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+import psutil
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from jupyterlab_nvdashboard import rocm_parser  # noqa: E402
+from jupyterlab_nvdashboard.stats import BOUNDS  # noqa: E402
+
+
+DEFAULT_ROUTES = ["GPU-Utilization", "GPU-Resource-Timeline", "Machine-Resources"]
+
+# VRAM of every replayed GPU, B
+VRAM_TOTAL = 32 << 30
+
+
+def _smi_output(title: str, lines: List[str]) -> bytes:
+    banners = ["{:=^80}".format(" ROCm System Management Interface "), "{:=^80}".format(title)]
+    footer = ["=" * 80, "{:=^80}".format(" End of ROCm SMI Log ")]
+    return "\n".join(["", ""] + banners + lines + footer + [""]).encode()
+
+
+def concise_sections(cases) -> dict:
+    """Derive the outputs of the flags without recorded outputs from Concise Info tables.
+
+    The parser tests only record the memory, temperature and power of the GPUs
+    in ``GPU_VRAM_USE``; rocm-smi prints them per flag as ``GPU[n]`` lines.
+    """
+    outputs = {"--showmeminfo": [], "--showtemp": [], "--showpower": []}
+    for case in cases:
+        rows = rocm_parser.parse(case[0]).concise
+        if not rows:
+            continue
+        memory, temperature, power = [], [], []
+        for i, row in enumerate(rows):
+            used = VRAM_TOTAL * int(row["VRAM%"].rstrip("%")) // 100
+            memory += [
+                "GPU[{}]\t\t: VRAM Total Memory (B): {}".format(i, VRAM_TOTAL),
+                "GPU[{}]\t\t: VRAM Total Used Memory (B): {}".format(i, used),
+            ]
+            temperature.append(
+                "GPU[{}]\t\t: Temperature (Sensor edge) (C): {}".format(i, row["Temp"].rstrip("c"))
+            )
+            power.append(
+                "GPU[{}]\t\t: Average Graphics Package Power (W): {}".format(
+                    i, row["AvgPwr"].rstrip("W")
+                )
+            )
+        outputs["--showmeminfo"].append(_smi_output(" Memory Usage (Bytes) ", memory))
+        outputs["--showtemp"].append(_smi_output(" Temperature ", temperature))
+        outputs["--showpower"].append(_smi_output(" Power Consumption ", power))
+    return {flag: itertools.cycle(cases) for flag, cases in outputs.items()}
+
+
+class SmiReplay:
+    """Stand-in for ``subprocess`` that answers rocm-smi with recorded outputs.
+
+    Each call cycles to the next recorded output of every requested flag, so
+    values change between samples like on a busy machine. ``latency`` adds
+    the wall time a real rocm-smi invocation would take.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        sys.path.insert(0, os.path.join(ROOT, "jupyterlab_nvdashboard", "tests"))
+        import rocm_outputs
+
+        def valid(cases):
+            return itertools.cycle([case[0] for case in cases if b"GPU" in case[0]])
+
+        self.count = valid(rocm_outputs.GPU_COUNT)
+        self.outputs = {
+            "--showuse": valid(rocm_outputs.GPU_UTILIZATION),
+            "--showgpuclocks": valid(rocm_outputs.GPU_CLOCK_FREQ),
+            "--showbw": valid(rocm_outputs.GPU_PCIE_BANDWITH),
+            "--showvoltage": valid(rocm_outputs.GPU_VOLTAGE),
+            # --showmeminfo vram, --showtemp and --showpower
+            **concise_sections(rocm_outputs.GPU_VRAM_USE),
+        }
+        self.latency = latency
+
+    def run(self, args, **kwargs):
+        flags = [a for a in args[1:] if a in self.outputs]
+        if len(args) == 1:
+            stdout = next(self.count)
+        else:
+            stdout = b"".join(next(self.outputs[flag]) for flag in flags)
+        if self.latency:
+            time.sleep(self.latency)
+        return subprocess.CompletedProcess(args, 0, stdout=stdout, stderr=b"")
+
+
+def serve(port: int, latency: float, recording: str = None):
+    """Run the dashboard server on the replayed rocm-smi outputs or a recording."""
+    from jupyterlab_nvdashboard import providers
+    from jupyterlab_nvdashboard.rocm import AmdGpuProperties
+
+    providers.PROVIDERS["replay"] = lambda: providers.RocmProvider(
+        AmdGpuProperties(bash=SmiReplay(latency))
+    )
+    os.environ["NVDASHBOARD_PROVIDER"] = "replay"
+    from jupyterlab_nvdashboard import server
+
+    sys.argv = ["nvdashboard", str(port)] + (["--replay", recording] if recording else [])
+    server.go()
+
+
+class Session:
+    """A headless Bokeh session: pulls the document, then counts the updates."""
+
+    def __init__(self, port: int, route: str):
+        from bokeh.util.token import generate_jwt_token, generate_session_id
+
+        self.url = "ws://localhost:{}/{}/ws".format(port, route)
+        self.token = generate_jwt_token(generate_session_id())
+        self.received = 0
+        self.connection = None
+
+    async def open(self):
+        self.connection = await websocket_connect(self.url, subprotocols=["bokeh", self.token])
+        # The server only reads messages once its session exists, which its
+        # ACK announces
+        for _ in range(3):
+            self.received += len(await self.connection.read_message())
+        header = {"msgid": "1", "msgtype": "PULL-DOC-REQ"}
+        for part in (json.dumps(header), "{}", "{}"):
+            await self.connection.write_message(part)
+        asyncio.ensure_future(self.read())
+
+    async def read(self):
+        while True:
+            message = await self.connection.read_message()
+            if message is None:
+                return
+            self.received += len(message)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def window(before: dict, after: dict) -> dict:
+    """Mean cost and p99 of every histogram between two stats reports."""
+    result = {}
+    for name, end in after["timings"].items():
+        empty = {"count": 0, "total": 0.0, "buckets": [0] * len(end["buckets"])}
+        start = before["timings"].get(name, empty)
+        count = end["count"] - start["count"]
+        if not count:
+            continue
+        buckets = [b - a for a, b in zip(start["buckets"], end["buckets"])]
+        seen, p99 = 0, float("inf")
+        for bound, n in zip(BOUNDS, buckets):
+            seen += n
+            if seen >= 0.99 * count:
+                p99 = bound
+                break
+        result[name] = {
+            "count": count,
+            "mean": (end["total"] - start["total"]) / count,
+            "p99": p99,
+        }
+    return result
+
+
+async def run_level(port, process, routes, sessions, settle, duration) -> dict:
+    client = AsyncHTTPClient()
+
+    async def stats():
+        response = await client.fetch("http://localhost:{}/stats.json".format(port))
+        return json.loads(response.body)
+
+    opened = [Session(port, route) for route in routes for _ in range(sessions)]
+    await asyncio.gather(*(s.open() for s in opened))
+    await asyncio.sleep(settle)
+
+    def received():
+        return sum(s.received for s in opened)
+
+    before, cpu_before, received_before = await stats(), process.cpu_times(), received()
+    start = time.monotonic()
+    await asyncio.sleep(duration)
+    after, cpu_after, received_after = await stats(), process.cpu_times(), received()
+    elapsed = time.monotonic() - start
+
+    cpu = (cpu_after.user + cpu_after.system - cpu_before.user - cpu_before.system) / elapsed
+    level = {
+        "sessions": len(opened),
+        "cpu_percent": 100 * cpu,
+        "rss": process.memory_info().rss,
+        "bytes_per_second": (received_after - received_before) / elapsed,
+        "timings": window(before, after),
+        "server_sessions": after.get("sessions", {}),
+    }
+    for s in opened:
+        s.close()
+    # Let the server free the sessions before the next level
+    await asyncio.sleep(settle)
+    return level
+
+
+def add_per_session(levels: List[dict]):
+    previous = {"sessions": 0, "cpu_percent": None, "rss": None}
+    for level in levels:
+        added = level["sessions"] - previous["sessions"]
+        for key in ("cpu_percent", "rss"):
+            if previous[key] is not None and added > 0:
+                level[key + "_per_session"] = (level[key] - previous[key]) / added
+        previous = level
+
+
+def print_levels(levels: List[dict]):
+    print("{:>8} {:>8} {:>12} {:>12} {:>10} {:>12}".format(
+        "sessions", "cpu %", "cpu %/sess", "rss MB", "lag p99", "kB/s"
+    ))
+    for level in levels:
+        lag = level["timings"].get("ioloop.lag", {}).get("p99", 0.0)
+        per_session = level.get("cpu_percent_per_session")
+        print("{:>8} {:>8.1f} {:>12} {:>12.1f} {:>9.1f}ms {:>12.1f}".format(
+            level["sessions"],
+            level["cpu_percent"],
+            "-" if per_session is None else "{:.2f}".format(per_session),
+            level["rss"] / 2 ** 20,
+            lag * 1000,
+            level["bytes_per_second"] / 1000,
+        ))
+    print()
+    for name, timing in sorted(levels[-1]["timings"].items()):
+        print("{:<40} {:>8} calls {:>10.3f}ms mean {:>10.3f}ms p99".format(
+            name, timing["count"], timing["mean"] * 1000, timing["p99"] * 1000
+        ))
+
+
+def regressions(levels: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    found = []
+    for level, base in zip(levels, baseline):
+        checks = {
+            "cpu_percent_per_session": (
+                level.get("cpu_percent_per_session"),
+                base.get("cpu_percent_per_session"),
+            ),
+            "ioloop lag p99": (
+                level["timings"].get("ioloop.lag", {}).get("p99"),
+                base["timings"].get("ioloop.lag", {}).get("p99"),
+            ),
+        }
+        for name, (value, reference) in checks.items():
+            if value is not None and reference and value > reference * (1 + tolerance):
+                found.append(
+                    "{} sessions: {} {:.4g} > {:.4g}".format(
+                        level["sessions"], name, value, reference
+                    )
+                )
+    return found
+
+
+async def wait_for_server(port, timeout=30):
+    client = AsyncHTTPClient()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.fetch("http://localhost:{}/index.json".format(port))
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+async def measure(args) -> List[dict]:
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+         "--smi-latency", str(args.smi_latency)]
+        + (["--replay", os.path.abspath(args.replay)] if args.replay else []),
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    try:
+        await wait_for_server(args.port)
+        process = psutil.Process(server.pid)
+        levels = []
+        for sessions in args.sessions:
+            levels.append(
+                await run_level(port=args.port, process=process, routes=args.route,
+                                sessions=sessions, settle=args.settle, duration=args.duration)
+            )
+        return levels
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sessions", type=lambda v: [int(n) for n in v.split(",")], default=[1, 10]
+    )
+    parser.add_argument("--route", action="append", help="route to open sessions on, repeatable")
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per level")
+    parser.add_argument("--settle", type=float, default=3, help="seconds before measuring")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--smi-latency", type=float, default=0.0, help="seconds per rocm-smi call")
+    parser.add_argument("--replay", help="serve this recording of the dashboard server")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="compare with an earlier JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.route = args.route or DEFAULT_ROUTES
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args.port, args.smi_latency, args.replay)
+        return 0
+    levels = asyncio.run(measure(args))
+    add_per_session(levels)
+    print_levels(levels)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"routes": args.route, "levels": levels}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(levels, json.load(f)["levels"], args.tolerance)
+        for line in found:
+            print("REGRESSION", line)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,27 @@ See https://jupyter-server-proxy.readthedocs.io/en/latest/server-process.html
 for more information.
 """
 import os
+import shlex
 import sys
 
 serverfile = os.path.join(os.path.dirname(__file__), "server.py")
 
 
 def launch_server():
-    return {"command": [sys.executable, serverfile, "{port}"], "timeout": 20}
+    # Extra server flags, such as --interval, come from NVDASHBOARD_ARGS
+    args = shlex.split(os.environ.get("NVDASHBOARD_ARGS", ""))
+    return {"command": [sys.executable, serverfile, "{port}"] + args, "timeout": 20}
+
+
+def _jupyter_server_extension_points():
+    return [{"module": "jupyterlab_nvdashboard"}]
+
+
+def _load_jupyter_server_extension(server_app):
+    """Register the kernel usage API of the sidebar with the Jupyter server."""
+    from jupyterlab_nvdashboard.handlers import setup_handlers
+
+    setup_handlers(server_app.web_app)
 
 
 def _jupyter_labextension_paths():
@@ -0,0 +1,172 @@
+"""
+Federate the samples of several dashboard servers into one cluster view.
+
+Every node runs a normal dashboard server as its agent. The aggregator keeps
+one persistent ``/metrics/stream`` websocket per node and decodes the binary
+frames into the latest snapshot of each node. Nodes that refuse connections
+are retried with exponential backoff, and a node that stays silent for
+``timeout`` seconds is dropped and reconnected, so a slow or dead node never
+holds up the others.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from tornado.ioloop import IOLoop
+from tornado.websocket import websocket_connect
+
+from jupyterlab_nvdashboard.api import decode_frame
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reconnection attempts, doubled after every failure
+RETRY_INTERVAL = 1
+MAX_RETRY_INTERVAL = 30
+
+
+def stream_url(url: str) -> str:
+    """Return the metrics stream websocket of the dashboard server at ``url``."""
+    parts = urlsplit(url if "://" in url else "http://" + url)
+    scheme = {"http": "ws", "https": "wss"}.get(parts.scheme, parts.scheme)
+    path = parts.path.rstrip("/")
+    if not path.endswith("/metrics/stream"):
+        path += "/metrics/stream"
+    return urlunsplit((scheme, parts.netloc, path, parts.query, ""))
+
+
+class NodeClient:
+    """Keep a websocket open to one agent and remember its latest snapshots."""
+
+    def __init__(self, name: str, url: str, timeout: float = 10):
+        self.name = name
+        self.url = stream_url(url)
+        self.timeout = timeout
+        # Latest decoded frame per source name, such as "gpu"
+        self.snapshots: Dict[str, dict] = {}
+        self.received: Optional[float] = None
+        self._schemas: Dict[int, dict] = {}
+        self._connection = None
+        self._stopped = False
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None
+
+    @property
+    def stale(self) -> bool:
+        """Whether the node has not sent anything for ``timeout`` seconds."""
+        return self.received is None or time.monotonic() - self.received > self.timeout
+
+    def receive(self, message):
+        if isinstance(message, str):
+            schema = json.loads(message)
+            if schema.get("type") == "schema":
+                self._schemas[schema["source"]] = schema
+            return
+        schema = self._schemas.get(message[0])
+        if schema is None:
+            return
+        self.snapshots[schema["name"]] = decode_frame(schema["fields"], message)
+        self.received = time.monotonic()
+
+    async def run(self):
+        """Connect and read frames until ``stop``, reconnecting as needed."""
+        delay = RETRY_INTERVAL
+        while not self._stopped:
+            try:
+                self._connection = await websocket_connect(
+                    self.url, connect_timeout=self.timeout
+                )
+            except Exception as e:
+                logger.warning("Could not connect to node %s at %s: %s", self.name, self.url, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_INTERVAL)
+                continue
+            delay = RETRY_INTERVAL
+            failed = False
+            try:
+                while not self._stopped:
+                    message = await asyncio.wait_for(
+                        self._connection.read_message(), self.timeout
+                    )
+                    if message is None:
+                        break
+                    self.receive(message)
+            except asyncio.TimeoutError:
+                logger.warning("Node %s sent nothing for %ss, reconnecting", self.name, self.timeout)
+            except Exception:
+                logger.exception("Bad message from node %s, reconnecting", self.name)
+                failed = True
+            finally:
+                self._connection.close()
+                self._connection = None
+                self._schemas = {}
+            if failed and not self._stopped:
+                # Do not hammer a node that keeps sending what we cannot decode
+                await asyncio.sleep(delay)
+
+    def stop(self):
+        self._stopped = True
+        if self._connection is not None:
+            self._connection.close()
+
+
+class NodeGpus(NamedTuple):
+    """The GPU bars of one node; values are empty while the node is stale."""
+
+    node: str
+    stale: bool
+    utilization: List[float]
+    memory: List[float]
+
+
+class Aggregator:
+    """A ``NodeClient`` per node, merged into one list of per-node GPUs."""
+
+    def __init__(self, nodes: Dict[str, str], timeout: float = 10):
+        self.clients = [NodeClient(name, url, timeout) for name, url in nodes.items()]
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for client in self.clients:
+            IOLoop.current().spawn_callback(client.run)
+
+    def stop(self):
+        for client in self.clients:
+            client.stop()
+        self.running = False
+
+    def gpus(self) -> List[NodeGpus]:
+        nodes = []
+        for client in self.clients:
+            gpu = client.snapshots.get("gpu")
+            if client.stale or gpu is None:
+                nodes.append(NodeGpus(client.name, True, [], []))
+            else:
+                nodes.append(
+                    NodeGpus(
+                        client.name,
+                        False,
+                        [float(v) for v in gpu["utilization"]],
+                        [float(v) for v in gpu["memory"]],
+                    )
+                )
+        return nodes
+
+
+def parse_nodes(values: List[str]) -> Dict[str, str]:
+    """Turn ``NAME=URL`` or bare ``URL`` values into ``{name: url}``."""
+    nodes = {}
+    for value in values:
+        name, sep, url = value.partition("=")
+        if not sep or "/" in name or ":" in name:
+            name, url = urlsplit(value if "://" in value else "http://" + value).netloc, value
+        nodes[name] = url
+    return nodes
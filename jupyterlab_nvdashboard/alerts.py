@@ -0,0 +1,262 @@
+"""
+Threshold alerts evaluated on every new snapshot of a sampler.
+
+A rule holds when all of its conditions hold for a device, and fires once
+it held for ``duration`` seconds. Conditions compare a snapshot field, or
+its rate of change per second, with a number::
+
+    {"name": "stuck-gpu", "when": ["utilization >= 100", "rate(memory) == 0"], "for": 120}
+
+Readings the provider could not get never satisfy a condition. The engine
+keeps the previous reading of every field plus, per rule and device, the
+time the rule started holding and whether it fires, all as NumPy arrays, so
+each snapshot costs a few array operations whatever the history. Every
+change of state is sent to the sinks as an ``AlertEvent``.
+"""
+import json
+import logging
+import operator
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop
+
+from jupyterlab_nvdashboard.sampler import GpuSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+# Every GpuSnapshot field after time
+FIELDS = GpuSnapshot._fields[1:]
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_CONDITION = re.compile(
+    r"^\s*(?:rate\(\s*(?P<rate>\w+)\s*\)|(?P<field>\w+))"
+    r"\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<threshold>[-+\d.eE]+)\s*$"
+)
+
+
+class Condition(NamedTuple):
+    field: str
+    op: str
+    threshold: float
+    rate: bool = False  # compare the change per second instead of the value
+
+    @classmethod
+    def parse(cls, text: str) -> "Condition":
+        """Parse ``"FIELD OP NUMBER"`` or ``"rate(FIELD) OP NUMBER"``.
+
+        ``FIELD`` is one of ``FIELDS``.
+        """
+        match = _CONDITION.match(text)
+        try:
+            threshold = float(match.group("threshold"))
+        except (AttributeError, ValueError):
+            raise ValueError("Invalid alert condition {!r}".format(text))
+        rate = match.group("rate")
+        field = rate or match.group("field")
+        if field not in FIELDS:
+            # A missing field would never hold, so the rule would silently never fire
+            raise ValueError(
+                "Unknown field {!r} in alert condition {!r}, expected one of {}".format(
+                    field, text, ", ".join(FIELDS)
+                )
+            )
+        return cls(field, match.group("op"), threshold, bool(rate))
+
+    def __str__(self):
+        field = "rate({})".format(self.field) if self.rate else self.field
+        return "{} {} {:g}".format(field, self.op, self.threshold)
+
+
+class Rule(NamedTuple):
+    name: str
+    conditions: Tuple[Condition, ...]
+    duration: float = 0  # s the conditions must hold before the rule fires
+    severity: str = "warning"
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "Rule":
+        try:
+            conditions = spec["when"]
+            if isinstance(conditions, str):
+                conditions = [conditions]
+            return cls(
+                spec["name"],
+                tuple(Condition.parse(c) for c in conditions),
+                float(spec.get("for", 0)),
+                spec.get("severity", "warning"),
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError("Invalid alert rule {!r}: {}".format(spec, e))
+
+
+# Replaced by the rules of --alerts
+DEFAULT_RULES = (
+    # Busy without touching memory for two minutes, e.g. a hung kernel
+    Rule.from_dict(
+        {"name": "stuck-gpu", "when": ["utilization >= 100", "rate(memory) == 0"], "for": 120}
+    ),
+    Rule.from_dict({"name": "thermal-throttling", "when": ["temperature >= 90"], "for": 30}),
+)
+
+
+def load_rules(path: str) -> List[Rule]:
+    """Read a JSON list of rules."""
+    with open(path) as f:
+        specs = json.load(f)
+    if not isinstance(specs, list):
+        raise ValueError("Expected a list of alert rules in {}".format(path))
+    return [Rule.from_dict(spec) for spec in specs]
+
+
+class AlertEvent(NamedTuple):
+    time: float
+    rule: str
+    severity: str
+    device: int
+    firing: bool  # False once the rule no longer holds
+    # The fields of the rule when it changed state, None where the reading failed
+    values: Dict[str, Optional[float]]
+
+    def message(self) -> str:
+        return "{} GPU {}: {} ({})".format(
+            "Alert" if self.firing else "Resolved",
+            self.device,
+            self.rule,
+            ", ".join(
+                "{}={}".format(k, "unknown" if v is None else "{:g}".format(v))
+                for k, v in self.values.items()
+            ),
+        )
+
+
+class AlertEngine:
+    """Evaluate ``rules`` on every ``GpuSnapshot`` passed to it, e.g. as a sampler listener.
+
+    All state is reset when the number of GPUs changes.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[Rule] = DEFAULT_RULES,
+        sinks: Sequence[Callable[[AlertEvent], None]] = (),
+    ):
+        self.sinks = list(sinks)
+        self.set_rules(rules)
+
+    def set_rules(self, rules: Iterable[Rule]):
+        self.rules = list(rules)
+        self._fields = sorted({c.field for rule in self.rules for c in rule.conditions})
+        self._devices = -1
+        self._time = None
+        self._last: Dict[str, np.ndarray] = {}
+
+    def _reset(self, devices: int):
+        self._devices = devices
+        self._time = None
+        # Per rule and device: when the rule started holding, NaN if it does not
+        self._since = np.full((len(self.rules), devices), np.nan)
+        self._firing = np.zeros((len(self.rules), devices), dtype=bool)
+
+    @property
+    def firing(self) -> np.ndarray:
+        """Whether any rule fires, per device."""
+        if self._devices <= 0:
+            return np.zeros(0, dtype=bool)
+        return self._firing.any(axis=0)
+
+    def __call__(self, snapshot: NamedTuple):
+        devices = snapshot.ngpus
+        values = {}
+        for field in self._fields:
+            value = np.asarray(getattr(snapshot, field, ())[:devices], dtype=float)
+            # -1 marks readings the provider could not get, as do missing ones
+            values[field] = np.full(devices, np.nan)
+            values[field][: len(value)] = np.where(value == -1, np.nan, value)
+        if devices != self._devices:
+            self._reset(devices)
+        now = snapshot.time
+        if self._time is None or now <= self._time:
+            rates = {field: np.full(devices, np.nan) for field in self._fields}
+        else:
+            elapsed = now - self._time
+            rates = {field: (values[field] - self._last[field]) / elapsed for field in self._fields}
+        self._time, self._last = now, values
+
+        with np.errstate(invalid="ignore"):
+            for i, rule in enumerate(self.rules):
+                holds = np.ones(devices, dtype=bool)
+                for c in rule.conditions:
+                    measured = rates[c.field] if c.rate else values[c.field]
+                    holds &= OPERATORS[c.op](measured, c.threshold) & ~np.isnan(measured)
+                since = self._since[i]
+                since[holds & np.isnan(since)] = now
+                since[~holds] = np.nan
+                firing = holds & (now - since >= rule.duration)
+                for device in np.flatnonzero(firing != self._firing[i]):
+                    self._emit(rule, int(device), bool(firing[device]), now, values)
+                self._firing[i] = firing
+
+    def _emit(self, rule: Rule, device: int, firing: bool, now: float, values):
+        readings = {c.field: float(values[c.field][device]) for c in rule.conditions}
+        event = AlertEvent(
+            now,
+            rule.name,
+            rule.severity,
+            device,
+            firing,
+            # NaN is not valid JSON for the webhooks
+            {field: None if np.isnan(v) else v for field, v in readings.items()},
+        )
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception("Alert sink %r failed", sink)
+
+
+class LogSink:
+    """Log alerts, at the level of their severity while they fire."""
+
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self.log = log or logger
+
+    def __call__(self, event: AlertEvent):
+        level = logging.getLevelName(event.severity.upper()) if event.firing else logging.INFO
+        self.log.log(level if isinstance(level, int) else logging.WARNING, event.message())
+
+
+class WebhookSink:
+    """POST every alert event as JSON to ``url``, without waiting for the reply.
+
+    Must be called on the IOLoop thread, which sampler listeners are.
+    """
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, event: AlertEvent):
+        request = HTTPRequest(
+            self.url,
+            method="POST",
+            headers={"Content-Type": "application/json"},
+            body=json.dumps(event._asdict()),
+            request_timeout=self.timeout,
+        )
+        IOLoop.current().spawn_callback(self._post, request)
+
+    async def _post(self, request: HTTPRequest):
+        response = await AsyncHTTPClient().fetch(request, raise_error=False)
+        if response.error:
+            logger.warning("Could not send alert to %s: %s", self.url, response.error)
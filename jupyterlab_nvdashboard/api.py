@@ -0,0 +1,164 @@
+"""
+Plain JSON and binary access to the shared samplers, next to the Bokeh apps.
+
+``GET /metrics/snapshot`` returns the latest snapshot of every sampler as
+JSON. The ``/metrics/stream`` websocket pushes every new snapshot, by default
+as compact binary frames:
+
+* a text message ``{"type": "schema", "source": id, "name": ..., "fields": [...]}``
+  is sent before the first frame of a source and whenever its layout changes;
+* every binary frame starts with the source id (uint8) and seven bytes of
+  padding, followed by the sample time as a little-endian float64 at offset 8.
+  Each field is then stored at its ``offset`` as ``length`` values of
+  ``dtype``, aligned to 8 bytes so browsers can map typed arrays onto it.
+
+``/metrics/stream?format=json`` sends one JSON text message per snapshot
+instead, including the per-disk and per-interface rates, which binary frames
+leave out. Frames are dropped, never queued, while a client is still receiving
+the previous one.
+"""
+import struct
+from functools import partial
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+from tornado import web
+from tornado.websocket import WebSocketClosedError, WebSocketHandler
+
+from jupyterlab_nvdashboard.sampler import Sampler
+
+HEADER = struct.Struct("<B7xd")
+# Wire type of snapshot fields, None for fields left out of binary frames;
+# all others are sent as float64
+FIELD_TYPES = {
+    "GpuSnapshot": {
+        "utilization": "<i2",
+        "memory": "<i2",
+        "clock": "<i4",
+        "temperature": "<f4",
+        "power": "<f4",
+        "voltage": "<i4",
+        "pcie": "<f4",
+    },
+    # Per-device rates carry names and are only sent as JSON
+    "HostSnapshot": {"cpu": "<f4", "cpu_per_core": "<f4", "disks": None, "nics": None},
+}
+
+
+def snapshot_schema(snapshot: NamedTuple) -> List[dict]:
+    """Return the binary layout of the fields of ``snapshot`` after the header."""
+    types = FIELD_TYPES.get(type(snapshot).__name__, {})
+    fields = []
+    offset = HEADER.size
+    for name, value in snapshot._asdict().items():
+        dtype = types.get(name, "<f8")
+        if name == "time" or dtype is None:
+            continue
+        scalar = not isinstance(value, (tuple, list, np.ndarray))
+        length = 1 if scalar else len(value)
+        fields.append(
+            {"name": name, "dtype": dtype, "offset": offset, "length": length, "scalar": scalar}
+        )
+        offset += -(-length * np.dtype(dtype).itemsize // 8) * 8
+    return fields
+
+
+def encode_frame(source: int, snapshot: NamedTuple, schema: List[dict]) -> bytes:
+    size = HEADER.size
+    if schema:
+        last = schema[-1]
+        size = last["offset"] + last["length"] * np.dtype(last["dtype"]).itemsize
+    frame = bytearray(size)
+    HEADER.pack_into(frame, 0, source, snapshot.time)
+    for field in schema:
+        values = np.asarray(getattr(snapshot, field["name"]), dtype=field["dtype"]).ravel()
+        end = field["offset"] + values.nbytes
+        frame[field["offset"] : end] = values.tobytes()
+    return bytes(frame)
+
+
+def decode_frame(schema: List[dict], frame: bytes) -> dict:
+    """Turn a binary frame back into ``{field: value}`` using its schema."""
+    source, time = HEADER.unpack_from(frame, 0)
+    values = {"source": source, "time": time}
+    for field in schema:
+        array = np.frombuffer(frame, field["dtype"], field["length"], field["offset"])
+        values[field["name"]] = array[0].item() if field["scalar"] else array
+    return values
+
+
+def snapshot_json(snapshot) -> dict:
+    return None if snapshot is None else snapshot._asdict()
+
+
+class MetricsSnapshot(web.RequestHandler):
+    """ The latest snapshot of every sampler as JSON """
+
+    def initialize(self, samplers: Dict[str, Sampler]):
+        self.samplers = samplers
+
+    async def get(self):
+        result = {}
+        for name, sampler in self.samplers.items():
+            snapshot = sampler.snapshot
+            if snapshot is None:
+                snapshot = await sampler.sample_async()
+            result[name] = snapshot_json(snapshot)
+        self.write(result)
+
+
+class MetricsStream(WebSocketHandler):
+    """ Push every new snapshot of the samplers to the client """
+
+    def initialize(self, samplers: Dict[str, Sampler]):
+        self.samplers = samplers
+        self._listeners = []
+        self._schemas: Dict[int, List[dict]] = {}
+        self._sending = None
+
+    def check_origin(self, origin):
+        # Same policy as the Bokeh websockets
+        return True
+
+    def open(self):
+        self.binary = self.get_argument("format", "binary") != "json"
+        for source, (name, sampler) in enumerate(self.samplers.items()):
+            listener = partial(self.send, source, name)
+            sampler.add_listener(listener)
+            # Streaming clients count as visible dashboards
+            sampler.subscribe(id(self))
+            self._listeners.append((sampler, listener))
+            if sampler.snapshot is not None:
+                listener(sampler.snapshot)
+
+    def on_close(self):
+        for sampler, listener in self._listeners:
+            sampler.remove_listener(listener)
+            sampler.unsubscribe(id(self))
+        self._listeners = []
+
+    def send(self, source: int, name: str, snapshot: NamedTuple):
+        if self._sending is not None and not self._sending.done():
+            return
+        try:
+            if not self.binary:
+                self._sending = self.write_message({"source": name, **snapshot._asdict()})
+                return
+            schema = snapshot_schema(snapshot)
+            if self._schemas.get(source) != schema:
+                self.write_message(
+                    {"type": "schema", "source": source, "name": name, "fields": schema}
+                )
+                self._schemas[source] = schema
+            self._sending = self.write_message(encode_frame(source, snapshot, schema), binary=True)
+        except WebSocketClosedError:
+            self.on_close()
+
+
+def metrics_handlers(prefix: str, samplers: Dict[str, Sampler]) -> list:
+    """Return the Tornado handlers of the metrics API below ``prefix``."""
+    args = {"samplers": samplers}
+    return [
+        (prefix + "/metrics/snapshot", MetricsSnapshot, args),
+        (prefix + "/metrics/stream", MetricsStream, args),
+    ]
@@ -1,2 +1,4 @@
+from . import cluster
 from . import cpu
-from . import gpu
\ No newline at end of file
+from . import gpu
+from . import processes
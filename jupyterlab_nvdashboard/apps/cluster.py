@@ -0,0 +1,70 @@
+from bokeh.plotting import figure, ColumnDataSource
+from bokeh.models import FactorRange
+from bokeh.layouts import row
+from bokeh.models.mappers import LinearColorMapper
+from bokeh.palettes import all_palettes
+
+from jupyterlab_nvdashboard.stats import timed
+from jupyterlab_nvdashboard.utils import patch_changed
+
+
+# Utilization changes below this many percentage points are not sent
+DEADBAND = 1
+
+
+def device_data(nodes):
+    """Return the bar columns of all GPUs, with an empty bar for stale nodes."""
+    data = {"device": [], "utilization": [], "memory": []}
+    for node in nodes:
+        if node.stale:
+            data["device"].append(node.node + " (no data)")
+            data["utilization"].append(0)
+            data["memory"].append(0)
+            continue
+        for i, (gpu, mem) in enumerate(zip(node.utilization, node.memory)):
+            data["device"].append("{}/{}".format(node.node, i))
+            data["utilization"].append(gpu)
+            data["memory"].append(mem)
+    return data
+
+
+def cluster_gpu(doc, aggregator, interval=500):
+    aggregator.start()
+
+    data = device_data(aggregator.gpus())
+    source = ColumnDataSource(data)
+    y_range = FactorRange(factors=list(reversed(data["device"])))
+    mapper = LinearColorMapper(palette=all_palettes["RdYlBu"][4], low=0, high=100)
+
+    figs = []
+    for title, column in (
+        ("GPU Utilization per Node [%]", "utilization"),
+        ("GPU Memory Utilization per Node [%]", "memory"),
+    ):
+        fig = figure(
+            title=title, sizing_mode="stretch_both", x_range=[0, 100], y_range=y_range
+        )
+        fig.hbar(
+            source=source,
+            y="device",
+            right=column,
+            height=0.8,
+            color={"field": column, "transform": mapper},
+        )
+        fig.toolbar_location = None
+        figs.append(fig)
+
+    doc.title = "Cluster GPU Utilization"
+    doc.add_root(row(*figs, sizing_mode="stretch_both"))
+
+    def cb():
+        data = device_data(aggregator.gpus())
+        if data["device"] != source.data["device"]:
+            # A node went down, came back or changed its GPUs
+            source.data = data
+            y_range.factors = list(reversed(data["device"]))
+            return
+        for column in ("utilization", "memory"):
+            patch_changed(source, column, data[column], DEADBAND)
+
+    doc.add_periodic_callback(timed("callback.cluster_gpu", cb), interval)
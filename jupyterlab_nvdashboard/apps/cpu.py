@@ -1,23 +1,73 @@
 from bokeh.plotting import figure, ColumnDataSource
-from bokeh.models import DataRange1d, NumeralTickFormatter
-from bokeh.layouts import column
+from bokeh.models import DataRange1d, Legend, LegendItem, NumeralTickFormatter
+from bokeh.layouts import column, row
 from bokeh.models.mappers import LinearColorMapper
 from bokeh.palettes import all_palettes
 
+import numpy as np
 import psutil
-import time
 
+from jupyterlab_nvdashboard.history import open_store
+from jupyterlab_nvdashboard.ringbuffer import DeviceHistory, RingBuffer
+from jupyterlab_nvdashboard.rollup import Rollup
+from jupyterlab_nvdashboard.sampler import HostCollector, Sampler
+from jupyterlab_nvdashboard.stats import timed, timer
+from jupyterlab_nvdashboard.utils import Prebuilt, TimelineStream, patch_changed, subscribe
 
-def cpu(doc):
+
+# Utilization changes below this many percentage points are not sent
+DEADBAND = 1
+# Number of samples kept for the timelines
+HISTORY = 1000
+# Busiest disks and network interfaces shown with their own line
+TOP_DEVICES = 5
+DEVICE_SLOTS = ["device-" + str(i) for i in range(TOP_DEVICES)]
+DEVICE_COLORS = ["blue", "red", "green", "orange", "purple"]
+
+# psutil is polled once per tick for all sessions; this also keeps the
+# sessions from resetting each other's cpu_percent intervals
+sampler = Sampler(HostCollector(), 200, name="host")
+TIMELINE_COLUMNS = ["time", "memory", "cpu", "disk-read", "disk-write", "net-read", "net-sent"]
+history = RingBuffer(TIMELINE_COLUMNS, HISTORY)
+rollup = Rollup(TIMELINE_COLUMNS)
+# Optional on-disk copy of the history that outlives the server
+store = open_store("machine-resources", TIMELINE_COLUMNS)
+if store is not None:
+    rollup.load(store.read())
+# Read plus write bandwidth of every disk and network interface
+disk_devices = DeviceHistory(HISTORY)
+nic_devices = DeviceHistory(HISTORY)
+
+
+def record_history(snapshot):
+    row = (
+        snapshot.time * 1000,  # bokeh measures in ms
+        snapshot.memory,
+        snapshot.cpu,
+        snapshot.disk_read,
+        snapshot.disk_write,
+        snapshot.net_recv,
+        snapshot.net_sent,
+    )
+    history.append(row)
+    rollup.append(row)
+    if store is not None:
+        store.append(row)
+    for devices, rates in ((disk_devices, snapshot.disks), (nic_devices, snapshot.nics)):
+        devices.append(
+            row[0], [r.name for r in rates], np.array([r.read + r.write for r in rates])
+        )
+
+
+sampler.add_listener(record_history)
+
+
+def _cpu_layout():
     fig = figure(
         title="CPU Utilization [%]", sizing_mode="stretch_both", y_range=[0, 100]
     )
 
-    cpu = psutil.cpu_percent(percpu=True)
-    left = list(range(len(cpu)))
-    right = [l + 0.8 for l in left]
-
-    source = ColumnDataSource({"left": left, "right": right, "cpu": cpu})
+    source = ColumnDataSource({"left": [], "right": [], "cpu": []})
     mapper = LinearColorMapper(palette=all_palettes["RdYlBu"][4], low=0, high=100)
 
     fig.quad(
@@ -28,33 +78,132 @@ def cpu(doc):
         top="cpu",
         color={"field": "cpu", "transform": mapper},
     )
+    return fig, source
+
+
+cpu_layouts = Prebuilt(_cpu_layout)
+
+
+def cpu(doc, interval=200):
+    fig, source = cpu_layouts.take()
+
+    subscribe(doc, sampler)
+    snapshot = sampler.snapshot
+
+    def set_bars(cpu):
+        left = list(range(len(cpu)))
+        source.data = {"left": left, "right": [l + 0.8 for l in left], "cpu": cpu}
+
+    set_bars(list(snapshot.cpu_per_core) if snapshot else [])
 
     doc.title = "CPU Usage"
     doc.add_root(fig)
 
     def cb():
-        source.data.update({"cpu": psutil.cpu_percent(percpu=True)})
+        nonlocal snapshot
+        if sampler.snapshot is snapshot:
+            return
+        snapshot = sampler.snapshot
+        cpu = list(snapshot.cpu_per_core)
+        if not patch_changed(source, "cpu", cpu, DEADBAND):
+            set_bars(cpu)
 
-    doc.add_periodic_callback(cb, 200)
+    doc.add_periodic_callback(timed("callback.cpu", cb), interval)
+
+
+def _device_figure(title, x_range, tools):
+    """A figure with a line for each of the ``TOP_DEVICES`` busiest devices."""
+    fig = figure(
+        title=title,
+        sizing_mode="stretch_both",
+        x_axis_type="datetime",
+        x_range=x_range,
+        tools=tools,
+    )
+    source = ColumnDataSource({c: [] for c in ["time"] + DEVICE_SLOTS})
+    items = [
+        LegendItem(
+            label="",
+            renderers=[fig.line(source=source, x="time", y=slot, color=color)],
+            visible=False,
+        )
+        for slot, color in zip(DEVICE_SLOTS, DEVICE_COLORS)
+    ]
+    fig.add_layout(Legend(items=items, location="top_left"))
+    fig.yaxis.formatter = NumeralTickFormatter(format="0.0b")
+    return fig, (source, items)
 
 
-def resource_timeline(doc):
+def _assign_slots(slots, top):
+    """Put the devices of ``top`` into ``TOP_DEVICES`` line slots, None for empty ones.
+
+    Devices still in ``top`` keep their slot, and with it their colour; new
+    ones take the slots of the devices that dropped out, busiest first.
+    """
+    kept = [name if name in top else None for name in slots]
+    kept += [None] * (TOP_DEVICES - len(kept))
+    new = iter([name for name in top if name not in kept])
+    return [name if name is not None else next(new, None) for name in kept]
+
+
+def _follow_devices(devices, lines):
+    """Return a callback streaming the busiest of ``devices`` into ``lines``
+
+    Only the columns of the ``TOP_DEVICES`` busiest devices are sent. When a
+    device leaves the top, only the line it had is reassigned and refilled
+    from history; reordering within the top changes nothing.
+
+    """
+    source, items = lines
+    buffer = None
+    shown = [None] * TOP_DEVICES
+    cursor = 0
+
+    def column(data, name):
+        return data[name] if name is not None else np.full(len(data["time"]), np.nan)
+
+    def columns(data):
+        selected = {"time": data["time"]}
+        selected.update({slot: column(data, name) for slot, name in zip(DEVICE_SLOTS, shown)})
+        return selected
+
+    def relabel(slots):
+        for i in slots:
+            items[i].label = {"value": shown[i] or ""}
+            items[i].visible = shown[i] is not None
+
+    def update():
+        nonlocal buffer, shown, cursor
+        top = devices.ranking[:TOP_DEVICES]
+        if devices.buffer is not buffer:
+            buffer = devices.buffer
+            shown = _assign_slots(shown, top)
+            source.data = columns(buffer.view())
+            relabel(range(TOP_DEVICES))
+            cursor = buffer.count
+            return
+        if buffer.count != cursor:
+            with timer("stream"):
+                source.stream(columns(buffer.view(since=cursor)), HISTORY)
+            cursor = buffer.count
+        slots = _assign_slots(shown, top)
+        changed = [i for i, name in enumerate(slots) if name != shown[i]]
+        if changed:
+            shown = slots
+            data = buffer.view()
+            source.data.update({DEVICE_SLOTS[i]: column(data, shown[i]) for i in changed})
+            relabel(changed)
+
+    return update
+
+
+def _timeline_layout():
 
     # Shared X Range for all plots
     x_range = DataRange1d(follow="end", follow_interval=20000, range_padding=0)
     tools = "reset,xpan,xwheel_zoom"
 
-    source = ColumnDataSource(
-        {
-            "time": [],
-            "memory": [],
-            "cpu": [],
-            "disk-read": [],
-            "disk-write": [],
-            "net-read": [],
-            "net-sent": [],
-        }
-    )
+    source = ColumnDataSource({c: [] for c in TIMELINE_COLUMNS})
 
     memory_fig = figure(
         title="Memory",
@@ -101,49 +250,42 @@ def resource_timeline(doc):
     net_fig.yaxis.formatter = NumeralTickFormatter(format="0.0b")
     net_fig.legend.location = "top_left"
 
-    doc.title = "Resource Timeline"
-    doc.add_root(
-        column(cpu_fig, memory_fig, disk_fig, net_fig, sizing_mode="stretch_both")
+    disk_device_fig, disk_device_lines = _device_figure("Busiest Disks", x_range, tools)
+    net_device_fig, net_device_lines = _device_figure("Busiest Interfaces", x_range, tools)
+
+    root = column(
+        cpu_fig,
+        memory_fig,
+        row(disk_fig, disk_device_fig, sizing_mode="stretch_both"),
+        row(net_fig, net_device_fig, sizing_mode="stretch_both"),
+        sizing_mode="stretch_both",
     )
+    return root, source, x_range, disk_device_lines, net_device_lines
 
-    last_disk_read = psutil.disk_io_counters().read_bytes
-    last_disk_write = psutil.disk_io_counters().write_bytes
-    last_net_recv = psutil.net_io_counters().bytes_recv
-    last_net_sent = psutil.net_io_counters().bytes_sent
-    last_time = time.time()
 
-    def cb():
-        nonlocal last_disk_read, last_disk_write, last_net_recv, last_net_sent, last_time
-
-        now = time.time()
-        cpu = psutil.cpu_percent()
-        mem = psutil.virtual_memory().used
-
-        disk = psutil.disk_io_counters()
-        disk_read = disk.read_bytes
-        disk_write = disk.write_bytes
-
-        net = psutil.net_io_counters()
-        net_read = net.bytes_recv
-        net_sent = net.bytes_sent
-
-        source.stream(
-            {
-                "time": [now * 1000],  # bokeh measures in ms
-                "cpu": [cpu],
-                "memory": [mem],
-                "disk-read": [(disk_read - last_disk_read) / (now - last_time)],
-                "disk-write": [(disk_write - last_disk_write) / (now - last_time)],
-                "net-read": [(net_read - last_net_recv) / (now - last_time)],
-                "net-sent": [(net_sent - last_net_sent) / (now - last_time)],
-            },
-            1000,
-        )
+timeline_layouts = Prebuilt(_timeline_layout)
+
+
+def resource_timeline(doc, interval=200):
 
-        last_disk_read = disk_read
-        last_disk_write = disk_write
-        last_net_recv = net_read
-        last_net_sent = net_sent
-        last_time = now
+    root, source, x_range, disk_device_lines, net_device_lines = timeline_layouts.take()
+    follow_disks = _follow_devices(disk_devices, disk_device_lines)
+    follow_nics = _follow_devices(nic_devices, net_device_lines)
+    follow_disks()
+    follow_nics()
+
+    # Start from the visible window of the shared history
+    timeline = TimelineStream(source, x_range, HISTORY)
+    timeline.attach(history, rollup)
+
+    doc.title = "Resource Timeline"
+    doc.add_root(root)
+
+    subscribe(doc, sampler)
+
+    def cb():
+        follow_disks()
+        follow_nics()
+        timeline.update()
 
-    doc.add_periodic_callback(cb, 200)
+    doc.add_periodic_callback(timed("callback.resource_timeline", cb), interval)
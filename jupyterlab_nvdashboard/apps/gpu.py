@@ -1,16 +1,20 @@
 from bokeh.plotting import figure, ColumnDataSource
-from bokeh.models import DataRange1d, NumeralTickFormatter, BasicTicker
+from bokeh.models import DataRange1d, Legend, LegendItem, NumeralTickFormatter
 from bokeh.layouts import column
 from bokeh.models.mappers import LinearColorMapper
 from bokeh.palettes import all_palettes
-import time
-import subprocess
 import logging
-import re
-from typing import List
-from statistics import mean
 
-from jupyterlab_nvdashboard.utils import format_bytes
+import numpy as np
+
+from jupyterlab_nvdashboard.alerts import AlertEngine, LogSink
+from jupyterlab_nvdashboard.history import open_store
+from jupyterlab_nvdashboard.providers import get_provider
+from jupyterlab_nvdashboard.ringbuffer import RingBuffer
+from jupyterlab_nvdashboard.rollup import Rollup
+from jupyterlab_nvdashboard.sampler import PCIE_INTERVAL, Sampler, collect_gpu, collect_pcie
+from jupyterlab_nvdashboard.stats import timed, timer
+from jupyterlab_nvdashboard.utils import Prebuilt, TimelineStream, patch_changed, subscribe
 
 
 logging.basicConfig(
@@ -19,172 +23,227 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s %(message)s",
 )
 logger = logging.getLogger(__name__)
+# Alert events are logged below the ERROR level of the other messages
+logging.getLogger("jupyterlab_nvdashboard.alerts").setLevel(logging.INFO)
 
 
-class AmdGpuProperties:
-    def __init__(self, bash=subprocess):
-        self.bash = bash
-        self.gpus = self.get_gpu_count()
-
-    def get_gpu_count(self) -> int:
-        """Get the number of working GPUs."""
-        try:
-            output = self.bash.run("rocm-smi", stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                gpus_count = [int(num) for num in re.findall(r'[0-9]* ', output) if num != " "]
-                if len(gpus_count) == 0:
-                    return -1
-                else:
-                    return len(gpus_count)
-            else:
-                return -1
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. gpu count -", i_err)
-        except FileNotFoundError as f_err:
-            logger.error("ROCm is not installed -", f_err)
-
-    def get_gpu_utilization(self, flag="-u") -> List[int]:
-        """Return the utilization of each GPU in %."""
-        try:
-            output = self.bash.run(["rocm-smi", flag], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                util = [int(num[:-1]) for num in re.findall(r' [0-9]*\n', output)]
-                return util
-            else:
-                return [-1 for _ in range(self.gpus)]       # return []
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. gpu utilization -", i_err)
-
-    def get_gpu_clock_freq(self, flag="-g") -> List[int]:
-        """Return the clock frequence of each GPU in Mhz."""
-        try:
-            output = self.bash.run(["rocm-smi", flag], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                freq = [int(num[1:]) for num in re.findall(r'\([0-9]*', output)]
-                return freq
-            else:
-                return [-1 for _ in range(self.gpus)]       # return []
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. clock frequency -", i_err)
-
-    def get_gpu_vram_use(self) -> List[int]:
-        """Return the current v-ram usage of each GPU in %."""
-        try:
-            output = self.bash.run("rocm-smi", stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                vramUse = [int(num[:-1]) for num in re.findall(r' [0-9]*%', output)]
-                return [vramUse[i] for i in range(len(vramUse)) if i % 2 == 0]
-            else:
-                return [-1 for _ in range(self.gpus)]       # return []
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. v-ram usage -", i_err)
-    
-    def get_gpu_pcie_bandwith(self, flag="-b") -> List[float]:
-        """Return the estimated maximum PCIe bandwith in MB/s."""
-        try:
-            output = self.bash.run(["rocm-smi", flag], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                pcie_use = [float(num[:-1]) for num in re.findall(r' [0-9]*\.[0-9]*\n', output)]
-                return pcie_use
-            else:
-                return [-1.0 for _ in range(self.gpus)]     # return []
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. pcie bandwith -", i_err)
-
-    def get_gpu_voltage(self, flag="--showvoltage") -> List[int]:
-        """Return the current Voltage per GPU in mV."""
-        try:
-            output = self.bash.run(["rocm-smi", flag], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
-            if "ROCm System Management Interface" in output:
-                voltage = [int(num[:-1]) for num in re.findall(r' [0-9]*\n', output)]
-                return voltage
-            else:
-                return [-1 for _ in range(self.gpus)]       # return []
-        except IndexError as i_err:
-            logger.error("Unexpected return message while parsing ROCm output w.r.t. gpu voltage -", i_err)
+KB = 1e3
+MB = KB * KB
+GB = MB * KB
+# Utilization changes below this many percentage points are not sent
+DEADBAND = 1
+# Number of samples kept for the timelines
+HISTORY = 1000
+provider = get_provider()
 
 
+# Runs on its own worker so the slow PCIe readings never delay a GPU tick
+pcie_sampler = Sampler(
+    lambda: collect_pcie(provider), PCIE_INTERVAL, idle_interval=PCIE_INTERVAL, name="gpu-pcie"
+)
+# Shared by all sessions so rocm-smi runs once per tick, not once per tab
+sampler = Sampler(lambda: collect_gpu(provider, pcie_sampler.snapshot), 500, name="gpu")
+# The PCIe readings start with the GPU sampler and then keep going like it
+sampler.add_listener(lambda snapshot: pcie_sampler.start())
 
 
+def timeline_columns(ngpus):
+    return (
+        ["time", "gpu-total", "memory-total"]
+        + ["gpu-" + str(i) for i in range(ngpus)]
+        + ["memory-" + str(i) for i in range(ngpus)]
+    )
 
-KB = 1e3
-MB = KB * KB
-GB = MB * KB
-amd = AmdGpuProperties()
+
+# Replaced by a wider buffer whenever more GPUs are discovered
+history = RingBuffer(timeline_columns(0), HISTORY)
+history_gpus = 0
+rollup = Rollup(timeline_columns(0))
+# Optional on-disk copy of the history that outlives the server
+store = open_store("gpu-resource-timeline", timeline_columns(0))
+
+
+def _mean(values):
+    valid = values[~np.isnan(values)]
+    return valid.mean() if valid.size else np.nan
+
+
+def record_history(snapshot):
+    global history, history_gpus, rollup
+    if snapshot.ngpus > history_gpus:
+        history = RingBuffer(timeline_columns(snapshot.ngpus), HISTORY)
+        history_gpus = snapshot.ngpus
+        rollup = Rollup(history.columns)
+        if store is not None:
+            store.set_columns(history.columns)
+            rollup.load(store.read(columns=history.columns))
+        # The spare timeline has too few lines now
+        timeline_layouts.invalidate()
+    if not history_gpus:
+        return
+    # GPUs that vanished since discovery leave a gap in their line
+    gpu = np.full(history_gpus, np.nan)
+    mem = np.full(history_gpus, np.nan)
+    gpu[: snapshot.ngpus] = snapshot.utilization
+    mem[: snapshot.ngpus] = snapshot.memory
+    # Failed readings are left out of the lines and the totals
+    gpu[gpu == -1] = np.nan
+    mem[mem == -1] = np.nan
+    row = np.concatenate(([snapshot.time * 1000, _mean(gpu), _mean(mem)], gpu, mem))
+    history.append(row)
+    rollup.append(row)
+    if store is not None:
+        store.append(row)
+
+
+sampler.add_listener(record_history)
+
+# (snapshot field, figure title) of the telemetry timeline
+TELEMETRY = (
+    ("clock", "GPU Clock Frequency [Mhz]"),
+    ("pcie", "PCIe Bandwidth [MB/s]"),
+    ("voltage", "Voltage [mV]"),
+    ("power", "Power [W]"),
+    ("temperature", "Temperature [C]"),
+)
 
 
-ngpus = amd.get_gpu_count()
-gpu_handles = [i for i in range(ngpus)]
+def telemetry_columns(ngpus):
+    return ["time"] + [field + "-" + str(i) for field, _ in TELEMETRY for i in range(ngpus)]
 
-def gpu(doc):
-    fig = figure(title="GPU Utilization", sizing_mode="stretch_both", x_range=[0, 100])
 
-    def get_utilization():
-        return amd.get_gpu_utilization()
+telemetry = RingBuffer(telemetry_columns(0), HISTORY)
+telemetry_gpus = 0
 
-    gpu = get_utilization()
-    y = list(range(len(gpu)))
-    source = ColumnDataSource({"right": y, "gpu": gpu})
+
+def record_telemetry(snapshot):
+    global telemetry, telemetry_gpus
+    if snapshot.ngpus > telemetry_gpus:
+        telemetry = RingBuffer(telemetry_columns(snapshot.ngpus), HISTORY)
+        telemetry_gpus = snapshot.ngpus
+        telemetry_layouts.invalidate()
+    if not telemetry_gpus:
+        return
+    values = np.full((len(TELEMETRY), telemetry_gpus), np.nan)
+    for row, (field, _) in zip(values, TELEMETRY):
+        reading = getattr(snapshot, field)
+        row[: len(reading)] = reading
+    # Failed readings leave a gap in the line
+    values[values == -1] = np.nan
+    telemetry.append(np.concatenate(([snapshot.time * 1000], values.ravel())))
+
+
+sampler.add_listener(record_telemetry)
+
+
+# Evaluated on every GPU snapshot; --alerts and --alert-webhook configure it
+alerts = AlertEngine(sinks=[LogSink()])
+sampler.add_listener(alerts)
+ALERT_COLOR = "red"
+
+
+def alert_column(ngpus):
+    """1 for the GPUs with a firing alert, 0 for the others."""
+    firing = alerts.firing
+    return [1 if i < len(firing) and firing[i] else 0 for i in range(ngpus)]
+
+
+def _bar_layout(title, column):
+    fig = figure(title=title, sizing_mode="stretch_both", x_range=[0, 100])
+
+    source = ColumnDataSource({"right": [], column: [], "alert": []})
     mapper = LinearColorMapper(palette=all_palettes["RdYlBu"][4], low=0, high=100)
 
     fig.hbar(
         source=source,
         y="right",
-        right="gpu",
+        right=column,
         height=0.8,
-        color={"field": "gpu", "transform": mapper},
+        fill_color={"field": column, "transform": mapper},
+        # Outlines the bars of GPUs with a firing alert
+        line_color=ALERT_COLOR,
+        line_width=3,
+        line_alpha="alert",
     )
 
     fig.toolbar_location = None
+    return fig, source
+
+
+gpu_layouts = Prebuilt(lambda: _bar_layout("GPU Utilization", "gpu"))
+gpu_mem_layouts = Prebuilt(lambda: _bar_layout("GPU Memory Utilization", "memory"))
+
+
+def gpu(doc, interval=500):
+    fig, source = gpu_layouts.take()
+
+    subscribe(doc, sampler)
+    snapshot = sampler.snapshot
+
+    def get_utilization():
+        return list(sampler.snapshot.utilization) if sampler.snapshot else []
+
+    gpu = get_utilization()
+    source.data = {"right": list(range(len(gpu))), "gpu": gpu, "alert": alert_column(len(gpu))}
 
     doc.title = "GPU Utilization [%]"
     doc.add_root(fig)
 
     def cb():
-        source.data.update({"gpu": get_utilization()})
+        nonlocal snapshot
+        if sampler.snapshot is snapshot:
+            return
+        snapshot = sampler.snapshot
+        values = get_utilization()
+        alert = alert_column(len(values))
+        patched = patch_changed(source, "gpu", values, DEADBAND)
+        if not (patched and patch_changed(source, "alert", alert)):
+            # The first sample arrived after the document was built
+            source.data.update(
+                {"right": list(range(len(values))), "gpu": values, "alert": alert}
+            )
+
+    doc.add_periodic_callback(timed("callback.gpu", cb), interval)
 
-    doc.add_periodic_callback(cb, 500)
 
+def gpu_mem(doc, interval=500):
+    fig, source = gpu_mem_layouts.take()
 
-def gpu_mem(doc):
-    fig = figure(title="GPU Memory Utilization", sizing_mode="stretch_both", x_range=[0, 100])
+    subscribe(doc, sampler)
+    snapshot = sampler.snapshot
 
     def get_utilization():
-        return amd.get_gpu_vram_use()
+        return list(sampler.snapshot.memory) if sampler.snapshot else []
 
     gpu = get_utilization()
-    y = list(range(len(gpu)))
-    source = ColumnDataSource({"right": y, "memory": gpu})
-    mapper = LinearColorMapper(palette=all_palettes["RdYlBu"][4], low=0, high=100)
-
-    fig.hbar(
-        source=source,
-        y="right",
-        right="memory",
-        height=0.8,
-        color={"field": "memory", "transform": mapper},
-    )
-
-    fig.toolbar_location = None
+    source.data = {
+        "right": list(range(len(gpu))), "memory": gpu, "alert": alert_column(len(gpu))
+    }
 
     doc.title = "GPU Memory Utilization [%]"
     doc.add_root(fig)
 
     def cb():
-        source.data.update({"memory": get_utilization()})
-
-    doc.add_periodic_callback(cb, 500)
-
-def gpu_clock_frequency(doc):
-   
+        nonlocal snapshot
+        if sampler.snapshot is snapshot:
+            return
+        snapshot = sampler.snapshot
+        values = get_utilization()
+        alert = alert_column(len(values))
+        patched = patch_changed(source, "memory", values, DEADBAND)
+        if not (patched and patch_changed(source, "alert", alert)):
+            # The first sample arrived after the document was built
+            source.data.update(
+                {"right": list(range(len(values))), "memory": values, "alert": alert}
+            )
+
+    doc.add_periodic_callback(timed("callback.gpu_mem", cb), interval)
+
+
+def _clock_layout():
     fig = figure(title="GPU Clock Frequency [Mhz]", sizing_mode="stretch_both", y_range=[0, 1500])
 
-    frequency = amd.get_gpu_clock_freq()
-    print(frequency)
-    left = list(range(len(frequency)))
-    right = [l + 0.8 for l in left]
-
-    source = ColumnDataSource({"left": left, "right": right, "frequency": frequency})
+    source = ColumnDataSource({"left": [], "right": [], "frequency": []})
     mapper = LinearColorMapper(palette=all_palettes["RdYlBu"][4], low=0, high=4000)
 
     fig.quad(
@@ -195,53 +254,77 @@ def gpu_clock_frequency(doc):
         top="frequency",
         color={"field": "frequency", "transform": mapper},
     )
+    return fig, source
 
-    doc.title = "GPU Clock Frequency"
-    doc.add_root(fig)
 
-    def cb():
-        source.data.update({"frequency": frequency})
+clock_layouts = Prebuilt(_clock_layout)
 
-    doc.add_periodic_callback(cb, 500)
 
+def gpu_clock_frequency(doc, interval=500):
+    fig, source = clock_layouts.take()
 
+    subscribe(doc, sampler)
+    snapshot = sampler.snapshot
 
+    def get_frequency():
+        return list(sampler.snapshot.clock) if sampler.snapshot else []
 
+    def set_bars(frequency):
+        left = list(range(len(frequency)))
+        source.data = {"left": left, "right": [l + 0.8 for l in left], "frequency": frequency}
 
-def gpu_resource_timeline(doc):
+    set_bars(get_frequency())
+
+    doc.title = "GPU Clock Frequency"
+    doc.add_root(fig)
+
+    def cb():
+        nonlocal snapshot
+        if sampler.snapshot is snapshot:
+            return
+        snapshot = sampler.snapshot
+        frequency = get_frequency()
+        if not patch_changed(source, "frequency", frequency):
+            set_bars(frequency)
+
+    doc.add_periodic_callback(timed("callback.gpu_clock_frequency", cb), interval)
+
+
+def _get_color(ind):
+    color_list = [
+        "blue",
+        "red",
+        "green",
+        "black",
+        "brown",
+        "cyan",
+        "orange",
+        "pink",
+        "purple",
+        "gold",
+    ]
+    return color_list[ind % len(color_list)]
+
+
+def _add_device_lines(gpu_fig, memory_fig, source, start, stop):
+    for i in range(start, stop):
+        memory_fig.line(
+            source=source, x="time", y="memory-" + str(i), color=_get_color(i)
+        )
+        gpu_fig.line(source=source, x="time", y="gpu-" + str(i), color=_get_color(i))
+
+
+def _timeline_layout():
 
     gpu_mem_max = 100
-    gpu_mem_sum = gpu_mem_max * ngpus
+    # Lines for the GPUs known so far; sessions add any discovered later
+    ngpus = history_gpus
 
     # Shared X Range for all plots
     x_range = DataRange1d(follow="end", follow_interval=20000, range_padding=0)
     tools = "reset,xpan,xwheel_zoom"
 
-    item_dict = {
-        "time": [],
-        "gpu-total": [],
-        "memory-total": [],
-    }
-    for i in range(ngpus):
-        item_dict["gpu-" + str(i)] = []
-        item_dict["memory-" + str(i)] = []
-
-    source = ColumnDataSource(item_dict)
-
-    def _get_color(ind):
-        color_list = [
-            "blue",
-            "red",
-            "green",
-            "black",
-            "brown",
-            "cyan",
-            "orange",
-            "pink",
-            "purple",
-            "gold",
-        ]
-        return color_list[ind % len(color_list)]
+    source = ColumnDataSource({c: [] for c in timeline_columns(ngpus)})
 
     memory_fig = figure(
         title="Memory Utilization (per Device) [B]",
@@ -251,10 +334,6 @@ def gpu_resource_timeline(doc):
         x_range=x_range,
         tools=tools,
     )
-    for i in range(ngpus):
-        memory_fig.line(
-            source=source, x="time", y="memory-" + str(i), color=_get_color(i)
-        )
     memory_fig.yaxis.formatter = NumeralTickFormatter(format="0.0 b")
 
     gpu_fig = figure(
@@ -265,8 +344,6 @@ def gpu_resource_timeline(doc):
         x_range=x_range,
         tools=tools,
     )
-    for i in range(ngpus):
-        gpu_fig.line(source=source, x="time", y="gpu-" + str(i), color=_get_color(i))
 
     tot_fig = figure(
         title="Total Utilization [%]",
@@ -284,31 +361,119 @@ def gpu_resource_timeline(doc):
     )
     tot_fig.legend.location = "top_left"
 
+    _add_device_lines(gpu_fig, memory_fig, source, 0, ngpus)
+
+    root = column(gpu_fig, memory_fig, tot_fig, sizing_mode="stretch_both")
+    return root, source, x_range, gpu_fig, memory_fig, ngpus
+
+
+timeline_layouts = Prebuilt(_timeline_layout)
+
+
+def gpu_resource_timeline(doc, interval=1000):
+
+    root, source, x_range, gpu_fig, memory_fig, ngpus = timeline_layouts.take()
+
     doc.title = "Resource Timeline"
-    doc.add_root(
-        column(gpu_fig, memory_fig, tot_fig, sizing_mode="stretch_both")
-    )
+    doc.add_root(root)
+
+    timeline = TimelineStream(source, x_range, HISTORY)
+
+    def attach():
+        # Start from the shared history, adding lines for new devices
+        nonlocal ngpus
+        timeline.attach(history, rollup)
+        _add_device_lines(gpu_fig, memory_fig, source, ngpus, history_gpus)
+        ngpus = max(ngpus, history_gpus)
+
+    subscribe(doc, sampler)
+    attach()
+
+    def cb():
+        if history is not timeline.buffer:
+            attach()
+        timeline.update()
+
+    doc.add_periodic_callback(timed("callback.gpu_resource_timeline", cb), interval)
+
+
+def _add_telemetry_lines(figs, source, start, stop):
+    for field, fig in figs.items():
+        # Adding items to the legend directly; legend_label searches the plot per line
+        fig.legend[0].items.extend(
+            LegendItem(
+                label="GPU " + str(i),
+                renderers=[
+                    fig.line(source=source, x="time", y=field + "-" + str(i), color=_get_color(i))
+                ],
+            )
+            for i in range(start, stop)
+        )
+
+
+def _telemetry_layout():
+    # Lines for the GPUs known so far; sessions add any discovered later
+    ngpus = telemetry_gpus
+
+    # Shared X Range for all plots
+    x_range = DataRange1d(follow="end", follow_interval=20000, range_padding=0)
+    tools = "reset,xpan,xwheel_zoom"
+
+    source = ColumnDataSource({c: [] for c in telemetry_columns(ngpus)})
+
+    figs = {
+        field: figure(
+            title=title,
+            sizing_mode="stretch_both",
+            x_axis_type="datetime",
+            # Rescale to the series left visible
+            y_range=DataRange1d(only_visible=True),
+            x_range=x_range,
+            tools=tools,
+        )
+        for field, title in TELEMETRY
+    }
+    for fig in figs.values():
+        # Hiding a series happens in the browser, no new samples are taken
+        fig.add_layout(Legend(click_policy="hide", location="top_left"))
+    _add_telemetry_lines(figs, source, 0, ngpus)
+
+    root = column(*figs.values(), sizing_mode="stretch_both")
+    return root, source, figs, ngpus
+
+
+telemetry_layouts = Prebuilt(_telemetry_layout)
+
+
+def gpu_telemetry_timeline(doc, interval=1000):
+
+    root, source, figs, ngpus = telemetry_layouts.take()
+
+    doc.title = "Telemetry Timeline"
+    doc.add_root(root)
+
+    buffer = None
+    cursor = 0
+
+    def attach():
+        # Start from the shared history, adding lines for new devices
+        nonlocal buffer, cursor, ngpus
+        buffer = telemetry
+        cursor = buffer.count
+        source.data = buffer.view()
+        _add_telemetry_lines(figs, source, ngpus, telemetry_gpus)
+        ngpus = max(ngpus, telemetry_gpus)
 
-    last_time = time.time()
+    subscribe(doc, sampler)
+    attach()
 
     def cb():
-        nonlocal last_time
-        now = time.time()
-        src_dict = {"time": [now * 1000]}
-        gpu_tot = 0
-        mem_tot = 0
-        gpu = amd.get_gpu_utilization()
-        mem = amd.get_gpu_vram_use()
-        for i in range(ngpus):
-            gpu_tot += gpu[i]
-            mem_tot += mem[i]
-            src_dict["gpu-" + str(i)] = [gpu[i]]
-            src_dict["memory-" + str(i)] = [mem[i]]
-        src_dict["gpu-total"] = [gpu_tot / ngpus]
-        src_dict["memory-total"] = [(mem_tot / gpu_mem_sum) * 100]
-
-        source.stream(src_dict, 1000)
-
-        last_time = now
-
-    doc.add_periodic_callback(cb, 1000)
+        nonlocal cursor
+        if telemetry is not buffer:
+            attach()
+        if buffer.count != cursor:
+            with timer("stream"):
+                source.stream(buffer.view(since=cursor), HISTORY)
+            cursor = buffer.count
+
+    doc.add_periodic_callback(timed("callback.gpu_telemetry_timeline", cb), interval)
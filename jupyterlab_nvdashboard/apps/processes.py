@@ -0,0 +1,66 @@
+from bokeh.models import ColumnDataSource, DataTable, NumberFormatter, TableColumn
+
+from jupyterlab_nvdashboard.apps import gpu
+from jupyterlab_nvdashboard.processes import ProcessCollector, ProcessSnapshot
+from jupyterlab_nvdashboard.sampler import Sampler
+from jupyterlab_nvdashboard.stats import timed
+from jupyterlab_nvdashboard.utils import subscribe
+
+
+# The GPU sampler's worker also runs the process scans, so the provider is
+# never queried from two threads at once
+sampler = Sampler(
+    ProcessCollector(gpu.provider), 2000, executor=gpu.sampler.executor, name="processes"
+)
+
+# Field, title, width and number format of the table columns
+COLUMNS = (
+    ("pid", "PID", 60, None),
+    ("name", "Name", 120, None),
+    ("user", "User", 90, None),
+    ("gpus", "GPUs", 60, None),
+    ("vram", "VRAM", 90, "0.0 b"),
+    ("cpu", "CPU [%]", 70, "0.0"),
+    ("rss", "Memory", 90, "0.0 b"),
+    ("command", "Command", 400, None),
+)
+
+
+def table_data(snapshot):
+    if snapshot is None:
+        return {name: [] for name in ProcessSnapshot._fields if name != "time"}
+    data = snapshot._asdict()
+    del data["time"]
+    return {name: list(values) for name, values in data.items()}
+
+
+def gpu_processes(doc, interval=2000):
+    subscribe(doc, sampler)
+    snapshot = sampler.snapshot
+
+    source = ColumnDataSource(table_data(snapshot))
+    # Models belong to a single document, so every session gets its own formatters
+    columns = [
+        TableColumn(
+            field=field,
+            title=title,
+            width=width,
+            **({"formatter": NumberFormatter(format=number)} if number else {}),
+        )
+        for field, title, width, number in COLUMNS
+    ]
+    table = DataTable(
+        source=source, columns=columns, index_position=None, sizing_mode="stretch_both"
+    )
+
+    doc.title = "GPU Processes"
+    doc.add_root(table)
+
+    def cb():
+        nonlocal snapshot
+        if sampler.snapshot is snapshot:
+            return
+        snapshot = sampler.snapshot
+        source.data = table_data(snapshot)
+
+    doc.add_periodic_callback(timed("callback.gpu_processes", cb), interval)
@@ -0,0 +1,106 @@
+"""
+Prometheus text exposition of the shared sampler snapshots.
+
+Scrapes are answered from the samplers' cache, so they never start
+``rocm-smi`` or walk psutil themselves. The text of each sampler is rendered
+once per new snapshot and reused by every scrape until the next tick.
+"""
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from tornado import web
+
+from jupyterlab_nvdashboard.sampler import Sampler
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric(NamedTuple):
+    field: str
+    name: str
+    help: str
+    # Label of the index of per-device values
+    label: Optional[str] = None
+
+
+GPU_METRICS = (
+    Metric("utilization", "nvdashboard_gpu_utilization_percent", "GPU utilization.", "gpu"),
+    Metric("memory", "nvdashboard_gpu_memory_used_percent", "Used GPU memory.", "gpu"),
+    Metric("clock", "nvdashboard_gpu_clock_megahertz", "GPU shader clock.", "gpu"),
+    Metric("temperature", "nvdashboard_gpu_temperature_celsius", "GPU edge temperature.", "gpu"),
+    Metric("power", "nvdashboard_gpu_power_watts", "Average GPU package power.", "gpu"),
+    Metric("voltage", "nvdashboard_gpu_voltage_millivolts", "GPU voltage.", "gpu"),
+    Metric("pcie", "nvdashboard_gpu_pcie_megabytes_per_second", "PCIe bandwidth.", "gpu"),
+)
+HOST_METRICS = (
+    Metric("cpu", "nvdashboard_cpu_utilization_percent", "CPU utilization of all cores."),
+    Metric(
+        "cpu_per_core",
+        "nvdashboard_cpu_core_utilization_percent",
+        "CPU utilization per core.",
+        "core",
+    ),
+    Metric("memory", "nvdashboard_memory_used_bytes", "Used host memory."),
+    Metric("disk_read", "nvdashboard_disk_read_bytes_per_second", "Disk read rate."),
+    Metric("disk_write", "nvdashboard_disk_write_bytes_per_second", "Disk write rate."),
+    Metric("net_recv", "nvdashboard_network_receive_bytes_per_second", "Network receive rate."),
+    Metric("net_sent", "nvdashboard_network_transmit_bytes_per_second", "Network transmit rate."),
+)
+
+
+def render(snapshot: NamedTuple, metrics: Sequence[Metric]) -> str:
+    """Format ``snapshot`` in the Prometheus text format.
+
+    Values of -1 mark failed readings and are left out.
+    """
+    lines = []
+    for metric in metrics:
+        value = getattr(snapshot, metric.field)
+        lines.append("# HELP {} {}".format(metric.name, metric.help))
+        lines.append("# TYPE {} gauge".format(metric.name))
+        if metric.label is None:
+            lines.append("{} {}".format(metric.name, float(value)))
+            continue
+        for index, item in enumerate(value):
+            if item != -1:
+                lines.append('{}{{{}="{}"}} {}'.format(metric.name, metric.label, index, float(item)))
+    return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    """Keep the rendered text of every sampler until its snapshot changes."""
+
+    def __init__(self, samplers: Dict[str, Tuple[Sampler, Sequence[Metric]]]):
+        self.samplers = samplers
+        self._cache: Dict[str, Tuple[NamedTuple, str]] = {}
+
+    def text(self, name: str) -> str:
+        sampler, metrics = self.samplers[name]
+        snapshot = sampler.snapshot
+        if snapshot is None:
+            return ""
+        cached = self._cache.get(name)
+        if cached is None or cached[0] is not snapshot:
+            cached = self._cache[name] = (snapshot, render(snapshot, metrics))
+        return cached[1]
+
+    async def scrape(self) -> str:
+        parts = []
+        for name, (sampler, _) in self.samplers.items():
+            if sampler.snapshot is None:
+                await sampler.sample_async()
+            # Keep the sampler alive for scrapes, at the idle rate without dashboards
+            sampler.start()
+            parts.append(self.text(name))
+        return "".join(parts)
+
+
+class PrometheusHandler(web.RequestHandler):
+    """ The latest samples in the Prometheus text exposition format """
+
+    def initialize(self, exporter: Exporter):
+        self.exporter = exporter
+
+    async def get(self):
+        self.set_header("Content-Type", CONTENT_TYPE)
+        self.write(await self.exporter.scrape())
@@ -1,27 +1,65 @@
 import json
 
 from jupyter_server.base.handlers import APIHandler
-from jupyter_server.utils import url_path_join
+from jupyter_server.utils import ensure_async, url_path_join
+from tornado.ioloop import IOLoop
 import tornado
 
+from jupyterlab_nvdashboard.kernels import REFRESH_INTERVAL, KernelMonitor, KernelProcess
+from jupyterlab_nvdashboard.providers import get_provider
+
+
+def kernel_pid(kernel_manager):
+    """Return the local pid of a kernel, or None for remote or dead kernels."""
+    provisioner = getattr(kernel_manager, "provisioner", None)
+    pid = getattr(provisioner, "pid", None)
+    if pid is None:
+        # jupyter_client < 7 keeps the Popen of the kernel
+        pid = getattr(getattr(kernel_manager, "kernel", None), "pid", None)
+    return pid
+
+
+class KernelUsageHandler(APIHandler):
+    """ CPU, memory and GPU usage of every running kernel and its notebook """
+
+    def initialize(self, monitor: KernelMonitor):
+        self.monitor = monitor
+
+    async def _kernels(self):
+        paths = {}
+        for session in await ensure_async(self.session_manager.list_sessions()):
+            if session.get("kernel"):
+                paths[session["kernel"]["id"]] = session.get("path", "")
+        kernels = []
+        for kernel_id in self.kernel_manager.list_kernel_ids():
+            manager = self.kernel_manager.get_kernel(kernel_id)
+            pid = kernel_pid(manager)
+            if pid is not None:
+                kernels.append(
+                    KernelProcess(kernel_id, pid, manager.kernel_name, paths.get(kernel_id, ""))
+                )
+        return kernels
 
-class RouteHandler(APIHandler):
     # The following decorator should be present on all verb methods (head, get, post,
     # patch, put, delete, options) to ensure only authorized user can request the
     # Jupyter server
     @tornado.web.authenticated
-    def get(self):
+    async def get(self):
+        kernels = await self._kernels()
+        # Walks /proc and may run rocm-smi, so off the server's IOLoop
+        usage = await IOLoop.current().run_in_executor(None, self.monitor.get, kernels)
         self.finish(
             json.dumps(
-                {"data": "This is /jupyterlab_nvdashboard/get_example endpoint!"}
+                {"interval": self.monitor.interval, "kernels": [u._asdict() for u in usage]}
             )
         )
 
 
-def setup_handlers(web_app):
+def setup_handlers(web_app, interval=REFRESH_INTERVAL):
     host_pattern = ".*$"
 
     base_url = web_app.settings["base_url"]
-    route_pattern = url_path_join(base_url, "jupyterlab_nvdashboard", "get_example")
-    handlers = [(route_pattern, RouteHandler)]
+    monitor = KernelMonitor(get_provider(), interval)
+    route_pattern = url_path_join(base_url, "jupyterlab_nvdashboard", "kernels")
+    handlers = [(route_pattern, KernelUsageHandler, {"monitor": monitor})]
     web_app.add_handlers(host_pattern, handlers)
@@ -0,0 +1,165 @@
+"""
+Persistent timeline history in memory-mapped, rotating segment files.
+
+Every segment is a ``.npy`` file with a fixed number of rows of a structured
+array, one float64 field per column. Samples are written in place through a
+writable memory map, and the rollups of the timelines are seeded by reading
+the segments through read-only maps, so history survives server restarts
+without being parsed.
+"""
+import atexit
+import glob
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR_ENV = "NVDASHBOARD_HISTORY_DIR"
+
+
+class HistoryStore:
+    """Append-only columnar samples of one timeline, split into segments.
+
+    The first column must be the sample time. A new segment is started when
+    the current one is full or the columns change, and the oldest segments
+    beyond ``max_segments`` are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        name: str,
+        columns: Sequence[str],
+        segment_rows: int = 7200,
+        max_segments: int = 24,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.columns: List[str] = list(columns)
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self._pattern = re.compile(re.escape(name) + r"-(\d+)\.npy$")
+        self._current: Optional[np.memmap] = None
+        self._rows = 0
+        self._resume()
+
+    def segments(self) -> List[str]:
+        """Return the paths of all segments, oldest first."""
+        paths = []
+        for path in glob.glob(os.path.join(self.directory, self.name + "-*.npy")):
+            match = self._pattern.search(path)
+            if match:
+                paths.append((int(match.group(1)), path))
+        return [path for _, path in sorted(paths)]
+
+    def _resume(self):
+        segments = self.segments()
+        if not segments:
+            return
+        try:
+            segment = np.load(segments[-1], mmap_mode="r+")
+        except (OSError, ValueError):
+            logger.exception("Could not reopen history segment %s", segments[-1])
+            return
+        if list(segment.dtype.names or ()) != self.columns:
+            return
+        # Rows are written in order, unwritten rows have no time
+        self._current = segment
+        self._rows = int(np.count_nonzero(~np.isnan(segment[self.columns[0]])))
+
+    def _rotate(self):
+        if self._current is not None:
+            self._current.flush()
+        segments = self.segments()
+        number = int(self._pattern.search(segments[-1]).group(1)) + 1 if segments else 0
+        path = os.path.join(self.directory, "{}-{:08d}.npy".format(self.name, number))
+        self._current = np.lib.format.open_memmap(
+            path,
+            mode="w+",
+            dtype=[(c, np.float64) for c in self.columns],
+            shape=(self.segment_rows,),
+        )
+        self._current[:] = np.nan
+        self._rows = 0
+        for old in segments[: max(len(segments) + 1 - self.max_segments, 0)]:
+            os.remove(old)
+
+    def set_columns(self, columns: Sequence[str]):
+        """Change the columns of the following rows."""
+        if list(columns) != self.columns:
+            self.close()
+            self.columns = list(columns)
+            # Continue the last segment if it was written with these columns
+            self._resume()
+
+    def append(self, row: Sequence[float]):
+        """Write one value per column to the current segment."""
+        if self._current is None or self._rows == self.segment_rows:
+            self._rotate()
+        self._current[self._rows] = tuple(row)
+        self._rows += 1
+
+    def read(
+        self, since: Optional[float] = None, columns: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Return the rows with a time of at least ``since``, oldest first.
+
+        Columns missing from older segments are filled with NaN.
+        """
+        columns = list(columns or self.columns)
+        time_column = self.columns[0]
+        parts = []
+        for path in reversed(self.segments()):
+            try:
+                segment = np.load(path, mmap_mode="r")
+            except (OSError, ValueError):
+                logger.exception("Could not read history segment %s", path)
+                continue
+            times = segment[time_column]
+            valid = ~np.isnan(times)
+            if since is not None:
+                valid &= times >= since
+            rows = segment[valid]
+            parts.append(
+                {
+                    c: rows[c] if c in rows.dtype.names else np.full(len(rows), np.nan)
+                    for c in columns
+                }
+            )
+            # Segments are in time order, older ones cannot match either
+            if since is not None and len(times) and times[0] < since:
+                break
+        parts.reverse()
+        return {
+            c: np.concatenate([p[c] for p in parts]) if parts else np.empty(0)
+            for c in columns
+        }
+
+    def close(self):
+        if self._current is not None:
+            self._current.flush()
+            self._current = None
+
+
+def open_store(name: str, columns: Sequence[str], directory: Optional[str] = None):
+    """Return a ``HistoryStore`` in ``directory``, or None if history is disabled.
+
+    The directory defaults to the ``NVDASHBOARD_HISTORY_DIR`` environment
+    variable.
+    """
+    directory = directory or os.environ.get(HISTORY_DIR_ENV)
+    if not directory:
+        return None
+    try:
+        store = HistoryStore(directory, name, columns)
+    except OSError:
+        logger.exception("Could not open the history in %s", directory)
+        return None
+    atexit.register(store.close)
+    return store
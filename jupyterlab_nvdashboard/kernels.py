@@ -0,0 +1,123 @@
+"""
+CPU, memory and GPU usage of the Jupyter kernels, summed over their process trees.
+
+A kernel's own pid only covers part of its work: multiprocessing workers,
+Dask or Spark local clusters and shell commands run in child processes.
+``KernelMonitor`` walks the process tree of every kernel from a single pass
+over ``psutil.process_iter``, which hands out the same ``psutil.Process``
+objects on every call, so CPU usage is measured over the time between
+refreshes. Refreshes happen at most every ``interval`` seconds, however
+many clients ask.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import List, Mapping, NamedTuple, Tuple
+
+import psutil
+
+from jupyterlab_nvdashboard.processes import gpu_processes
+
+
+# Seconds between two refreshes of the kernel usage
+REFRESH_INTERVAL = 5
+
+
+class KernelProcess(NamedTuple):
+    """What the Jupyter server knows about a running kernel."""
+
+    id: str
+    pid: int
+    name: str = ""  # kernel spec
+    path: str = ""  # notebook, empty for kernels without a session
+
+
+class KernelUsage(NamedTuple):
+    id: str
+    name: str
+    path: str
+    pid: int
+    pids: Tuple[int, ...]  # the kernel and all its descendants
+    cpu: float  # % of one core
+    rss: int  # B
+    gpus: Tuple[int, ...]
+    vram: int  # B, -1 if unknown
+
+
+def _descendants(pid: int, children: Mapping[int, List[int]]) -> List[int]:
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, ()))
+    return tree
+
+
+class KernelMonitor:
+    """Cached usage of kernels, refreshed at most every ``interval`` seconds.
+
+    ``provider`` is a metrics provider whose ``get_gpu_processes`` is used to
+    attribute GPUs and VRAM; without one, or while it fails, only CPU and
+    memory are reported.
+    """
+
+    def __init__(self, provider=None, interval: float = REFRESH_INTERVAL):
+        self.provider = provider
+        self.interval = interval
+        self.usage: List[KernelUsage] = []
+        self._kernels: Tuple[KernelProcess, ...] = ()
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def get(self, kernels: List[KernelProcess]) -> List[KernelUsage]:
+        """Return the usage of ``kernels``, refreshing it when stale.
+
+        Blocking; servers should call it from a worker thread.
+        """
+        kernels = tuple(kernels)
+        with self._lock:
+            now = time.monotonic()
+            stale = self._refreshed is None or now - self._refreshed >= self.interval
+            if stale or kernels != self._kernels:
+                self.usage = self.refresh(kernels)
+                self._kernels = kernels
+                self._refreshed = now
+            return self.usage
+
+    def refresh(self, kernels: Tuple[KernelProcess, ...]) -> List[KernelUsage]:
+        processes = {}
+        children = defaultdict(list)
+        for process in psutil.process_iter(["ppid"]):
+            processes[process.pid] = process
+            children[process.info["ppid"]].append(process.pid)
+        gpu = gpu_processes(self.provider)
+
+        usage = []
+        for kernel in kernels:
+            cpu, rss, gpus, vram = 0.0, 0, set(), None
+            pids = _descendants(kernel.pid, children) if kernel.pid in processes else []
+            for pid in pids:
+                process = processes[pid]
+                try:
+                    with process.oneshot():
+                        # 0 on the first reading of a process
+                        cpu += process.cpu_percent()
+                        rss += process.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                if pid in gpu:
+                    gpus.update(gpu[pid].gpus)
+                    if gpu[pid].vram is not None:
+                        vram = (vram or 0) + gpu[pid].vram
+            usage.append(
+                KernelUsage(
+                    kernel.id,
+                    kernel.name,
+                    kernel.path,
+                    kernel.pid,
+                    tuple(pids),
+                    round(cpu, 1),
+                    rss,
+                    tuple(sorted(gpus)),
+                    -1 if vram is None else vram,
+                )
+            )
+        return usage
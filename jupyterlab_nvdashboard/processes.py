@@ -0,0 +1,175 @@
+"""
+Attribute GPU and CPU usage to the processes of the host.
+
+A full ``psutil.process_iter`` reads several ``/proc`` files of every process
+on every call, which is most of a tick on hosts with thousands of processes.
+``ProcessTable`` keeps the ``psutil.Process`` of every pid instead and reads
+the name, user and command line once, when the pid first shows up. CPU and
+memory are re-read on every scan only for processes that used CPU in their
+last reading or hold a GPU; idle ones are re-read every ``idle_rescan``
+seconds, staggered over the interval.
+"""
+import heapq
+import logging
+import random
+import time
+import weakref
+from typing import Collection, Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+from jupyterlab_nvdashboard.rocm import GpuProcess
+
+
+logger = logging.getLogger(__name__)
+
+# Processes without a GPU shown by CPU usage
+TOP_PROCESSES = 20
+# Characters of the command line kept for the table
+COMMAND_LENGTH = 200
+
+
+class ProcessSnapshot(NamedTuple):
+    """The processes using a GPU, then the busiest others, as table columns."""
+
+    time: float
+    pid: Tuple[int, ...]
+    name: Tuple[str, ...]
+    user: Tuple[str, ...]
+    command: Tuple[str, ...]
+    gpus: Tuple[str, ...]  # comma separated GPU indices
+    vram: Tuple[int, ...]  # B, -1 if unknown
+    cpu: Tuple[float, ...]  # % of one core
+    rss: Tuple[int, ...]  # B
+
+
+class _Entry:
+    """A cached process and its latest reading."""
+
+    __slots__ = ("process", "name", "user", "command", "cpu", "rss", "due")
+
+    def __init__(self, process: psutil.Process, info: dict):
+        self.process = process
+        self.name = info["name"] or ""
+        self.user = info["username"] or ""
+        self.command = " ".join(info["cmdline"] or ())[:COMMAND_LENGTH]
+        self.cpu = 0.0
+        self.rss = 0
+        # Read again on the next scan; the first cpu_percent is always 0
+        self.due = 0.0
+
+
+class ProcessTable:
+    """Incrementally refreshed CPU and memory readings of every process."""
+
+    def __init__(self, idle_rescan: float = 10):
+        self.idle_rescan = idle_rescan
+        self.entries: Dict[int, _Entry] = {}
+
+    def _read(self, entry: _Entry, now: float) -> bool:
+        try:
+            with entry.process.oneshot():
+                entry.cpu = entry.process.cpu_percent()
+                entry.rss = entry.process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+        entry.due = now + self.idle_rescan * (0.5 + random.random())
+        return True
+
+    def _new(self, pid: int) -> Optional[_Entry]:
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                entry = _Entry(process, process.as_dict(["name", "username", "cmdline"]))
+                # Starts the CPU time interval of the next reading
+                process.cpu_percent()
+                entry.rss = process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        return entry
+
+    def scan(self, always: Collection[int] = ()) -> Dict[int, _Entry]:
+        """Refresh the table and return ``{pid: entry}``.
+
+        The pids in ``always`` are re-read even when they are idle.
+        """
+        now = time.monotonic()
+        entries = {}
+        for pid in psutil.pids():
+            entry = self.entries.get(pid)
+            if entry is not None and (entry.cpu or pid in always or entry.due <= now):
+                if entry.due <= now and not entry.process.is_running():
+                    # The pid was reused by a new process
+                    entry = None
+                elif not self._read(entry, now):
+                    continue
+            if entry is None:
+                entry = self._new(pid)
+                if entry is None:
+                    continue
+            entries[pid] = entry
+        self.entries = entries
+        return entries
+
+
+# Providers whose last get_gpu_processes failed, so a failure is logged once
+_failing_providers: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def gpu_processes(provider) -> Dict[int, GpuProcess]:
+    """Return the processes using a GPU, none without a provider or while it fails.
+
+    CPU and memory readings are still worth showing without GPUs, for
+    example where rocm-smi is missing.
+    """
+    if provider is None:
+        return {}
+    try:
+        gpu = provider.get_gpu_processes()
+    except Exception:
+        if provider not in _failing_providers:
+            logger.exception("Could not list the GPU processes")
+        _failing_providers.add(provider)
+        return {}
+    _failing_providers.discard(provider)
+    return gpu
+
+
+class ProcessCollector:
+    """Join the GPU processes of ``provider`` with the process table."""
+
+    def __init__(
+        self, provider, top: int = TOP_PROCESSES, table: Optional[ProcessTable] = None
+    ):
+        self.provider = provider
+        self.top = top
+        self.table = table or ProcessTable()
+
+    def __call__(self) -> ProcessSnapshot:
+        gpu = gpu_processes(self.provider)
+        entries = self.table.scan(always=gpu)
+        # GPU processes by VRAM, then the others by CPU usage
+        pids: List[int] = sorted(gpu, key=lambda pid: -(gpu[pid].vram or 0))
+        pids += heapq.nlargest(
+            self.top,
+            (pid for pid in entries if pid not in gpu),
+            key=lambda pid: entries[pid].cpu,
+        )
+        rows = []
+        for pid in pids:
+            entry = entries.get(pid)
+            process = gpu.get(pid)
+            rows.append(
+                (
+                    pid,
+                    entry.name if entry else "",
+                    entry.user if entry else "",
+                    entry.command if entry else "",
+                    ",".join(str(i) for i in process.gpus) if process else "",
+                    -1 if process is None or process.vram is None else process.vram,
+                    entry.cpu if entry else 0.0,
+                    entry.rss if entry else 0,
+                )
+            )
+        columns = tuple(zip(*rows)) if rows else ((),) * 8
+        return ProcessSnapshot(time.time(), *columns)
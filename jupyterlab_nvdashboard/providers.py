@@ -0,0 +1,239 @@
+"""
+Pluggable sources of GPU metrics for the dashboards.
+
+Every provider answers ``get_gpu_metrics(metrics)`` with one ``GpuRecord``
+per device, so the Bokeh apps and the sampler do not depend on a vendor.
+"""
+import importlib.util
+from abc import ABC, abstractmethod
+import math
+import os
+import random
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional
+
+from jupyterlab_nvdashboard.rocm import AmdGpuProperties, GpuProcess, GpuRecord
+from jupyterlab_nvdashboard.sysfs import SysfsGpuProperties
+
+
+class MetricsProvider(ABC):
+    """Base class of all GPU metrics providers."""
+
+    name = ""
+
+    @abstractmethod
+    def get_gpu_count(self) -> int:
+        """Return the number of GPUs, or 0 if none were found."""
+
+    @abstractmethod
+    def get_gpu_metrics(
+        self, metrics: Iterable[str] = ("utilization", "memory")
+    ) -> List[GpuRecord]:
+        """Return a ``GpuRecord`` per GPU with the requested fields filled in."""
+
+    def get_gpu_processes(self) -> Dict[int, GpuProcess]:
+        """Return ``{pid: GpuProcess}`` of the processes using a GPU."""
+        return {}
+
+    def close(self):
+        pass
+
+
+class RocmProvider(MetricsProvider):
+    """AMD GPUs through sysfs when possible, rocm-smi otherwise."""
+
+    name = "rocm"
+
+    def __init__(self, properties=None):
+        if properties is None:
+            if SysfsGpuProperties.available():
+                properties = SysfsGpuProperties()
+            else:
+                properties = AmdGpuProperties()
+        self.properties = properties
+
+    def get_gpu_count(self) -> int:
+        return max(self.properties.gpus or 0, 0)
+
+    def get_gpu_metrics(self, metrics=("utilization", "memory")):
+        return self.properties.get_gpu_metrics(metrics)
+
+    def get_gpu_processes(self):
+        return self.properties.get_gpu_processes()
+
+    def close(self):
+        if hasattr(self.properties, "close"):
+            self.properties.close()
+
+
+class NvmlProvider(MetricsProvider):
+    """NVIDIA GPUs through pynvml.
+
+    Device handles are looked up on first use and cached; each sample walks
+    the handles a single time and only issues the NVML calls for the
+    requested metrics.
+    """
+
+    name = "nvml"
+
+    # Seconds before the device count is checked again
+    discovery_interval = 60
+
+    def __init__(self, nvml=None):
+        if nvml is None:
+            import pynvml as nvml
+        self.nvml = nvml
+        self._handles = None
+        self._discovered = None
+        self._queries = {
+            "utilization": lambda h: nvml.nvmlDeviceGetUtilizationRates(h).gpu,
+            "memory": self._memory,
+            "clock": lambda h: nvml.nvmlDeviceGetClockInfo(h, nvml.NVML_CLOCK_SM),
+            "temperature": lambda h: float(
+                nvml.nvmlDeviceGetTemperature(h, nvml.NVML_TEMPERATURE_GPU)
+            ),
+            "power": lambda h: nvml.nvmlDeviceGetPowerUsage(h) / 1000,
+            "voltage": lambda h: None,
+            "pcie": self._pcie,
+        }
+
+    @property
+    def handles(self) -> list:
+        now = time.monotonic()
+        if self._discovered is None or now - self._discovered > self.discovery_interval:
+            if self._handles is None:
+                self.nvml.nvmlInit()
+            count = self.nvml.nvmlDeviceGetCount()
+            if self._handles is None or len(self._handles) != count:
+                self._handles = [self.nvml.nvmlDeviceGetHandleByIndex(i) for i in range(count)]
+            self._discovered = now
+        return self._handles
+
+    def _memory(self, handle) -> int:
+        info = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+        return round(info.used / info.total * 100)
+
+    def _pcie(self, handle) -> float:
+        # Throughput counters are reported in KB/s
+        nvml = self.nvml
+        rx = nvml.nvmlDeviceGetPcieThroughput(handle, nvml.NVML_PCIE_UTIL_RX_BYTES)
+        tx = nvml.nvmlDeviceGetPcieThroughput(handle, nvml.NVML_PCIE_UTIL_TX_BYTES)
+        return (rx + tx) / 1024
+
+    def _query(self, metric: str, handle):
+        try:
+            return self._queries[metric](handle)
+        except self.nvml.NVMLError:
+            return None
+
+    def get_gpu_count(self) -> int:
+        return len(self.handles)
+
+    def get_gpu_metrics(self, metrics=("utilization", "memory")):
+        metrics = tuple(metrics)
+        return [
+            GpuRecord(index, **{m: self._query(m, handle) for m in metrics})
+            for index, handle in enumerate(self.handles)
+        ]
+
+    def get_gpu_processes(self):
+        gpus: Dict[int, List[int]] = {}
+        vram: Dict[int, int] = {}
+        nvml = self.nvml
+        for index, handle in enumerate(self.handles):
+            try:
+                running = nvml.nvmlDeviceGetComputeRunningProcesses(handle)
+                running += nvml.nvmlDeviceGetGraphicsRunningProcesses(handle)
+            except nvml.NVMLError:
+                continue
+            for process in running:
+                # Processes doing compute and graphics are listed twice
+                if index in gpus.setdefault(process.pid, []):
+                    continue
+                gpus[process.pid].append(index)
+                # usedGpuMemory is None where the driver does not report it
+                vram[process.pid] = vram.get(process.pid, 0) + (process.usedGpuMemory or 0)
+        return {pid: GpuProcess(pid, tuple(gpus[pid]), vram[pid]) for pid in gpus}
+
+    def close(self):
+        if self._handles is not None:
+            self.nvml.nvmlShutdown()
+            self._handles = None
+            self._discovered = None
+
+
+class SyntheticProvider(MetricsProvider):
+    """Deterministic fake GPUs for demos and benchmarks without hardware.
+
+    Every call advances one step along smooth per-device waveforms, so the
+    same ``seed`` always yields the same sequence of records.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, ngpus: int = 4, seed: int = 0, period: int = 60):
+        rng = random.Random(seed)
+        self.ngpus = ngpus
+        self.period = period
+        self.phases = [rng.random() for _ in range(ngpus)]
+        self.step = 0
+
+    def _wave(self, index: int, low: float, high: float, speed: float = 1.0) -> float:
+        angle = 2 * math.pi * (self.step * speed / self.period + self.phases[index])
+        return low + (high - low) * (1 + math.sin(angle)) / 2
+
+    def _record(self, index: int, metrics) -> GpuRecord:
+        values = {
+            "utilization": lambda: round(self._wave(index, 0, 100)),
+            "memory": lambda: round(self._wave(index, 5, 95, 0.25)),
+            "clock": lambda: round(self._wave(index, 500, 1500)),
+            "temperature": lambda: round(self._wave(index, 30, 80, 0.5), 1),
+            "power": lambda: round(self._wave(index, 15, 225), 1),
+            "voltage": lambda: round(self._wave(index, 700, 1100)),
+            "pcie": lambda: round(self._wave(index, 0, 16000, 2), 3),
+        }
+        return GpuRecord(index, **{m: values[m]() for m in metrics})
+
+    def get_gpu_count(self) -> int:
+        return self.ngpus
+
+    def get_gpu_metrics(self, metrics=("utilization", "memory")):
+        metrics = tuple(metrics)
+        records = [self._record(i, metrics) for i in range(self.ngpus)]
+        self.step += 1
+        return records
+
+    def get_gpu_processes(self):
+        # The dashboard server itself, so the process view has a row to show
+        pid = os.getpid()
+        return {pid: GpuProcess(pid, (0,), round(self._wave(0, 1, 8, 0.25)) << 30)}
+
+
+PROVIDERS = {
+    provider.name: provider for provider in (RocmProvider, NvmlProvider, SyntheticProvider)
+}
+
+
+def get_provider(name: Optional[str] = None) -> MetricsProvider:
+    """Create the provider called ``name``, or detect one when it is "auto".
+
+    The name defaults to the ``NVDASHBOARD_PROVIDER`` environment variable.
+    Detection prefers amdgpu sysfs, then rocm-smi, then NVML. It only looks
+    for files and modules; no device is queried until the first sample.
+    """
+    name = name or os.environ.get("NVDASHBOARD_PROVIDER", "auto")
+    if name != "auto":
+        try:
+            return PROVIDERS[name]()
+        except KeyError:
+            raise ValueError(
+                "Unknown metrics provider {!r}, expected one of {}".format(
+                    name, ", ".join(["auto"] + sorted(PROVIDERS))
+                )
+            )
+    if SysfsGpuProperties.available() or shutil.which("rocm-smi"):
+        return RocmProvider()
+    if importlib.util.find_spec("pynvml") is not None:
+        return NvmlProvider()
+    return RocmProvider()
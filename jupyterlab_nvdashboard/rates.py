@@ -0,0 +1,70 @@
+"""
+Per-second rates of the I/O counters of a changing set of devices.
+"""
+import os
+from operator import attrgetter
+from typing import Dict, List, Mapping, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+
+SYS_BLOCK = "/sys/class/block"
+
+
+class CounterRates:
+    """Turn per-device counters, such as ``psutil.net_io_counters(pernic=True)``,
+    into per-second rates.
+
+    Devices are matched by name between readings. A device seen for the
+    first time has a rate of 0 until its second reading, and one that
+    vanished is forgotten. A counter that went down was reset, by a driver
+    reload or a device unplugged and plugged back in, or wrapped in a way
+    psutil's ``nowrap`` handling did not catch; it counts as 0 for that
+    reading and its new value becomes the baseline.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self._get = attrgetter(*self.fields)
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._values = np.zeros((0, len(self.fields)))
+        self._time = None
+
+    def update(
+        self, now: float, counters: Mapping[str, NamedTuple]
+    ) -> Tuple[List[str], np.ndarray]:
+        """Return the device names and a ``(devices, fields)`` array of rates."""
+        names = list(counters)
+        values = np.array([self._get(c) for c in counters.values()], dtype=float)
+        values = values.reshape(len(names), len(self.fields))
+        rates = np.zeros_like(values)
+        if self._time is not None and names:
+            if names == self._names:
+                known = slice(None)
+                last = self._values
+            else:
+                rows = np.array([self._rows.get(name, -1) for name in names])
+                known = rows >= 0
+                last = self._values[rows[known]]
+                self._rows = {name: i for i, name in enumerate(names)}
+            delta = values[known] - last
+            elapsed = (now - self._time) or 1e-9
+            rates[known] = np.where(delta >= 0, delta, 0) / elapsed
+        elif names != self._names:
+            self._rows = {name: i for i, name in enumerate(names)}
+        self._names, self._values, self._time = names, values, now
+        return names, rates
+
+
+class Partitions:
+    """Tell partitions, whose I/O is already counted by their disk, from disks."""
+
+    def __init__(self, root: str = SYS_BLOCK):
+        self.root = root
+        self._cache: Dict[str, bool] = {}
+
+    def __contains__(self, name: str) -> bool:
+        if name not in self._cache:
+            self._cache[name] = os.path.exists(os.path.join(self.root, name, "partition"))
+        return self._cache[name]
@@ -0,0 +1,173 @@
+"""
+Record the snapshots of the samplers to a file and replay them later.
+
+A recording is a gzip compressed text file with one JSON array per line. The
+first line of every sampler is a header ``{"sampler": name, "type": ...,
+"fields": [...]}``; every following line of it is ``[name, *snapshot]``.
+Recordings are appended to, and they can be read while they are written
+since the file is flushed every ``flush_interval`` seconds.
+
+Replaying puts ``Replay.collector(name)`` in place of the collector of the
+sampler ``name``, so the dashboards render recorded data exactly like live
+data, without a GPU, rocm-smi or the host's counters.
+"""
+import bisect
+import gzip
+import json
+import logging
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+from jupyterlab_nvdashboard.processes import ProcessSnapshot
+from jupyterlab_nvdashboard.sampler import DeviceRate, GpuSnapshot, HostSnapshot, Sampler
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TYPES = {cls.__name__: cls for cls in (GpuSnapshot, HostSnapshot, ProcessSnapshot)}
+# Fields holding tuples of NamedTuples
+NESTED_FIELDS = {"disks": DeviceRate, "nics": DeviceRate}
+# Seconds of a gap in a recording, such as a server restart, kept on replay
+MAX_GAP = 10
+
+
+class Recorder:
+    """Append every snapshot of the attached samplers to ``path``."""
+
+    def __init__(self, path: str, flush_interval: float = 10):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._headers: Dict[str, Tuple[str, ...]] = {}
+        self._flushed = time.monotonic()
+        self._listeners: List[Tuple[Sampler, object]] = []
+
+    def attach(self, name: str, sampler: Sampler):
+        def listener(snapshot):
+            self.write(name, snapshot)
+
+        sampler.add_listener(listener)
+        self._listeners.append((sampler, listener))
+
+    def write(self, name: str, snapshot: NamedTuple):
+        if self._file is None:
+            return
+        if self._headers.get(name) != snapshot._fields:
+            header = {"sampler": name, "type": type(snapshot).__name__, "fields": snapshot._fields}
+            self._file.write(json.dumps(header) + "\n")
+            self._headers[name] = snapshot._fields
+        self._file.write(json.dumps([name, *snapshot]) + "\n")
+        now = time.monotonic()
+        if now - self._flushed >= self.flush_interval:
+            self._file.flush()
+            self._flushed = now
+
+    def close(self):
+        for sampler, listener in self._listeners:
+            sampler.remove_listener(listener)
+        self._listeners = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _decode(cls, fields, values) -> NamedTuple:
+    snapshot = {}
+    for field, value in zip(fields, values):
+        if field not in cls._fields:
+            continue
+        if isinstance(value, list):
+            nested = NESTED_FIELDS.get(field)
+            value = tuple(nested._make(v) for v in value) if nested else tuple(value)
+        snapshot[field] = value
+    return cls(**snapshot)
+
+
+def read_recording(path: str) -> Iterator[Tuple[str, NamedTuple]]:
+    """Yield ``(sampler name, snapshot)`` in the order they were recorded.
+
+    A recording that is still being written ends at its last complete line.
+    """
+    headers = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut off by the last flush
+                    return
+                if isinstance(record, dict):
+                    cls = SNAPSHOT_TYPES.get(record["type"])
+                    headers[record["sampler"]] = (cls, record["fields"])
+                    continue
+                name, values = record[0], record[1:]
+                cls, fields = headers.get(name, (None, None))
+                if cls is not None:
+                    yield name, _decode(cls, fields, values)
+        except (EOFError, zlib.error):
+            return
+
+
+class Replay:
+    """Play a recording back ``speed`` times faster than it was recorded.
+
+    All samplers share one clock, which starts with the first collection,
+    so they stay in step. Every collector returns the last snapshot recorded
+    up to the current position, with the current time. Gaps longer than
+    ``max_gap`` seconds are shortened to it, and with ``loop`` the
+    recording starts over when it ends.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True, max_gap: float = MAX_GAP):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._offsets: Dict[str, List[float]] = {}
+        self._snapshots: Dict[str, List[NamedTuple]] = {}
+        records = sorted(read_recording(path), key=lambda record: record[1].time)
+        offset = gap = 0.0
+        last = records[0][1].time if records else 0.0
+        for name, snapshot in records:
+            gap = min(snapshot.time - last, max_gap)
+            offset += gap
+            last = snapshot.time
+            self._offsets.setdefault(name, []).append(offset)
+            self._snapshots.setdefault(name, []).append(snapshot)
+        # The last snapshot is shown as long as the one before it
+        self.duration = offset + gap
+        self._start = None
+
+    @property
+    def samplers(self) -> List[str]:
+        return list(self._snapshots)
+
+    def position(self) -> float:
+        """Return the seconds into the recording being played."""
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        position = (now - self._start) * self.speed
+        if self.loop and self.duration > 0:
+            return position % self.duration
+        return position
+
+    def collector(self, name: str):
+        offsets, snapshots = self._offsets[name], self._snapshots[name]
+
+        def collect():
+            index = max(bisect.bisect_right(offsets, self.position()) - 1, 0)
+            return snapshots[index]._replace(time=time.time())
+
+        return collect
+
+    def install(self, samplers: Dict[str, Sampler]):
+        """Collect the recorded snapshots instead of live ones, ``speed`` times as often."""
+        for name, sampler in samplers.items():
+            if name not in self._snapshots:
+                logger.warning("No %s snapshots in %s, sampling them live", name, self.path)
+                continue
+            sampler.collect = self.collector(name)
+            sampler.interval = max(int(sampler.interval / self.speed), 1)
+            sampler.idle_interval = max(int(sampler.idle_interval / self.speed), 1)
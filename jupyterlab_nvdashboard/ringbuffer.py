@@ -0,0 +1,115 @@
+"""
+Preallocated circular buffer for timeline history.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class RingBuffer:
+    """The last ``capacity`` rows of a fixed set of numeric columns.
+
+    Storage is allocated once. Every row is written twice, ``size`` slots
+    apart, so any window of recent rows is contiguous in memory and ``view``
+    can hand it out without copying. The ring holds twice ``capacity`` rows,
+    which keeps a view of up to ``capacity`` rows intact for at least
+    ``capacity`` further appends.
+    """
+
+    def __init__(self, columns: Sequence[str], capacity: int = 1000, dtype=np.float64):
+        self.columns: List[str] = list(columns)
+        self.capacity = capacity
+        self.size = 2 * capacity
+        self._data = np.full((len(self.columns), 2 * self.size), np.nan, dtype=dtype)
+        # Rows appended since creation; also the cursor sessions resume from
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, row: Sequence[float]):
+        """Append one value per column, overwriting the oldest row when full."""
+        i = self.count % self.size
+        self._data[:, i] = row
+        self._data[:, i + self.size] = row
+        self.count += 1
+
+    def extend(self, rows: np.ndarray):
+        """Append a ``(n, ncolumns)`` block of rows at once."""
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        kept = rows[-self.capacity :]
+        first = self.count + len(rows) - len(kept)
+        i = (first + np.arange(len(kept))) % self.size
+        self._data[:, i] = kept.T
+        self._data[:, i + self.size] = kept.T
+        self.count += len(rows)
+
+    def view(self, since: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return read-only views of the rows appended after ``since``.
+
+        Without ``since`` the last ``capacity`` rows are returned. Rows that
+        were already overwritten are silently skipped.
+        """
+        n = len(self)
+        if since is not None:
+            n = max(min(n, self.count - since), 0)
+        end = self.count % self.size + self.size
+        window = self._data[:, end - n : end]
+        window.flags.writeable = False
+        return dict(zip(self.columns, window))
+
+
+class DeviceHistory:
+    """One value per tick for each of a changing set of devices.
+
+    The series share one ``RingBuffer`` with a ``time`` column and a column
+    per device. When a new device shows up the buffer is replaced by a wider
+    copy, leaving out devices that have no value left in it; a device that
+    vanished reads NaN until then. Every ``window`` rows the devices are
+    ranked by their mean over those rows, busiest first, so sessions can
+    stream the few busy ones of many devices.
+    """
+
+    def __init__(self, capacity: int = 1000, window: int = 10):
+        self.capacity = capacity
+        self.window = window
+        self.buffer = RingBuffer(["time"], capacity)
+        self.ranking: List[str] = []
+        self._names: List[str] = []
+        self._index = np.zeros(0, dtype=int)
+
+    @property
+    def devices(self) -> List[str]:
+        return self.buffer.columns[1:]
+
+    def _widen(self, names: Sequence[str]):
+        data = self.buffer.view()
+        kept = [d for d in self.devices if d in names or not np.isnan(data[d]).all()]
+        columns = ["time"] + kept + [n for n in names if n not in kept]
+        rows = np.full((len(data["time"]), len(columns)), np.nan)
+        for i, column in enumerate(["time"] + kept):
+            rows[:, i] = data[column]
+        self.buffer = RingBuffer(columns, self.capacity)
+        self.buffer.extend(rows)
+        self.ranking = [d for d in self.ranking if d in kept]
+
+    def append(self, time: float, names: Sequence[str], values: np.ndarray):
+        if names != self._names:
+            if not set(names) <= set(self.devices):
+                self._widen(names)
+            columns = {c: i for i, c in enumerate(self.buffer.columns)}
+            self._names = list(names)
+            self._index = np.array([columns[n] for n in names], dtype=int)
+        row = np.full(len(self.buffer.columns), np.nan)
+        row[0] = time
+        row[self._index] = values
+        self.buffer.append(row)
+        if self.buffer.count % self.window == 0:
+            self._rank()
+
+    def _rank(self):
+        data = self.buffer.view(since=self.buffer.count - self.window)
+        recent = np.vstack([data[d] for d in self.devices]) if self.devices else np.zeros((0, 1))
+        load = np.nan_to_num(recent).mean(axis=1)
+        order = np.argsort(-load, kind="stable")
+        self.ranking = [self.devices[i] for i in order if load[i] > 0]
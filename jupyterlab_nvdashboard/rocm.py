@@ -0,0 +1,209 @@
+"""
+Query AMD GPUs through the ``rocm-smi`` command line tool.
+"""
+import json
+import logging
+import re
+import subprocess
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from jupyterlab_nvdashboard import rocm_parser
+from jupyterlab_nvdashboard.stats import timer
+
+
+logger = logging.getLogger(__name__)
+
+
+class GpuRecord(NamedTuple):
+    """Metrics of one GPU; fields that were not queried are ``None``."""
+
+    index: int
+    utilization: Optional[int] = None  # %
+    memory: Optional[int] = None  # VRAM used, %
+    clock: Optional[int] = None  # sclk, Mhz
+    temperature: Optional[float] = None  # edge, C
+    power: Optional[float] = None  # average package power, W
+    voltage: Optional[int] = None  # mV
+    pcie: Optional[float] = None  # estimated bandwidth, MB/s
+
+
+class GpuProcess(NamedTuple):
+    """GPU usage of one process."""
+
+    pid: int
+    gpus: Tuple[int, ...]  # indices of the GPUs the process has open
+    vram: Optional[int] = None  # B, summed over ``gpus``
+
+
+# rocm-smi flags needed for each ``GpuRecord`` field
+METRIC_FLAGS = {
+    "utilization": ("--showuse",),
+    "memory": ("--showmeminfo", "vram"),
+    "clock": ("--showgpuclocks",),
+    "temperature": ("--showtemp",),
+    "power": ("--showpower",),
+    "voltage": ("--showvoltage",),
+    "pcie": ("--showbw",),
+}
+
+# (field, label pattern, value pattern, type) for every label rocm-smi prints
+_FIELDS = [
+    ("utilization", re.compile(r"GPU use \(%\)"), re.compile(r"\d+"), int),
+    ("memory", re.compile(r"GPU Memory Allocated \(VRAM%\)"), re.compile(r"\d+"), int),
+    ("vram-total", re.compile(r"VRAM Total Memory \(B\)"), re.compile(r"\d+"), int),
+    ("vram-used", re.compile(r"VRAM Total Used Memory \(B\)"), re.compile(r"\d+"), int),
+    ("clock", re.compile(r"sclk clock"), re.compile(r"(\d+)\s*Mhz", re.I), int),
+    ("temperature", re.compile(r"Temperature \(Sensor edge\)"), re.compile(r"\d+(?:\.\d+)?"), float),
+    ("power", re.compile(r"Graphics Package Power"), re.compile(r"\d+(?:\.\d+)?"), float),
+    ("voltage", re.compile(r"Voltage \(mV\)"), re.compile(r"\d+"), int),
+    ("pcie", re.compile(r"PCIe bandwidth", re.I), re.compile(r"\d+(?:\.\d+)?"), float),
+]
+
+_CARD = re.compile(r"card(\d+)")
+# "PID  PROCESS NAME  GPU(s)  VRAM USED ..." rows of the KFD process table
+_KFD_ROW = re.compile(rb"^(\d+)\t[^\t]*\t\d+\t(\d+)", re.M)
+# "PID 1234 is using 2 DRM device(s):" followed by the device indices
+_PID_GPUS = re.compile(rb"^PID (\d+) is using \d+ DRM device\(s\):\s*\n([\d \t]*)$", re.M)
+
+
+def _parse_labels(labels: Dict[int, Dict[str, str]], metrics: Iterable[str]) -> List[GpuRecord]:
+    """Turn ``{gpu: {label: raw value}}`` into one ``GpuRecord`` per GPU."""
+    records = []
+    for index in sorted(labels):
+        values = {}
+        for label, raw in labels[index].items():
+            for field, label_re, value_re, cast in _FIELDS:
+                if field not in values and label_re.search(label):
+                    match = value_re.search(str(raw))
+                    if match:
+                        values[field] = cast(match.group(match.lastindex or 0))
+                    break
+        total = values.pop("vram-total", None)
+        used = values.pop("vram-used", None)
+        if "memory" not in values and total and used is not None:
+            values["memory"] = round(used / total * 100)
+        records.append(GpuRecord(index, **{m: values.get(m) for m in metrics}))
+    return records
+
+
+def parse_metrics(output: bytes, metrics: Iterable[str]) -> List[GpuRecord]:
+    """Parse the output of a combined rocm-smi query in a single pass.
+
+    ``--json`` output is preferred; older rocm-smi versions without it
+    print ``GPU[n] : label: value`` sections which carry the same labels.
+    """
+    metrics = tuple(metrics)
+    labels: Dict[int, Dict[str, str]] = {}
+    start = output.find(b"{")
+    try:
+        for card, fields in json.loads(output[start:] if start >= 0 else b"").items():
+            match = _CARD.fullmatch(card)
+            if match and isinstance(fields, dict):
+                labels[int(match.group(1))] = fields
+    except ValueError:
+        labels = rocm_parser.parse(output).sections
+    return _parse_labels(labels, metrics)
+
+
+def parse_pids(output: bytes) -> Dict[int, GpuProcess]:
+    """Parse ``rocm-smi --showpids --showpidgpus`` into ``{pid: GpuProcess}``."""
+    vram = {int(pid): int(used) for pid, used in _KFD_ROW.findall(output)}
+    gpus = {
+        int(pid): tuple(int(i) for i in indices.split())
+        for pid, indices in _PID_GPUS.findall(output)
+    }
+    return {
+        pid: GpuProcess(pid, gpus.get(pid, ()), vram.get(pid))
+        for pid in sorted(set(vram) | set(gpus))
+    }
+
+
+class AmdGpuProperties:
+    # Seconds before the cached GPU count is looked up again
+    discovery_interval = 60
+
+    def __init__(self, bash=subprocess, timeout=5):
+        self.bash = bash
+        self.timeout = timeout
+        self._gpus = None
+        self._discovered = None
+        # Whether rocm-smi was found missing, so it is only reported once
+        self._missing = False
+
+    @property
+    def gpus(self) -> int:
+        """The GPU count, discovered on first use rather than at construction."""
+        now = time.monotonic()
+        if self._discovered is None or now - self._discovered > self.discovery_interval:
+            self._gpus = self.get_gpu_count()
+            self._discovered = now
+        return self._gpus
+
+    @gpus.setter
+    def gpus(self, value: int):
+        self._gpus = value
+        self._discovered = time.monotonic()
+
+    def _run(self, *args) -> bytes:
+        """Run rocm-smi and return its raw output, or nothing on timeout or without ROCm."""
+        try:
+            with timer("rocm-smi"):
+                output = self.bash.run(
+                    ["rocm-smi", *args],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=self.timeout,
+                ).stdout
+        except subprocess.TimeoutExpired:
+            logger.error("rocm-smi %s did not return within %ss", " ".join(args), self.timeout)
+            return b""
+        except FileNotFoundError as f_err:
+            # Samplers keep polling, e.g. for the alerts, so do not log every tick
+            if not self._missing:
+                logger.error("ROCm is not installed - %s", f_err)
+            self._missing = True
+            return b""
+        self._missing = False
+        return output
+
+    def get_gpu_count(self) -> int:
+        """Get the number of working GPUs."""
+        output = rocm_parser.parse(self._run())
+        return len(output.concise) or -1
+
+    def _get(self, args, values, convert, missing) -> list:
+        output = rocm_parser.parse(self._run(*args))
+        if not output.valid:
+            return [missing for _ in range(self.gpus)]
+        return [convert(value, missing) for value in values(output)]
+
+    def get_gpu_utilization(self, flag="-u") -> List[int]:
+        """Return the utilization of each GPU in %."""
+        return self._get([flag], lambda o: o.label("GPU use"), rocm_parser.to_int, -1)
+
+    def get_gpu_clock_freq(self, flag="-g") -> List[int]:
+        """Return the clock frequence of each GPU in Mhz."""
+        return self._get([flag], lambda o: o.label("sclk clock"), rocm_parser.to_mhz, -1)
+
+    def get_gpu_vram_use(self) -> List[int]:
+        """Return the current v-ram usage of each GPU in %."""
+        return self._get([], lambda o: o.column("VRAM%"), rocm_parser.to_int, -1)
+
+    def get_gpu_pcie_bandwith(self, flag="-b") -> List[float]:
+        """Return the estimated maximum PCIe bandwith in MB/s."""
+        return self._get([flag], lambda o: o.label("PCIe bandwidth"), rocm_parser.to_float, -1.0)
+
+    def get_gpu_voltage(self, flag="--showvoltage") -> List[int]:
+        """Return the current Voltage per GPU in mV."""
+        return self._get([flag], lambda o: o.label("Voltage"), rocm_parser.to_int, -1)
+
+    def get_gpu_metrics(self, metrics: Iterable[str] = ("utilization", "memory")) -> List[GpuRecord]:
+        """Return a ``GpuRecord`` per GPU from a single rocm-smi invocation."""
+        metrics = tuple(metrics)
+        flags = [flag for metric in metrics for flag in METRIC_FLAGS[metric]]
+        return parse_metrics(self._run(*flags, "--json"), metrics)
+
+    def get_gpu_processes(self) -> Dict[int, GpuProcess]:
+        """Return the processes using a GPU, from a single rocm-smi invocation."""
+        return parse_pids(self._run("--showpids", "--showpidgpus"))
@@ -0,0 +1,97 @@
+"""
+Single-pass parser for the text output of ``rocm-smi``.
+
+rocm-smi prints banner-delimited sections. The ``Concise Info`` section is a
+whitespace aligned table with one row per GPU, every other section has one
+``GPU[n] : label: value`` line per GPU and metric. ``parse`` tokenizes all of
+them with one precompiled pattern in a single scan over the raw bytes.
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+
+BANNER = b"ROCm System Management Interface"
+
+_TOKENS = re.compile(
+    rb"""
+    ^[ \t]*(?:
+        GPU\[(?P<gpu>\d+)\][ \t]*:[ \t]*(?P<label>[^\n]*?):[ \t]*(?P<value>[^\n]*?)
+      | =+[ \t]*(?P<title>[^=\n]*?)[ \t]*=+
+      | (?P<row>\d+[ \t][^\n]*?)
+      | (?P<header>[^\n]*VRAM%[^\n]*?)
+    )[ \t]*$
+    """,
+    re.M | re.X,
+)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_MHZ = re.compile(r"(\d+)\s*Mhz", re.I)
+
+
+class SmiOutput(NamedTuple):
+    """Tokens of one rocm-smi invocation."""
+
+    # Whether the output came from rocm-smi at all
+    valid: bool
+    # One ``{column: value}`` dict per row of the Concise Info table
+    concise: List[Dict[str, str]]
+    # ``{gpu: {label: value}}`` for every ``GPU[n] : label: value`` line
+    sections: Dict[int, Dict[str, str]]
+
+    def column(self, name: str) -> List[str]:
+        """Return a column of the Concise Info table, in GPU order."""
+        return [row[name] for row in self.concise if name in row]
+
+    def label(self, text: str) -> List[str]:
+        """Return the value of the first label containing ``text`` per GPU."""
+        values = []
+        for gpu in sorted(self.sections):
+            for label, value in self.sections[gpu].items():
+                if text in label:
+                    values.append(value)
+                    break
+        return values
+
+
+def parse(output: bytes) -> SmiOutput:
+    """Tokenize the raw stdout of rocm-smi."""
+    concise = []
+    sections: Dict[int, Dict[str, str]] = {}
+    columns: Optional[List[str]] = None
+    in_concise = False
+    for match in _TOKENS.finditer(output):
+        gpu, title, row, header = match.group("gpu", "title", "row", "header")
+        if gpu is not None:
+            label, value = (v.decode(errors="replace") for v in match.group("label", "value"))
+            sections.setdefault(int(gpu), {})[label] = value
+        elif title is not None:
+            # Bare "====" lines separate the table header from its rows
+            if title:
+                in_concise = title == b"Concise Info"
+                columns = None
+        elif not in_concise:
+            continue
+        elif header is not None:
+            # Units such as "(DieEdge)" are printed below or next to a column name
+            columns = [c for c in header.decode(errors="replace").split() if not c.startswith("(")]
+        elif row is not None and columns is not None:
+            # Align from the right, where the VRAM% and GPU% columns always are
+            values = row.decode(errors="replace").split()
+            concise.append(dict(zip(reversed(columns), reversed(values))))
+    return SmiOutput(BANNER in output, concise, sections)
+
+
+def to_int(value: str, default: int = -1) -> int:
+    """Return the first integer in ``value`` such as "8%" or "737"."""
+    match = _NUMBER.search(value)
+    return int(float(match.group())) if match else default
+
+
+def to_float(value: str, default: float = -1.0) -> float:
+    match = _NUMBER.search(value)
+    return float(match.group()) if match else default
+
+
+def to_mhz(value: str, default: int = -1) -> int:
+    """Return the frequency of a value such as "1 (930Mhz)"."""
+    match = _MHZ.search(value)
+    return int(match.group(1)) if match else default
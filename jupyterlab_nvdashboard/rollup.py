@@ -0,0 +1,167 @@
+"""
+Coarser copies of the timeline history for long time windows.
+
+``Rollup`` keeps 1 second, 10 second and 1 minute tiers with the mean, min
+and max of every column per bucket, updated incrementally from each sample.
+``Rollup.select`` picks the finest tier that shows a visible x-range in at
+most ``max_points`` points and thins it further with LTTB when needed.
+"""
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from jupyterlab_nvdashboard.ringbuffer import RingBuffer
+
+
+# (bucket width in ms, number of buckets kept)
+TIERS = ((1000, 3600), (10000, 8640), (60000, 10080))
+# Points per series sent for a zoomed-out timeline
+MAX_POINTS = 2000
+
+
+class Tier:
+    """Mean, min and max of every column over fixed-width time buckets."""
+
+    def __init__(self, columns: Sequence[str], resolution: int, capacity: int):
+        self.columns: List[str] = list(columns)
+        self.resolution = resolution
+        self.buffer = RingBuffer(
+            ["time"] + [c + s for c in self.columns for s in ("", "-min", "-max")],
+            capacity,
+        )
+        self._bucket: Optional[int] = None
+        self._min = self._max = self._sum = None
+        self._n = 0
+
+    def add(self, time: float, values: np.ndarray):
+        """Account one sample, closing the open bucket when ``time`` leaves it."""
+        bucket = int(time // self.resolution)
+        if bucket != self._bucket:
+            self.flush()
+            self._bucket = bucket
+            self._min, self._max, self._sum = values.copy(), values.copy(), values.copy()
+            self._n = 1
+        else:
+            np.fmin(self._min, values, out=self._min)
+            np.fmax(self._max, values, out=self._max)
+            self._sum += values
+            self._n += 1
+
+    def _row(self, bucket, mean, low, high) -> np.ndarray:
+        row = np.empty(1 + 3 * len(self.columns))
+        # Buckets are plotted at their center
+        row[0] = (bucket + 0.5) * self.resolution
+        row[1::3], row[2::3], row[3::3] = mean, low, high
+        return row
+
+    def flush(self):
+        """Append the open bucket to the buffer."""
+        if self._bucket is None:
+            return
+        self.buffer.append(self._row(self._bucket, self._sum / self._n, self._min, self._max))
+        self._bucket = None
+
+    def load(self, times: np.ndarray, values: np.ndarray):
+        """Aggregate a ``(n, ncolumns)`` block of time-ordered samples at once.
+
+        The last bucket stays open so live samples can continue it.
+        """
+        if not len(times):
+            return
+        self.flush()
+        buckets = (times // self.resolution).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        counts = np.diff(np.concatenate((starts, [len(times)])))
+        means = np.add.reduceat(values, starts) / counts[:, None]
+        lows = np.fmin.reduceat(values, starts)
+        highs = np.fmax.reduceat(values, starts)
+        rows = [self._row(*r) for r in zip(buckets[starts[:-1]], means, lows, highs)]
+        if rows:
+            self.buffer.extend(np.array(rows))
+        self._bucket = int(buckets[-1])
+        self._min, self._max = lows[-1].copy(), highs[-1].copy()
+        self._sum = np.add.reduce(values[starts[-1] :])
+        self._n = int(counts[-1])
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """Return the bucket means under the raw column names."""
+        data = self.buffer.view()
+        return {c: data[c] for c in ["time"] + self.columns}
+
+
+class Rollup:
+    """All tiers of one timeline; the first column is the time in ms."""
+
+    def __init__(self, columns: Sequence[str], tiers=TIERS):
+        self.columns: List[str] = list(columns)
+        self.tiers = [Tier(self.columns[1:], r, c) for r, c in tiers]
+
+    def append(self, row: Sequence[float]):
+        values = np.asarray(row[1:], dtype=np.float64)
+        for tier in self.tiers:
+            tier.add(row[0], values)
+
+    def load(self, data: Mapping[str, np.ndarray]):
+        """Seed the tiers from stored history, such as ``HistoryStore.read``."""
+        times = np.asarray(data[self.columns[0]])
+        values = np.column_stack([data[c] for c in self.columns[1:]]) if len(times) else None
+        for tier in self.tiers:
+            tier.load(times, values)
+
+    def select(
+        self, raw: RingBuffer, start: float, end: float, max_points: int = MAX_POINTS
+    ) -> Tuple[int, Dict[str, np.ndarray]]:
+        """Return the resolution and columns to plot for ``[start, end]``.
+
+        Candidates are the raw samples, resolution 0, followed by the tiers
+        from fine to coarse. The finest one that reaches back to ``start``, or
+        to the oldest sample any of them has, and fits in ``max_points`` wins;
+        otherwise the coarsest one is thinned with LTTB.
+        """
+        raw_view = raw.view()
+        candidates = [(0, {c: raw_view[c] for c in self.columns})]
+        candidates += [(t.resolution, t.view()) for t in self.tiers]
+        oldest = min((d["time"][0] for _, d in candidates if len(d["time"])), default=start)
+        target = max(start, oldest)
+        chosen = None
+        for resolution, data in candidates:
+            times = data["time"]
+            if not len(times) or times[0] > target + resolution:
+                continue
+            # Keep the neighbours just outside the range so lines reach the edges
+            lo = max(np.searchsorted(times, start) - 1, 0)
+            hi = min(np.searchsorted(times, end, side="right") + 1, len(times))
+            chosen = resolution, {c: v[lo:hi] for c, v in data.items()}
+            if hi - lo <= max_points:
+                return chosen
+        if chosen is None:
+            return 0, {c: v[:0] for c, v in candidates[0][1].items()}
+        resolution, data = chosen
+        keep = lttb(data["time"], data[self.columns[1]], max_points)
+        return resolution, {c: v[keep] for c, v in data.items()}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Return the indices of ``n`` points picked by Largest-Triangle-Three-Buckets.
+
+    NaN values in ``y`` are treated as 0 when comparing triangle areas.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(min(size, max(n, 0)))
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # The third vertex is the average of the following bucket
+        nxt = slice(edges[i + 1], edges[i + 2] if i + 2 < len(edges) else size)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        areas = np.abs(
+            (x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        keep[i + 1] = a
+    return keep
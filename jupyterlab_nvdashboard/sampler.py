@@ -0,0 +1,337 @@
+"""
+Process-wide metric sampling shared by every Bokeh session.
+
+Each dashboard document used to poll the GPUs from its own periodic callback,
+so the number of ``rocm-smi`` invocations grew with the number of open tabs.
+A ``Sampler`` polls once per tick and publishes an immutable snapshot which
+all sessions read instead. Collection runs on a single worker thread so a
+slow ``rocm-smi`` never blocks the Tornado IOLoop serving the websockets.
+"""
+import logging
+import time
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Container, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import psutil
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from jupyterlab_nvdashboard.rates import CounterRates, Partitions
+from jupyterlab_nvdashboard.stats import timer
+
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds between samples while no visible session is subscribed
+IDLE_INTERVAL = 5000
+
+# Seconds a session reported hidden has to subscribe before it is forgotten
+HIDDEN_SESSION_TTL = 60
+# Most sessions reported hidden that did not subscribe (yet)
+MAX_PENDING_HIDDEN = 1000
+
+_samplers: "weakref.WeakSet[Sampler]" = weakref.WeakSet()
+# Sessions reported hidden, possibly before they subscribed, and when
+_hidden_sessions: Dict[Hashable, float] = {}
+
+
+# GpuSnapshot fields queried together on each tick
+GPU_FIELDS = ("utilization", "memory", "clock", "temperature", "power", "voltage")
+# Milliseconds between PCIe bandwidth readings, which block for about a second
+# per card and so are collected apart from the other GPU fields
+PCIE_INTERVAL = 10000
+
+
+class GpuSnapshot(NamedTuple):
+    """GPU metrics collected during a single sampler tick."""
+
+    time: float
+    utilization: Tuple[int, ...]
+    memory: Tuple[int, ...]
+    clock: Tuple[int, ...] = ()  # Mhz
+    temperature: Tuple[float, ...] = ()  # C
+    power: Tuple[float, ...] = ()  # W
+    voltage: Tuple[int, ...] = ()  # mV
+    pcie: Tuple[float, ...] = ()  # MB/s
+
+    @property
+    def ngpus(self) -> int:
+        return len(self.utilization)
+
+
+class PcieSnapshot(NamedTuple):
+    """PCIe bandwidth of every GPU, collected less often than the other fields."""
+
+    time: float
+    pcie: Tuple[float, ...]  # MB/s
+
+
+class HostSnapshot(NamedTuple):
+    """CPU, memory, disk and network metrics of the host for one tick."""
+
+    time: float
+    cpu: float  # %
+    cpu_per_core: Tuple[float, ...]  # %
+    memory: int  # used, B
+    disk_read: float  # B/s
+    disk_write: float  # B/s
+    net_recv: float  # B/s
+    net_sent: float  # B/s
+    disks: Tuple["DeviceRate", ...] = ()  # whole disks, without partitions
+    nics: Tuple["DeviceRate", ...] = ()
+
+
+class DeviceRate(NamedTuple):
+    """I/O rates of one disk or network interface."""
+
+    name: str
+    read: float  # B/s, received for network interfaces
+    write: float  # B/s, sent for network interfaces
+
+
+class Sampler:
+    """Poll ``collect`` every ``interval`` milliseconds and cache the result.
+
+    Sessions must treat ``snapshot`` as read-only; a new object is published
+    on every tick so identity comparison is enough to detect fresh data.
+    ``snapshot`` is ``None`` until the first collection has finished.
+
+    Sessions ``subscribe`` to the sampler. While none of them is visible it
+    backs off to ``idle_interval``, which keeps the history going without
+    polling at full speed for nobody.
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[], NamedTuple],
+        interval: int = 500,
+        executor: Optional[Executor] = None,
+        idle_interval: int = IDLE_INTERVAL,
+        name: str = "sampler",
+    ):
+        self.collect = collect
+        self.name = name
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.snapshot = None
+        self._callback: Optional[PeriodicCallback] = None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="nvdashboard-sampler"
+        )
+        self._pending = False
+        self._listeners: List[Callable[[NamedTuple], None]] = []
+        # Whether each subscribed session is currently visible
+        self._subscribers: Dict[Hashable, bool] = {}
+        _samplers.add(self)
+
+    @property
+    def executor(self) -> Executor:
+        """The worker collections run on; share it to serialize access to a device."""
+        return self._executor
+
+    @property
+    def running(self) -> bool:
+        return self._callback is not None
+
+    @property
+    def current_interval(self) -> int:
+        return self.interval if any(self._subscribers.values()) else self.idle_interval
+
+    def start(self):
+        """Start polling on the current IOLoop without waiting for a sample."""
+        if self.running:
+            return
+        self._callback = PeriodicCallback(self.sample_async, self.current_interval)
+        self._callback.start()
+        IOLoop.current().add_callback(self.sample_async)
+
+    def _reschedule(self):
+        if self._callback is None or self._callback.callback_time == self.current_interval:
+            return
+        faster = self.current_interval < self._callback.callback_time
+        self._callback.stop()
+        self._callback = PeriodicCallback(self.sample_async, self.current_interval)
+        self._callback.start()
+        if faster:
+            # Do not show data up to an idle interval old
+            IOLoop.current().add_callback(self.sample_async)
+
+    def subscribe(self, key: Hashable):
+        """Start polling for the session ``key``, at full speed while it is visible."""
+        self._subscribers[key] = key not in _hidden_sessions
+        self.start()
+        self._reschedule()
+
+    def unsubscribe(self, key: Hashable):
+        self._subscribers.pop(key, None)
+        _hidden_sessions.pop(key, None)
+        self._reschedule()
+
+    def set_active(self, key: Hashable, active: bool):
+        if key in self._subscribers:
+            self._subscribers[key] = active
+            self._reschedule()
+
+    def stop(self):
+        if self._callback is not None:
+            self._callback.stop()
+            self._callback = None
+
+    def add_listener(self, listener: Callable[[NamedTuple], None]):
+        """Call ``listener`` with every new snapshot, on the publishing thread."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[NamedTuple], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def publish(self, snapshot: NamedTuple):
+        self.snapshot = snapshot
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                logger.exception("Metrics listener %r failed", listener)
+
+    def _collect(self):
+        with timer("collect." + self.name):
+            return self.collect()
+
+    def sample(self):
+        """Collect and publish a new snapshot, keeping the last one on failure."""
+        try:
+            snapshot = self._collect()
+        except Exception:
+            logger.exception("Failed to collect metrics")
+            return self.snapshot
+        self.publish(snapshot)
+        return snapshot
+
+    async def sample_async(self):
+        """Collect on the worker thread and publish on the IOLoop.
+
+        Ticks are skipped while a collection is still running.
+        """
+        if self._pending:
+            return self.snapshot
+        self._pending = True
+        try:
+            snapshot = await IOLoop.current().run_in_executor(self._executor, self._collect)
+        except Exception:
+            logger.exception("Failed to collect metrics")
+            return self.snapshot
+        finally:
+            self._pending = False
+        self.publish(snapshot)
+        return snapshot
+
+
+def _forget_hidden_sessions(now: float):
+    """Drop hidden sessions that did not subscribe in time, oldest first past the cap."""
+    samplers = list(_samplers)
+    pending = [
+        key
+        for key in _hidden_sessions
+        if not any(key in sampler._subscribers for sampler in samplers)
+    ]
+    excess = len(pending) - MAX_PENDING_HIDDEN
+    for i, key in enumerate(pending):
+        if i < excess or now - _hidden_sessions[key] > HIDDEN_SESSION_TTL:
+            del _hidden_sessions[key]
+
+
+def set_session_active(key: Hashable, active: bool):
+    """Report a session as visible or hidden to every sampler.
+
+    Hidden sessions are remembered for the documents that subscribe later, but
+    only for ``HIDDEN_SESSION_TTL`` seconds unless they do.
+    """
+    _hidden_sessions.pop(key, None)
+    if not active:
+        now = time.monotonic()
+        _hidden_sessions[key] = now
+        _forget_hidden_sessions(now)
+    for sampler in list(_samplers):
+        sampler.set_active(key, active)
+
+
+def _readings(records, field: str) -> tuple:
+    return tuple(-1 if v is None else v for v in (getattr(r, field) for r in records))
+
+
+def collect_gpu(provider, pcie: Optional[PcieSnapshot] = None) -> GpuSnapshot:
+    """Build a ``GpuSnapshot`` from one combined ``get_gpu_metrics`` query.
+
+    The PCIe bandwidth is copied from ``pcie``, the latest ``collect_pcie``
+    result. Readings the provider could not get, or that are not collected
+    yet, are -1.
+    """
+    records = provider.get_gpu_metrics(GPU_FIELDS)
+    values = {field: _readings(records, field) for field in GPU_FIELDS}
+    bandwidth = pcie.pcie[: len(records)] if pcie is not None else ()
+    values["pcie"] = bandwidth + (-1,) * (len(records) - len(bandwidth))
+    return GpuSnapshot(time.time(), **values)
+
+
+def collect_pcie(provider) -> PcieSnapshot:
+    """Read the PCIe bandwidth of every GPU; failed readings are -1."""
+    return PcieSnapshot(time.time(), _readings(provider.get_gpu_metrics(("pcie",)), "pcie"))
+
+
+class HostCollector:
+    """Collect ``HostSnapshot`` objects, turning counters into rates.
+
+    Every counter is read once per tick into NumPy arrays, so the CPU
+    utilization of all cores and the I/O rates of all devices are computed
+    in a few array operations whatever their number. The host totals are
+    the sums of the per-device rates.
+    """
+
+    def __init__(self, partitions: Optional[Container[str]] = None):
+        self._disk_rates = CounterRates(("read_bytes", "write_bytes"))
+        self._nic_rates = CounterRates(("bytes_recv", "bytes_sent"))
+        self._partitions = Partitions() if partitions is None else partitions
+        self._cpu_last = None
+        # cpu_times columns, looked up on the first call
+        self._idle_columns = None
+        self._guest_columns = None
+
+    def _cpu(self) -> Tuple[float, np.ndarray]:
+        """Return the total and per-core utilization since the last call."""
+        times = psutil.cpu_times(percpu=True)
+        if self._idle_columns is None:
+            fields = times[0]._fields
+            self._idle_columns = [fields.index(f) for f in ("idle", "iowait") if f in fields]
+            # Guest time is already counted as user time on Linux
+            self._guest_columns = [fields.index(f) for f in ("guest", "guest_nice") if f in fields]
+        times = np.array(times, dtype=float)
+        total = times.sum(axis=1) - times[:, self._guest_columns].sum(axis=1)
+        idle = times[:, self._idle_columns].sum(axis=1)
+        last, self._cpu_last = self._cpu_last, (total, idle)
+        if last is None or last[0].shape != total.shape:
+            return 0.0, np.zeros(len(total))
+        elapsed = total - last[0]
+        busy = np.clip(elapsed - (idle - last[1]), 0, None)
+        per_core = np.divide(100 * busy, elapsed, out=np.zeros_like(busy), where=elapsed > 0)
+        overall = 100 * busy.sum() / elapsed.sum() if elapsed.sum() > 0 else 0.0
+        return round(float(overall), 1), np.clip(per_core, 0, 100).round(1)
+
+    def __call__(self) -> HostSnapshot:
+        now = time.time()
+        disks = psutil.disk_io_counters(perdisk=True) or {}
+        disks = {name: c for name, c in disks.items() if name not in self._partitions}
+        disk_names, disk_rates = self._disk_rates.update(now, disks)
+        nic_names, nic_rates = self._nic_rates.update(now, psutil.net_io_counters(pernic=True))
+        cpu, cpu_per_core = self._cpu()
+        return HostSnapshot(
+            now,
+            cpu,
+            tuple(cpu_per_core.tolist()),
+            psutil.virtual_memory().used,
+            *disk_rates.sum(axis=0).tolist(),
+            *nic_rates.sum(axis=0).tolist(),
+            disks=tuple(map(DeviceRate._make, zip(disk_names, *disk_rates.T.tolist()))),
+            nics=tuple(map(DeviceRate._make, zip(nic_names, *nic_rates.T.tolist()))),
+        )
@@ -1,13 +1,38 @@
-import sys
+import argparse
+import atexit
+import json
+import signal
+from functools import partial
 
 from bokeh.server.server import Server
 from tornado.ioloop import IOLoop
 from tornado import web
 
 from jupyterlab_nvdashboard import apps
+from jupyterlab_nvdashboard.aggregator import Aggregator, parse_nodes
+from jupyterlab_nvdashboard.alerts import WebhookSink, load_rules
+from jupyterlab_nvdashboard.api import metrics_handlers
+from jupyterlab_nvdashboard.exporter import GPU_METRICS, HOST_METRICS, Exporter, PrometheusHandler
+from jupyterlab_nvdashboard.recording import Recorder, Replay
+from jupyterlab_nvdashboard.sampler import IDLE_INTERVAL, set_session_active
+from jupyterlab_nvdashboard.stats import StatsHandler, count_websocket_bytes, watch_ioloop
+from jupyterlab_nvdashboard.utils import prebuild
 
 
 DEFAULT_PORT = 8000
+# Milliseconds a session without connections is kept for a reconnect
+SESSION_LIFETIME = 10000
+# Added to the routes when --node is given
+CLUSTER_ROUTE = "/Cluster-GPU"
+
+
+# Samplers exposed by the metrics API, see api.py
+samplers = {"gpu": apps.gpu.sampler, "host": apps.cpu.sampler}
+# Samplers written by --record and replaced by --replay
+recorded_samplers = dict(samplers, processes=apps.processes.sampler)
+exporter = Exporter(
+    {"gpu": (apps.gpu.sampler, GPU_METRICS), "host": (apps.cpu.sampler, HOST_METRICS)}
+)
 
 
 routes = {
@@ -15,7 +40,9 @@ routes = {
     "/GPU-Memory": apps.gpu.gpu_mem,
     "/GPU-Clock-Frequency": apps.gpu.gpu_clock_frequency,
     "/GPU-Resource-Timeline": apps.gpu.gpu_resource_timeline,
+    "/GPU-Telemetry-Timeline": apps.gpu.gpu_telemetry_timeline,
     "/Machine-Resources": apps.cpu.resource_timeline,
+    "/GPU-Processes": apps.processes.gpu_processes,
 }
 
 
@@ -26,16 +53,195 @@ class RouteIndex(web.RequestHandler):
         self.write({route: route.strip("/").replace("-", " ") for route in routes})
 
 
+class SessionVisibility(web.RequestHandler):
+    """ Lets the frontend report a dashboard panel as hidden or shown """
+
+    def post(self):
+        try:
+            body = json.loads(self.request.body)
+            session, visible = body["session"], bool(body["visible"])
+        except (ValueError, KeyError, TypeError):
+            raise web.HTTPError(400, "Expected {'session': id, 'visible': bool}")
+        set_session_active(session, visible)
+        self.set_status(204)
+
+
+def route_interval(value):
+    """Parse a ``ROUTE=MS`` command line value."""
+    route, _, interval = value.partition("=")
+    route = "/" + route.strip("/")
+    if (route not in routes and route != CLUSTER_ROUTE) or not interval.isdigit():
+        raise argparse.ArgumentTypeError(
+            "expected ROUTE=MS with one of {}".format(", ".join(r.strip("/") for r in routes))
+        )
+    return route, int(interval)
+
+
+def replay_speed(value):
+    """Parse a positive ``--replay-speed`` factor."""
+    try:
+        speed = float(value)
+    except ValueError:
+        speed = 0
+    if not speed > 0:
+        raise argparse.ArgumentTypeError("expected a positive factor, e.g. 1 or 10")
+    return speed
+
+
+def alert_rules(path):
+    """Load the rules of an ``--alerts`` file."""
+    try:
+        return load_rules(path)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="nvdashboard", description="GPU dashboard server")
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--interval",
+        type=route_interval,
+        action="append",
+        default=[],
+        metavar="ROUTE=MS",
+        help="update interval of a route, e.g. GPU-Resource-Timeline=2000",
+    )
+    parser.add_argument(
+        "--gpu-sample-interval",
+        type=int,
+        default=apps.gpu.sampler.interval,
+        metavar="MS",
+        help="interval between GPU samples while a dashboard is visible",
+    )
+    parser.add_argument(
+        "--host-sample-interval",
+        type=int,
+        default=apps.cpu.sampler.interval,
+        metavar="MS",
+        help="interval between CPU, memory, disk and network samples",
+    )
+    parser.add_argument(
+        "--idle-interval",
+        type=int,
+        default=IDLE_INTERVAL,
+        metavar="MS",
+        help="interval between samples while no dashboard is visible",
+    )
+    parser.add_argument(
+        "--session-lifetime",
+        type=int,
+        default=SESSION_LIFETIME,
+        metavar="MS",
+        help="time before a closed dashboard's session is cleaned up",
+    )
+    parser.add_argument(
+        "--node",
+        action="append",
+        default=[],
+        metavar="[NAME=]URL",
+        help="dashboard server of another node to show in the cluster view",
+    )
+    parser.add_argument(
+        "--node-timeout",
+        type=float,
+        default=10,
+        metavar="SECONDS",
+        help="time before a silent node is shown without data and reconnected",
+    )
+    parser.add_argument(
+        "--alerts",
+        type=alert_rules,
+        metavar="FILE",
+        help="JSON list of alert rules replacing the default ones",
+    )
+    parser.add_argument(
+        "--alert-webhook",
+        action="append",
+        default=[],
+        metavar="URL",
+        help="URL every alert event is POSTed to as JSON",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="append every GPU, host and process snapshot to a recording",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="show the snapshots of a recording instead of live metrics",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=replay_speed,
+        default=1.0,
+        metavar="FACTOR",
+        help="replay the recording this many times faster than real time",
+    )
+    return parser.parse_args(argv)
+
+
 def go():
-    if len(sys.argv) > 1:
-        port = int(sys.argv[1])
-    else:
-        port = DEFAULT_PORT
-    server = Server(routes, port=port, allow_websocket_origin=["*"])
+    args = parse_args()
+    for sampler, interval in (
+        (apps.gpu.sampler, args.gpu_sample_interval),
+        (apps.cpu.sampler, args.host_sample_interval),
+    ):
+        sampler.interval = interval
+        sampler.idle_interval = max(args.idle_interval, interval)
+    if args.alerts is not None:
+        apps.gpu.alerts.set_rules(args.alerts)
+    apps.gpu.alerts.sinks += [WebhookSink(url) for url in args.alert_webhook]
+    if apps.gpu.alerts.rules:
+        # Alert even while no dashboard is open
+        IOLoop.current().add_callback(apps.gpu.sampler.start)
+    if args.replay:
+        Replay(args.replay, speed=args.replay_speed).install(recorded_samplers)
+    if args.record:
+        recorder = Recorder(args.record)
+        atexit.register(recorder.close)
+        for name, sampler in recorded_samplers.items():
+            recorder.attach(name, sampler)
+            # Record even while no dashboard is open
+            IOLoop.current().add_callback(sampler.start)
+        # Return from go() on SIGTERM too, so the end of the recording is written
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: IOLoop.current().add_callback_from_signal(IOLoop.current().stop),
+        )
+    if args.node:
+        aggregator = Aggregator(parse_nodes(args.node), args.node_timeout)
+        routes[CLUSTER_ROUTE] = partial(apps.cluster.cluster_gpu, aggregator=aggregator)
+        IOLoop.current().add_callback(aggregator.start)
+    intervals = dict(args.interval)
+    applications = {
+        route: partial(app, interval=intervals[route]) if route in intervals else app
+        for route, app in routes.items()
+    }
+
+    server = Server(
+        applications,
+        port=args.port,
+        allow_websocket_origin=["*"],
+        # Free closed sessions, and their sampler subscriptions, soon after
+        unused_session_lifetime_milliseconds=args.session_lifetime,
+        check_unused_sessions_milliseconds=max(args.session_lifetime // 5, 1000),
+    )
+    count_websocket_bytes()
     server.start()
+    IOLoop.current().add_callback(prebuild)
+    IOLoop.current().add_callback(watch_ioloop)
 
     server._tornado.add_handlers(
-        r".*", [(server.prefix + "/" + "index.json", RouteIndex, {})]
+        r".*",
+        [
+            (server.prefix + "/" + "index.json", RouteIndex, {}),
+            (server.prefix + "/" + "stats.json", StatsHandler, {"server": server}),
+            (server.prefix + "/" + "visibility", SessionVisibility, {}),
+            (server.prefix + "/" + "metrics", PrometheusHandler, {"exporter": exporter}),
+        ]
+        + metrics_handlers(server.prefix, samplers),
     )
 
     IOLoop.current().start()
@@ -0,0 +1,163 @@
+"""
+Low-overhead instrumentation of the dashboard server's hot paths.
+
+Durations are counted in fixed, exponentially growing buckets, so recording
+one is a ``perf_counter`` call and a bisect, and memory does not grow with
+the number of calls. ``GET /stats.json`` reports every histogram together
+with the sessions and websocket bytes sent per route.
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+from typing import Dict, List
+
+from tornado import web
+from tornado.ioloop import IOLoop
+
+
+# Upper bucket bounds in seconds, from 10 microseconds to about 10 seconds
+BOUNDS = tuple(1e-5 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    """Counts of durations per bucket of ``BOUNDS``.
+
+    Updates are not locked; a sample recorded on a sampler thread at the
+    same moment as one on the IOLoop may be lost, which does not matter for
+    these statistics.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        # The last bucket holds everything above the largest bound
+        self.counts: List[int] = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Return the upper bound of the bucket holding the ``q`` quantile."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BOUNDS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            # Per bucket of BOUNDS, so clients can compare two reports
+            "buckets": list(self.counts),
+        }
+
+
+timings: Dict[str, Histogram] = defaultdict(Histogram)
+# Bokeh websocket bytes per route, counted once ``count_websocket_bytes`` ran
+websocket_bytes: Dict[str, int] = defaultdict(int)
+
+
+class timer:
+    """Context manager recording its duration in ``timings[name]``."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, name: str):
+        self.histogram = timings[name]
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+def timed(name: str, func):
+    """Wrap ``func`` to record the duration of every call in ``timings[name]``."""
+    histogram = timings[name]
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def watch_ioloop(interval: float = 0.1):
+    """Record how late a callback scheduled every ``interval`` seconds runs.
+
+    The delays, in ``timings["ioloop.lag"]``, are the time the IOLoop spent
+    on other work, such as slow dashboard callbacks, before getting to it.
+    """
+    loop = IOLoop.current()
+    histogram = timings["ioloop.lag"]
+
+    def tick(expected):
+        now = loop.time()
+        histogram.observe(max(now - expected, 0.0))
+        loop.call_at(now + interval, tick, now + interval)
+
+    start = loop.time() + interval
+    loop.call_at(start, tick, start)
+
+
+def count_websocket_bytes():
+    """Count the bytes every Bokeh websocket sends under its route.
+
+    Bokeh does not report them, so this wraps its websocket handler. Text
+    messages are counted by characters, which are bytes for the ASCII JSON
+    Bokeh sends.
+    """
+    from bokeh.server.views.ws import WSHandler
+
+    if getattr(WSHandler.write_message, "counted", False):
+        return
+    write_message = WSHandler.write_message
+
+    async def counted_write_message(self, message, binary=False, locked=True):
+        websocket_bytes[self.application_context.url] += len(message)
+        await write_message(self, message, binary, locked)
+
+    counted_write_message.counted = True
+    WSHandler.write_message = counted_write_message
+
+
+def report(server=None) -> dict:
+    result = {
+        "timings": {name: h.summary() for name, h in sorted(timings.items()) if h.count},
+        "websocket_bytes": dict(websocket_bytes),
+    }
+    if server is not None:
+        result["sessions"] = {
+            path: len(server.get_sessions(path)) for path in server._tornado.app_paths
+        }
+    return result
+
+
+class StatsHandler(web.RequestHandler):
+    """ Timings, sessions and websocket traffic of the server as JSON """
+
+    def initialize(self, server=None):
+        self.server = server
+
+    def get(self):
+        self.write(report(self.server))
@@ -0,0 +1,276 @@
+"""
+Read AMD GPU metrics straight from the amdgpu sysfs and hwmon files.
+
+Starting ``rocm-smi`` costs tens of milliseconds of CPU per reading, while
+the same values are exposed by the kernel driver. The attribute files are
+opened once and re-read with ``os.pread`` on every sample.
+
+Per-process GPU usage comes from the ``drm-*`` keys the driver writes to
+``/proc/<pid>/fdinfo`` for every open render node.
+"""
+import glob
+import logging
+import os
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from jupyterlab_nvdashboard.rocm import GpuProcess, GpuRecord
+
+
+logger = logging.getLogger(__name__)
+
+DRM_ROOT = "/sys/class/drm"
+PROC_ROOT = "/proc"
+AMD_VENDOR_ID = "0x1002"
+
+_CARD = re.compile(r"card(\d+)$")
+_ACTIVE_CLOCK = re.compile(rb"(\d+)\s*Mhz\s*\*", re.I)
+_FDINFO = re.compile(rb"^(drm-[\w-]+):\s*(\S+)", re.M)
+_KIB = 1024
+
+
+def read_fdinfo(proc: str, pid: int) -> List[Dict[bytes, bytes]]:
+    """Return the ``drm-*`` keys of every DRM client the process has open.
+
+    Only file descriptors linking to ``/dev/dri`` are read, and a client
+    open through several descriptors is returned once.
+    """
+    base = os.path.join(proc, str(pid))
+    clients = {}
+    for fd in os.listdir(os.path.join(base, "fd")):
+        try:
+            if not os.readlink(os.path.join(base, "fd", fd)).startswith("/dev/dri/"):
+                continue
+            with open(os.path.join(base, "fdinfo", fd), "rb") as f:
+                keys = dict(_FDINFO.findall(f.read()))
+        except OSError:
+            continue
+        if keys.get(b"drm-driver") == b"amdgpu":
+            clients[keys.get(b"drm-client-id", fd)] = keys
+    return list(clients.values())
+
+
+class _Card:
+    """Open attribute files of one ``card*/device`` directory."""
+
+    def __init__(self, device: str):
+        self.device = device
+        hwmon = sorted(glob.glob(os.path.join(device, "hwmon", "hwmon*")))
+        self.hwmon = hwmon[0] if hwmon else None
+        self._fds: Dict[str, Optional[int]] = {}
+
+    def _fd(self, path: str) -> Optional[int]:
+        if path not in self._fds:
+            try:
+                self._fds[path] = os.open(path, os.O_RDONLY)
+            except OSError:
+                self._fds[path] = None
+        return self._fds[path]
+
+    def read(self, name: str, hwmon: bool = False) -> Optional[bytes]:
+        """Return the current contents of an attribute, or None if missing."""
+        if hwmon:
+            if self.hwmon is None:
+                return None
+            path = os.path.join(self.hwmon, name)
+        else:
+            path = os.path.join(self.device, name)
+        fd = self._fd(path)
+        if fd is None:
+            return None
+        try:
+            return os.pread(fd, 4096, 0)
+        except OSError:
+            return None
+
+    def read_int(self, name: str, hwmon: bool = False) -> Optional[int]:
+        value = self.read(name, hwmon)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def close(self):
+        for fd in self._fds.values():
+            if fd is not None:
+                os.close(fd)
+        self._fds.clear()
+
+
+class SysfsGpuProperties:
+    """Drop-in replacement for ``AmdGpuProperties`` backed by sysfs."""
+
+    # Seconds before the card directories are scanned again
+    discovery_interval = 60
+
+    # Seconds before a process without GPU clients is checked again
+    fdinfo_interval = 30
+
+    def __init__(self, root: str = DRM_ROOT, proc: str = PROC_ROOT):
+        self.root = root
+        self.proc = proc
+        self._cards: Dict[str, _Card] = {}
+        self._discovered = None
+        # pid -> (time of the next fdinfo check, whether it had GPU clients)
+        self._clients: Dict[int, Tuple[float, bool]] = {}
+
+    @property
+    def cards(self) -> List[_Card]:
+        """The amdgpu cards, rescanned every ``discovery_interval`` seconds."""
+        now = time.monotonic()
+        if self._discovered is None or now - self._discovered > self.discovery_interval:
+            devices = self.find_devices(self.root)
+            for device in set(self._cards) - set(devices):
+                self._cards.pop(device).close()
+            # Known cards keep their open file descriptors
+            self._cards = {d: self._cards.get(d) or _Card(d) for d in devices}
+            self._discovered = now
+        return list(self._cards.values())
+
+    @property
+    def gpus(self) -> int:
+        return self.get_gpu_count()
+
+    @staticmethod
+    def find_devices(root: str = DRM_ROOT) -> List[str]:
+        """Return the ``device`` directories of all amdgpu cards, in card order."""
+        devices = []
+        for path in glob.glob(os.path.join(root, "card*")):
+            match = _CARD.search(path)
+            device = os.path.join(path, "device")
+            if not match or not os.path.exists(os.path.join(device, "gpu_busy_percent")):
+                continue
+            try:
+                with open(os.path.join(device, "vendor")) as f:
+                    if f.read().strip() != AMD_VENDOR_ID:
+                        continue
+            except OSError:
+                continue
+            devices.append((int(match.group(1)), device))
+        return [device for _, device in sorted(devices)]
+
+    @classmethod
+    def available(cls, root: str = DRM_ROOT) -> bool:
+        return bool(cls.find_devices(root))
+
+    def close(self):
+        for card in self._cards.values():
+            card.close()
+
+    def get_gpu_count(self) -> int:
+        """Get the number of working GPUs."""
+        return len(self.cards) or -1
+
+    def _read_metric(self, card: _Card, metric: str):
+        if metric == "utilization":
+            return card.read_int("gpu_busy_percent")
+        if metric == "memory":
+            total = card.read_int("mem_info_vram_total")
+            used = card.read_int("mem_info_vram_used")
+            if not total or used is None:
+                return None
+            return round(used / total * 100)
+        if metric == "clock":
+            match = _ACTIVE_CLOCK.search(card.read("pp_dpm_sclk") or b"")
+            return int(match.group(1)) if match else None
+        if metric == "temperature":
+            value = card.read_int("temp1_input", hwmon=True)
+            return None if value is None else value / 1000
+        if metric == "power":
+            value = card.read_int("power1_average", hwmon=True)
+            if value is None:
+                value = card.read_int("power1_input", hwmon=True)
+            return None if value is None else value / 1e6
+        if metric == "voltage":
+            return card.read_int("in0_input", hwmon=True)
+        if metric == "pcie":
+            # Packets received, packets sent and max payload size over the last second
+            fields = (card.read("pcie_bw") or b"").split()
+            if len(fields) != 3:
+                return None
+            received, sent, payload = (int(f) for f in fields)
+            return (received + sent) * payload / 1024.0 / 1024.0
+        raise ValueError("Unknown metric {!r}".format(metric))
+
+    def get_gpu_metrics(self, metrics: Iterable[str] = ("utilization", "memory")) -> List[GpuRecord]:
+        """Return a ``GpuRecord`` per GPU read from sysfs."""
+        metrics = tuple(metrics)
+        return [
+            GpuRecord(index, **{m: self._read_metric(card, m) for m in metrics})
+            for index, card in enumerate(self.cards)
+        ]
+
+    def _get(self, metric: str, missing) -> list:
+        return [
+            missing if value is None else value
+            for value in (getattr(r, metric) for r in self.get_gpu_metrics((metric,)))
+        ]
+
+    def get_gpu_utilization(self) -> List[int]:
+        """Return the utilization of each GPU in %."""
+        return self._get("utilization", -1)
+
+    def get_gpu_clock_freq(self) -> List[int]:
+        """Return the clock frequence of each GPU in Mhz."""
+        return self._get("clock", -1)
+
+    def get_gpu_vram_use(self) -> List[int]:
+        """Return the current v-ram usage of each GPU in %."""
+        return self._get("memory", -1)
+
+    def get_gpu_pcie_bandwith(self) -> List[float]:
+        """Return the estimated maximum PCIe bandwith in MB/s."""
+        return self._get("pcie", -1.0)
+
+    def get_gpu_voltage(self) -> List[int]:
+        """Return the current Voltage per GPU in mV."""
+        return self._get("voltage", -1)
+
+    def _gpu_process(self, pid: int, devices: Dict[bytes, int]) -> Optional[GpuProcess]:
+        gpus = set()
+        vram = 0
+        for keys in read_fdinfo(self.proc, pid):
+            index = devices.get(keys.get(b"drm-pdev"))
+            if index is None:
+                continue
+            gpus.add(index)
+            vram += int(keys.get(b"drm-memory-vram", 0)) * _KIB
+        if not gpus:
+            return None
+        return GpuProcess(pid, tuple(sorted(gpus)), vram)
+
+    def get_gpu_processes(self) -> Dict[int, GpuProcess]:
+        """Return the processes using a GPU, read from ``/proc/<pid>/fdinfo``.
+
+        Processes with GPU clients are read on every call. Walking the file
+        descriptors of the others is costly, so they are only checked when
+        they are new and then every ``fdinfo_interval`` seconds, staggered.
+        """
+        devices = {
+            os.path.basename(os.path.realpath(card.device)).encode(): index
+            for index, card in enumerate(self.cards)
+        }
+        now = time.monotonic()
+        processes = {}
+        clients = {}
+        for name in os.listdir(self.proc):
+            if not name.isdigit():
+                continue
+            pid = int(name)
+            due, had_clients = self._clients.get(pid, (now, False))
+            if not had_clients and due > now:
+                clients[pid] = (due, False)
+                continue
+            try:
+                process = self._gpu_process(pid, devices)
+            except OSError:
+                # Gone, or owned by another user
+                process = None
+            if process is not None:
+                processes[pid] = process
+            due = now + self.fdinfo_interval * (0.5 + random.random())
+            clients[pid] = (due, process is not None)
+        self._clients = clients
+        return processes
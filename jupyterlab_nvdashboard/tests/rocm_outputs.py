@@ -1,11 +1,13 @@
-import pytest
-from unittest.mock import MagicMock
+"""
+Sample rocm-smi outputs shared by the parser tests and benchmarks.
 
-from apps import AmdGpuProperties as amd
+Each entry holds the raw output of the rocm-smi command a getter runs,
+followed by the expected result.
+"""
 
-@pytest.mark.parametrize(
-    "test_input,expected_val",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_val)
+GPU_COUNT = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         ================================= Concise Info =================================\n\
         GPU  Temp   AvgPwr  SCLK    MCLK    Fan   Perf  PwrCap  VRAM%  GPU% \n\
         0    20.0c  14.0W   925Mhz  350Mhz  0.0%  auto  225.0W    0%   0%   \n\
@@ -33,7 +35,8 @@ from apps import AmdGpuProperties as amd
         ================================================================================\n\
         ============================= End of ROCm SMI Log ==============================\n",
         7
-    ),(b"\n\n======================= ROCm System Management Interface =======================\n\
+    ),
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         ================================= Concise Info =================================\n\
         \n\
         ================================================================================\n\
@@ -41,18 +44,12 @@ from apps import AmdGpuProperties as amd
         -1
     ),
     (b"rocm-smi: command not found", -1),
-    (b"-sh: rocm-smi: not found", -1)
-    ])
-def test_get_gpu_count(test_input, expected_val):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    assert gpus == expected_val
-    bash.run.assert_called_with("rocm-smi", capture_output=True)
+    (b"-sh: rocm-smi: not found", -1),
+]
 
-@pytest.mar.parameterize(
-    "test_input,expected_sum,expected_len",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_sum, expected_len)
+GPU_UTILIZATION = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         ============================== % time GPU is busy ==============================\n\
         GPU[0]\t\t: GPU use (%): 0\n\
         GPU[1]\t\t: GPU use (%): 0\n\
@@ -90,20 +87,12 @@ def test_get_gpu_count(test_input, expected_val):
         7
     ),
     (b"rocm-smi: command not found", 0, 0),
-    (b"-sh: rocm-smi: not found", 0, 0)
-    ])
-def test_get_gpu_utilization(test_input, expected_sum, expected_len):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    gpu_util = amd.get_gpu_utilization()
-    assert len(gpu_util) == expected_len
-    assert sum(gpu_util) == expected_sum
-    bash.run.assert_called_with(["rocm-smi", "-u"], capture_output=True)
+    (b"-sh: rocm-smi: not found", 0, 0),
+]
 
-@pytest.mark.parameterize(
-    "test_input,expected_sum,expected_len",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_sum, expected_len)
+GPU_CLOCK_FREQ = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         ========================== Current clock frequencies ===========================\n\
         GPU[0]\t\t: sclk clock level: 0 (925Mhz)\n\
         GPU[1]\t\t: sclk clock level: 1 (930Mhz)\n\
@@ -147,20 +136,12 @@ def test_get_gpu_utilization(test_input, expected_sum, expected_len):
         6
     ),
     (b"rocm-smi: command not found", 0, 0),
-    (b"-sh: rocm-smi: not found", 0, 0)
-    ])
-def test_get_gpu_clock_freq(test_input, expected_sum, expected_len):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    gpu_freq = amd.get_gpu_clock_freq()
-    assert len(gpu_freq) == expected_len
-    assert sum(gpu_freq) == expected_sum
-    bash.run.assert_called_with(["rocm-smi", "-g"], capture_output=True)
+    (b"-sh: rocm-smi: not found", 0, 0),
+]
 
-@pytest.mark.parametrize(
-    "test_input,expected_sum,expected_len",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_sum, expected_len)
+GPU_VRAM_USE = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         ================================= Concise Info =================================\n\
         GPU  Temp   AvgPwr  SCLK    MCLK    Fan   Perf  PwrCap  VRAM%  GPU%  \n\
         0    20.0c  16.0W   925Mhz  350Mhz  0.0%  auto  225.0W   100%  8%    \n\
@@ -192,20 +173,12 @@ def test_get_gpu_clock_freq(test_input, expected_sum, expected_len):
         7
     ),
     (b"rocm-smi: command not found", 0, 0),
-    (b"-sh: rocm-smi: not found", 0, 0)
-    ])
-def test_get_gpu_vram_use(test_input, expected_sum, expected_len):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    gpu_vram = amd.get_gpu_vram_use()
-    assert len(gpu_vram) == expected_len
-    assert sum(gpu_vram) == expected_sum
-    bash.run.assert_called_with(["rocm-smi", "--showmemuse"], capture_output=True)
+    (b"-sh: rocm-smi: not found", 0, 0),
+]
 
-@pytest.mark.parametrize(
-    "test_input,expected_sum,expected_len",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_sum, expected_len)
+GPU_PCIE_BANDWITH = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         =========================== Measured PCIe Bandwidth ============================\n\
         GPU[0]\t\t: Estimated maximum PCIe bandwidth over the last second (MB/s): 0.000\n\
         GPU[1]\t\t: Estimated maximum PCIe bandwidth over the last second (MB/s): 0.000\n\
@@ -234,7 +207,8 @@ def test_get_gpu_vram_use(test_input, expected_sum, expected_len):
         ============================= End of ROCm SMI Log ==============================\n",
         2002.5720000000001,
         8
-    )(b"\n\n======================= ROCm System Management Interface =======================\n\
+    ),
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         =========================== Measured PCIe Bandwidth ============================\n\
         GPU[0]\t\t: Estimated maximum PCIe bandwidth over the last second (MB/s): 500.000\n\
         GPU[1]\t\t: Estimated maximum PCIe bandwidth over the last second (MB/s): 0.071\n\
@@ -249,20 +223,12 @@ def test_get_gpu_vram_use(test_input, expected_sum, expected_len):
         7
     ),
     (b"rocm-smi: command not found", 0, 0),
-    (b"-sh: rocm-smi: not found", 0, 0)
-    ])
-def test_get_gpu_pcie_use(test_input, expected_sum, expected_len):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    gpu_pcie = amd.get_pcie_use()
-    assert len(gpu_pcie) == expected_len
-    assert sum(gpu_pcie) == expected_sum
-    bash.run.assert_called_with(["rocm-smi", "-b"], capture_output=True)
+    (b"-sh: rocm-smi: not found", 0, 0),
+]
 
-@pytest.mark.parametrize(
-    "test_input,expected_sum,expected_len",
-    [(b"\n\n======================= ROCm System Management Interface =======================\n\
+# (test_input, expected_sum, expected_len)
+GPU_VOLTAGE = [
+    (b"\n\n======================= ROCm System Management Interface =======================\n\
         =============================== Current voltage ================================\n\
         GPU[0]\t\t: Voltage (mV): 737\n\
         GPU[1]\t\t: Voltage (mV): 737\n\
@@ -300,13 +266,5 @@ def test_get_gpu_pcie_use(test_input, expected_sum, expected_len):
         0
     ),
     (b"rocm-smi: command not found", 0, 0),
-    (b"-sh: rocm-smi: not found", 0, 0)
-    ])
-def test_get_gpu_voltage(test_input, expected_sum, expected_len):
-    bash = MagicMock()
-    bash.run().stdout = test_input
-    gpus = amd.gpus
-    gpu_volt = amd.get_gpu_voltage()
-    assert len(gpu_volt) == expected_len
-    assert sum(gpu_volt) == expected_sum
-    bash.run.assert_called_with(["rocm-smi", "--showvoltage"], capture_output=True)
+    (b"-sh: rocm-smi: not found", 0, 0),
+]
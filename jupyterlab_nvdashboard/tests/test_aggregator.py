@@ -0,0 +1,138 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from tornado import web, websocket
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+
+from jupyterlab_nvdashboard.aggregator import Aggregator, NodeClient, parse_nodes, stream_url
+from jupyterlab_nvdashboard.api import metrics_handlers
+from jupyterlab_nvdashboard.sampler import GpuSnapshot, Sampler
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("node1:8000", "ws://node1:8000/metrics/stream"),
+        ("https://hub/user/a/proxy/8000/", "wss://hub/user/a/proxy/8000/metrics/stream"),
+        ("ws://node1:8000/metrics/stream", "ws://node1:8000/metrics/stream"),
+    ],
+)
+def test_stream_url(url, expected):
+    assert stream_url(url) == expected
+
+
+def test_parse_nodes():
+    assert parse_nodes(["a=node1:8000", "node2:8000", "http://node3/?token=x"]) == {
+        "a": "node1:8000",
+        "node2:8000": "node2:8000",
+        "node3": "http://node3/?token=x",
+    }
+
+
+async def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_aggregator_merges_nodes_and_marks_dead_ones():
+    async def run():
+        nodes = {}
+        servers = []
+        for name, values in (("a", (10, 20)), ("b", (30,))):
+            sampler = Sampler(MagicMock(return_value=GpuSnapshot(0.0, values, values)), 50)
+            sock, port = bind_unused_port()
+            server = HTTPServer(web.Application(metrics_handlers("", {"gpu": sampler})))
+            server.add_sockets([sock])
+            servers.append((server, sampler))
+            nodes[name] = "localhost:{}".format(port)
+        # Nothing listens on this port
+        sock, port = bind_unused_port()
+        sock.close()
+        nodes["dead"] = "localhost:{}".format(port)
+
+        aggregator = Aggregator(nodes, timeout=1)
+        aggregator.start()
+        await wait_for(lambda: sum(not n.stale for n in aggregator.gpus()) == 2)
+        gpus = {n.node: n for n in aggregator.gpus()}
+        assert gpus["a"].utilization == [10, 20]
+        assert gpus["b"].memory == [30]
+        assert gpus["dead"].stale
+
+        # A node that stops sending is shown without data
+        servers[0][1].stop()
+        servers[0][0].stop()
+        await wait_for(lambda: {n.node: n for n in aggregator.gpus()}["a"].stale)
+        aggregator.stop()
+        servers[1][1].stop()
+
+    asyncio.run(run())
+
+
+def test_node_client_reconnects_after_bad_messages():
+    connections = []
+
+    class Garbage(websocket.WebSocketHandler):
+        def open(self):
+            connections.append(self)
+            # A schema without "source", then a truncated frame
+            self.write_message('{"type": "schema"}' if len(connections) == 1 else "{")
+
+    async def run():
+        sock, port = bind_unused_port()
+        server = HTTPServer(web.Application([("/metrics/stream", Garbage)]))
+        server.add_sockets([sock])
+        client = NodeClient("bad", "localhost:{}".format(port), timeout=5)
+        IOLoop.current().spawn_callback(client.run)
+        await wait_for(lambda: len(connections) >= 3)
+        assert client.stale
+        client.stop()
+        server.stop()
+
+    with patch("jupyterlab_nvdashboard.aggregator.RETRY_INTERVAL", 0.01):
+        asyncio.run(run())
+
+
+def test_aggregator_with_agent_processes(tmp_path):
+    ports = []
+    for _ in range(2):
+        sock, port = bind_unused_port()
+        sock.close()
+        ports.append(port)
+    env = dict(os.environ, NVDASHBOARD_PROVIDER="synthetic", PYTHONPATH=REPO)
+    agents = [
+        subprocess.Popen(
+            [sys.executable, "-m", "jupyterlab_nvdashboard.server", str(port)],
+            cwd=str(tmp_path),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+
+    async def run():
+        aggregator = Aggregator({str(p): "localhost:{}".format(p) for p in ports}, timeout=2)
+        aggregator.start()
+        await wait_for(lambda: not any(n.stale for n in aggregator.gpus()), timeout=30)
+        # The synthetic provider has four GPUs
+        assert [len(n.utilization) for n in aggregator.gpus()] == [4, 4]
+        aggregator.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        for agent in agents:
+            agent.terminate()
+            agent.wait(10)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+from tornado import web
+from tornado.testing import bind_unused_port
+
+from jupyterlab_nvdashboard.alerts import (
+    AlertEngine,
+    Condition,
+    Rule,
+    WebhookSink,
+    load_rules,
+)
+from jupyterlab_nvdashboard.sampler import GpuSnapshot
+
+
+def snapshot(time, utilization, memory, temperature=()):
+    return GpuSnapshot(time, utilization, memory, temperature=temperature)
+
+
+def test_parse_condition():
+    assert Condition.parse("utilization >= 100") == Condition("utilization", ">=", 100.0)
+    assert Condition.parse(" rate( memory )==0") == Condition("memory", "==", 0.0, True)
+    assert str(Condition.parse("rate(memory) < -1.5")) == "rate(memory) < -1.5"
+    for text in ("utilization", "utilization >= hot", "rate(memory >= 1", "temp >= 85"):
+        with pytest.raises(ValueError):
+            Condition.parse(text)
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"name": "hot", "when": "temperature > 80", "for": 5}]))
+    assert load_rules(str(path)) == [Rule("hot", (Condition("temperature", ">", 80.0),), 5.0)]
+    path.write_text(json.dumps([{"when": "temperature > 80"}]))
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+
+
+def test_value_rule_fires_after_duration_and_resolves():
+    events = []
+    rule = Rule("hot", (Condition.parse("temperature >= 90"),), 10)
+    engine = AlertEngine([rule], [events.append])
+    engine(snapshot(0, (0, 0), (0, 0), (95, 50)))
+    engine(snapshot(5, (0, 0), (0, 0), (95, 50)))
+    assert events == []
+    engine(snapshot(10, (0, 0), (0, 0), (96, -1)))
+    assert [(e.rule, e.device, e.firing, e.values) for e in events] == [
+        ("hot", 0, True, {"temperature": 96.0})
+    ]
+    assert engine.firing.tolist() == [True, False]
+    # Still firing, nothing new
+    engine(snapshot(11, (0, 0), (0, 0), (97, 50)))
+    assert len(events) == 1
+    engine(snapshot(12, (0, 0), (0, 0), (80, 50)))
+    assert (events[-1].device, events[-1].firing) == (0, False)
+    assert "Resolved GPU 0: hot" in events[-1].message()
+    assert engine.firing.tolist() == [False, False]
+
+
+def test_rate_rule_detects_stuck_gpu():
+    events = []
+    rule = Rule.from_dict(
+        {"name": "stuck", "when": ["utilization >= 100", "rate(memory) == 0"], "for": 2}
+    )
+    engine = AlertEngine([rule], [events.append])
+    for t, memory in enumerate([10, 10, 10, 10, 11]):
+        engine(snapshot(float(t), (100, 100), (memory, memory + t)))
+    # GPU 0 fired at t=3 (flat since t=1), GPU 1's memory kept moving
+    assert [(e.device, e.firing, e.time) for e in events] == [(0, True, 3.0), (0, False, 4.0)]
+
+
+def test_failed_reading_resolves_without_nan():
+    events = []
+    engine = AlertEngine([Rule("hot", (Condition.parse("temperature >= 90"),))], [events.append])
+    engine(snapshot(0, (0,), (0,), (95,)))
+    engine(snapshot(1, (0,), (0,), (-1,)))
+    assert (events[-1].firing, events[-1].values) == (False, {"temperature": None})
+    assert "temperature=unknown" in events[-1].message()
+    json.loads(json.dumps(events[-1]._asdict()), parse_constant=pytest.fail)
+
+
+def test_gpu_count_change_resets_state():
+    engine = AlertEngine([Rule("busy", (Condition.parse("utilization > 50"),))])
+    engine(snapshot(0, (60,), (0,)))
+    assert engine.firing.tolist() == [True]
+    engine(snapshot(1, (0, 60), (0, 0)))
+    assert engine.firing.tolist() == [False, True]
+
+
+def test_failing_sink_does_not_stop_others():
+    events = []
+
+    def broken(event):
+        raise RuntimeError
+
+    rule = Rule("busy", (Condition.parse("utilization > 50"),))
+    engine = AlertEngine([rule], [broken, events.append])
+    engine(snapshot(0, (60,), (0,)))
+    assert len(events) == 1
+
+
+def test_webhook_sink_posts_events():
+    received = []
+
+    class Stub(web.RequestHandler):
+        def post(self):
+            received.append(json.loads(self.request.body))
+
+    async def run():
+        sock, port = bind_unused_port()
+        server = web.Application([("/hook", Stub)]).listen(0)
+        server.add_sockets([sock])
+        engine = AlertEngine(
+            [Rule("busy", (Condition.parse("utilization > 50"),))],
+            [WebhookSink("http://127.0.0.1:{}/hook".format(port))],
+        )
+        engine(snapshot(0, (60,), (0,)))
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        server.stop()
+
+    asyncio.run(run())
+    assert received == [
+        {
+            "time": 0,
+            "rule": "busy",
+            "severity": "warning",
+            "device": 0,
+            "firing": True,
+            "values": {"utilization": 60.0},
+        }
+    ]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import numpy as np
+from tornado import web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.websocket import websocket_connect
+
+from jupyterlab_nvdashboard.api import (
+    decode_frame,
+    encode_frame,
+    metrics_handlers,
+    snapshot_schema,
+)
+from jupyterlab_nvdashboard.sampler import GpuSnapshot, HostSnapshot, Sampler
+
+
+def test_frame_round_trip():
+    snapshot = HostSnapshot(12.5, 30.0, (10.0, 50.0, 30.0), 2 ** 40, 1.0, 2.0, 3.0, 4.0)
+    schema = snapshot_schema(snapshot)
+
+    assert all(field["offset"] % 8 == 0 for field in schema)
+    frame = encode_frame(1, snapshot, schema)
+    values = decode_frame(schema, frame)
+    assert values["source"] == 1
+    assert values["time"] == 12.5
+    assert values["memory"] == 2 ** 40
+    np.testing.assert_array_equal(values["cpu_per_core"], [10.0, 50.0, 30.0])
+
+
+def test_gpu_frames_are_compact():
+    snapshot = GpuSnapshot(1.0, (1, 2, 3, 4), (5, 6, 7, 8))
+    frame = encode_frame(0, snapshot, snapshot_schema(snapshot))
+    # Header, then 4 int16 values per field
+    assert len(frame) == 16 + 8 + 8
+
+
+def test_snapshot_and_stream():
+    snapshot = GpuSnapshot(1.0, (10, 20), (30, 40))
+    sampler = Sampler(MagicMock(return_value=snapshot), interval=10)
+
+    async def run():
+        sock, port = bind_unused_port()
+        server = HTTPServer(web.Application(metrics_handlers("", {"gpu": sampler})))
+        server.add_sockets([sock])
+        url = "localhost:{}/metrics/".format(port)
+
+        response = await AsyncHTTPClient().fetch("http://" + url + "snapshot")
+        assert json.loads(response.body)["gpu"]["utilization"] == [10, 20]
+
+        connection = await websocket_connect("ws://" + url + "stream")
+        schema = json.loads(await connection.read_message())
+        assert schema["type"] == "schema" and schema["name"] == "gpu"
+        values = decode_frame(schema["fields"], await connection.read_message())
+        assert list(values["memory"]) == [30, 40]
+        # The stream subscribed the sampler, which now polls
+        assert sampler.running
+        connection.close()
+        await asyncio.sleep(0.05)
+        assert not sampler._subscribers
+        sampler.stop()
+        server.stop()
+
+    asyncio.run(run())
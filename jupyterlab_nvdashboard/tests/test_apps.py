@@ -0,0 +1,159 @@
+from unittest.mock import MagicMock
+
+from bokeh.document import Document
+from bokeh.models import NumberFormatter
+import numpy as np
+import pytest
+
+from jupyterlab_nvdashboard.apps import cpu, gpu, processes
+from jupyterlab_nvdashboard.processes import ProcessSnapshot
+from jupyterlab_nvdashboard.ringbuffer import DeviceHistory, RingBuffer
+from jupyterlab_nvdashboard.rollup import Rollup
+from jupyterlab_nvdashboard.sampler import GpuSnapshot
+
+
+def test_gpu_processes_sessions_do_not_share_models(monkeypatch):
+    # Without polling the provider
+    monkeypatch.setattr(processes.sampler, "subscribe", lambda key: None)
+    monkeypatch.setattr(
+        processes.sampler,
+        "snapshot",
+        ProcessSnapshot(0.0, (1,), ("a",), ("u",), ("a",), ("0",), (1024,), (1.0,), (2048,)),
+    )
+    docs = [Document(), Document()]
+    for doc in docs:
+        processes.gpu_processes(doc)
+
+    formatters = [set(doc.select({"type": NumberFormatter})) for doc in docs]
+    assert all(len(f) == 3 for f in formatters)
+    assert not formatters[0] & formatters[1]
+    (table,) = docs[1].roots
+    assert table.source.data["vram"] == [1024]
+
+
+def test_telemetry_columns_by_field_then_gpu():
+    assert gpu.telemetry_columns(2)[:5] == ["time", "clock-0", "clock-1", "pcie-0", "pcie-1"]
+    assert len(gpu.telemetry_columns(2)) == 1 + 2 * len(gpu.TELEMETRY)
+    assert gpu.telemetry_columns(0) == ["time"]
+
+
+@pytest.fixture
+def telemetry(monkeypatch):
+    """Empty telemetry history, without GPU polling."""
+    monkeypatch.setattr(gpu, "telemetry", RingBuffer(gpu.telemetry_columns(0), 10))
+    monkeypatch.setattr(gpu, "telemetry_gpus", 0)
+    monkeypatch.setattr(gpu, "telemetry_layouts", MagicMock())
+    monkeypatch.setattr(gpu.sampler, "subscribe", lambda key: None)
+
+
+def test_record_telemetry_leaves_gaps_for_failed_readings(telemetry):
+    gpu.record_telemetry(GpuSnapshot(1.0, (), ()))
+    assert gpu.telemetry_gpus == 0 and len(gpu.telemetry) == 0
+
+    # No PCIe reading at all, and a temperature that could not be read
+    gpu.record_telemetry(
+        GpuSnapshot(2.0, (5,), (5,), clock=(800,), temperature=(-1,), power=(30.5,))
+    )
+    data = gpu.telemetry.view()
+    assert list(data["time"]) == [2000.0]
+    assert list(data["clock-0"]) == [800.0]
+    assert list(data["power-0"]) == [30.5]
+    assert np.isnan(data["temperature-0"][0])
+    assert np.isnan(data["pcie-0"][0])
+
+
+def test_record_telemetry_widens_for_new_gpus(telemetry):
+    gpu.record_telemetry(GpuSnapshot(1.0, (5,), (5,), clock=(800,)))
+    first = gpu.telemetry
+    gpu.record_telemetry(GpuSnapshot(2.0, (5, 5), (5, 5), clock=(810, 820)))
+    assert gpu.telemetry is not first
+    assert gpu.telemetry.columns == gpu.telemetry_columns(2)
+    assert list(gpu.telemetry.view()["clock-1"]) == [820.0]
+    gpu.telemetry_layouts.invalidate.assert_called()
+    # Fewer GPUs keep the wider buffer, the missing ones as gaps
+    gpu.record_telemetry(GpuSnapshot(3.0, (5,), (5,), clock=(830,)))
+    assert gpu.telemetry.columns == gpu.telemetry_columns(2)
+    assert np.isnan(gpu.telemetry.view()["clock-1"][-1])
+
+
+def test_telemetry_timeline_adds_lines_for_new_gpus(telemetry, monkeypatch):
+    gpu.record_telemetry(GpuSnapshot(1.0, (5,), (5,), clock=(800,)))
+    monkeypatch.setattr(gpu, "telemetry_layouts", MagicMock())
+    gpu.telemetry_layouts.take.side_effect = gpu._telemetry_layout
+    doc = Document()
+    gpu.gpu_telemetry_timeline(doc)
+    (callback,) = doc.session_callbacks
+    (root,) = doc.roots
+    clock = root.children[0]
+    source = clock.renderers[0].data_source
+    assert [item.label["value"] for item in clock.legend[0].items] == ["GPU 0"]
+    assert list(source.data["clock-0"]) == [800.0]
+
+    gpu.record_telemetry(GpuSnapshot(2.0, (5, 5), (5, 5), clock=(810, 820)))
+    callback.callback()
+    assert [item.label["value"] for item in clock.legend[0].items] == ["GPU 0", "GPU 1"]
+    assert list(source.data["clock-1"]) == [820.0]
+
+
+def test_assign_slots_keeps_devices_in_place():
+    assert cpu._assign_slots([None] * 5, ["a", "b"]) == ["a", "b", None, None, None]
+    # Reordered, still in the top: nothing moves
+    assert cpu._assign_slots(["a", "b", None, None, None], ["b", "a"]) == [
+        "a", "b", None, None, None
+    ]
+    # Only the slot of the device that dropped out is reused
+    assert cpu._assign_slots(["a", "b", "c", "d", "e"], ["f", "e", "d", "c", "b"]) == [
+        "f", "b", "c", "d", "e"
+    ]
+
+
+def test_follow_devices_replaces_only_dropped_devices():
+    devices = DeviceHistory(cpu.HISTORY, window=2)
+    fig, lines = cpu._device_figure("Disks", None, "reset")
+    source, items = lines
+    follow = cpu._follow_devices(devices, lines)
+
+    def tick(t, **values):
+        devices.append(t, list(values), np.array(list(values.values()), dtype=float))
+
+    tick(0, a=3, b=2, c=1, d=0)
+    tick(1, a=3, b=2, c=1, d=0)
+    follow()
+    assert [item.label["value"] for item in items] == ["a", "b", "c", "", ""]
+    colors = {item.label["value"]: item.renderers[0].glyph.line_color for item in items}
+
+    tick(2, a=1, b=2, c=3, d=0)
+    tick(3, a=1, b=2, c=3, d=0)
+    follow()
+    # Reordered, so the lines stay as they are
+    assert [item.label["value"] for item in items] == ["a", "b", "c", "", ""]
+    assert list(source.data["device-0"]) == [3, 3, 1, 1]
+
+    tick(4, a=0, b=2, c=3, d=4)
+    tick(5, a=0, b=2, c=3, d=4)
+    follow()
+    assert [item.label["value"] for item in items] == ["d", "b", "c", "", ""]
+    assert items[1].renderers[0].glyph.line_color == colors["b"]
+    assert list(source.data["device-0"]) == [0, 0, 0, 0, 4, 4]
+    assert list(source.data["device-1"]) == [2] * 6
+    assert len(source.data["time"]) == 6
+
+
+def test_resource_timeline_starts_with_the_visible_window(monkeypatch):
+    history = RingBuffer(cpu.TIMELINE_COLUMNS, cpu.HISTORY)
+    for i in range(cpu.HISTORY):
+        # A sample every 200 ms, the last 200 s
+        history.append([i * 200.0] + [1.0] * (len(cpu.TIMELINE_COLUMNS) - 1))
+    monkeypatch.setattr(cpu, "history", history)
+    monkeypatch.setattr(cpu, "rollup", Rollup(cpu.TIMELINE_COLUMNS))
+    monkeypatch.setattr(cpu.sampler, "subscribe", lambda key: None)
+    monkeypatch.setattr(cpu, "timeline_layouts", MagicMock())
+    cpu.timeline_layouts.take.side_effect = cpu._timeline_layout
+
+    doc = Document()
+    cpu.resource_timeline(doc)
+    source = doc.roots[0].children[0].renderers[0].data_source
+    times = source.data["time"]
+    # The 101 samples of the last 20 s, plus the one just before them
+    assert len(times) == 102
+    assert times[-1] == (cpu.HISTORY - 1) * 200.0
@@ -0,0 +1,40 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from jupyterlab_nvdashboard.exporter import GPU_METRICS, HOST_METRICS, Exporter, render
+from jupyterlab_nvdashboard.sampler import GpuSnapshot, HostSnapshot, Sampler
+
+
+def test_render_gpu():
+    text = render(GpuSnapshot(0.0, (10, -1), (30, 40)), GPU_METRICS)
+    assert "# TYPE nvdashboard_gpu_utilization_percent gauge\n" in text
+    assert 'nvdashboard_gpu_utilization_percent{gpu="0"} 10.0\n' in text
+    # Failed readings are left out
+    assert 'nvdashboard_gpu_utilization_percent{gpu="1"}' not in text
+    assert 'nvdashboard_gpu_memory_used_percent{gpu="1"} 40.0\n' in text
+
+
+def test_render_host():
+    snapshot = HostSnapshot(0.0, 12.5, (10.0, 15.0), 1024, 1.0, 2.0, 3.0, 4.0)
+    text = render(snapshot, HOST_METRICS)
+    assert "nvdashboard_cpu_utilization_percent 12.5\n" in text
+    assert 'nvdashboard_cpu_core_utilization_percent{core="1"} 15.0\n' in text
+    assert "nvdashboard_memory_used_bytes 1024.0\n" in text
+
+
+def test_text_is_rendered_once_per_snapshot():
+    snapshots = [GpuSnapshot(0.0, (10,), (20,)), GpuSnapshot(1.0, (11,), (20,))]
+    collect = MagicMock(side_effect=snapshots + snapshots)
+    sampler = Sampler(collect)
+    exporter = Exporter({"gpu": (sampler, GPU_METRICS)})
+
+    async def run():
+        first = await exporter.scrape()
+        assert 'gpu="0"} 10.0' in first
+        assert await exporter.scrape() == first
+        assert exporter.text("gpu") is exporter.text("gpu")
+        sampler.stop()
+        sampler.publish(snapshots[1])
+        assert 'gpu="0"} 11.0' in exporter.text("gpu")
+
+    asyncio.run(run())
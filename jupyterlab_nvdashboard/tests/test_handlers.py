@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("jupyter_server")
+
+from jupyterlab_nvdashboard.handlers import KernelUsageHandler, kernel_pid  # noqa: E402
+from jupyterlab_nvdashboard.kernels import KernelMonitor  # noqa: E402
+
+
+def test_kernel_pid():
+    # jupyter_client >= 7
+    assert kernel_pid(SimpleNamespace(provisioner=SimpleNamespace(pid=10))) == 10
+    # jupyter_client < 7 keeps the Popen of the kernel
+    assert kernel_pid(SimpleNamespace(kernel=SimpleNamespace(pid=11))) == 11
+    assert kernel_pid(SimpleNamespace(provisioner=SimpleNamespace(pid=None), kernel=None)) is None
+    # Remote kernels have neither
+    assert kernel_pid(SimpleNamespace(provisioner=SimpleNamespace())) is None
+
+
+class FakeSessions:
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    async def list_sessions(self):
+        return self.sessions
+
+
+class FakeKernels:
+    def __init__(self, kernels):
+        self.kernels = kernels
+
+    def list_kernel_ids(self):
+        return list(self.kernels)
+
+    def get_kernel(self, kernel_id):
+        return self.kernels[kernel_id]
+
+
+class Handler(KernelUsageHandler):
+    """The handler without a Jupyter server, its managers replaced by fakes."""
+
+    session_manager = None
+    kernel_manager = None
+
+    def __init__(self, monitor, sessions, kernels):
+        self.initialize(monitor)
+        self.session_manager = FakeSessions(sessions)
+        self.kernel_manager = FakeKernels(kernels)
+        self.body = None
+
+    def finish(self, chunk=None):
+        self.body = json.loads(chunk)
+
+
+def test_kernel_usage_handler():
+    pid = os.getpid()
+    handler = Handler(
+        KernelMonitor(interval=60),
+        [
+            {"path": "work/train.ipynb", "kernel": {"id": "k1"}},
+            # Sessions of terminals or consoles may have no kernel
+            {"path": "notes.md", "kernel": None},
+        ],
+        {
+            "k1": SimpleNamespace(kernel_name="python3", provisioner=SimpleNamespace(pid=pid)),
+            "console": SimpleNamespace(kernel_name="ir", kernel=SimpleNamespace(pid=pid)),
+            "remote": SimpleNamespace(kernel_name="python3", provisioner=None),
+        },
+    )
+
+    asyncio.run(KernelUsageHandler.get.__wrapped__(handler))
+
+    assert handler.body["interval"] == 60
+    kernels = {k["id"]: k for k in handler.body["kernels"]}
+    assert set(kernels) == {"k1", "console"}
+    assert (kernels["k1"]["path"], kernels["k1"]["name"]) == ("work/train.ipynb", "python3")
+    assert (kernels["console"]["path"], kernels["console"]["name"]) == ("", "ir")
+    assert kernels["k1"]["pid"] == pid
+    assert kernels["k1"]["rss"] > 0
@@ -0,0 +1,56 @@
+import numpy as np
+
+from jupyterlab_nvdashboard.history import HistoryStore, open_store
+
+
+def test_append_and_read(tmp_path):
+    store = HistoryStore(str(tmp_path), "timeline", ["time", "value"], segment_rows=4)
+    for i in range(3):
+        store.append((i, i * 10))
+
+    data = store.read()
+    assert list(data["time"]) == [0, 1, 2]
+    assert list(data["value"]) == [0, 10, 20]
+    assert list(store.read(since=1)["time"]) == [1, 2]
+
+
+def test_rotation_drops_oldest_segments(tmp_path):
+    store = HistoryStore(
+        str(tmp_path), "timeline", ["time"], segment_rows=4, max_segments=2
+    )
+    for i in range(10):
+        store.append((i,))
+
+    assert len(store.segments()) == 2
+    assert list(store.read()["time"]) == [4, 5, 6, 7, 8, 9]
+    assert list(store.read(since=6)["time"]) == [6, 7, 8, 9]
+
+
+def test_resume_after_restart(tmp_path):
+    store = HistoryStore(str(tmp_path), "timeline", ["time"], segment_rows=4)
+    for i in range(2):
+        store.append((i,))
+    store.close()
+
+    store = HistoryStore(str(tmp_path), "timeline", ["time"], segment_rows=4)
+    store.append((2,))
+    assert len(store.segments()) == 1
+    assert list(store.read()["time"]) == [0, 1, 2]
+
+
+def test_new_columns_start_a_segment(tmp_path):
+    store = HistoryStore(str(tmp_path), "timeline", ["time", "gpu-0"])
+    store.append((0, 10))
+    store.set_columns(["time", "gpu-0", "gpu-1"])
+    store.append((1, 20, 30))
+
+    data = store.read()
+    assert len(store.segments()) == 2
+    assert list(data["gpu-0"]) == [10, 20]
+    assert np.isnan(data["gpu-1"][0]) and data["gpu-1"][1] == 30
+
+
+def test_open_store_is_disabled_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("NVDASHBOARD_HISTORY_DIR", raising=False)
+    assert open_store("timeline", ["time"]) is None
+    assert open_store("timeline", ["time"], str(tmp_path)) is not None
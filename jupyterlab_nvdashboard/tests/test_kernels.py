@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+
+import psutil
+
+from jupyterlab_nvdashboard.kernels import KernelMonitor, KernelProcess
+from jupyterlab_nvdashboard.rocm import GpuProcess
+
+
+# A "kernel" running a worker process, like multiprocessing or a local cluster
+KERNEL = (
+    "import subprocess, sys, time;"
+    "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']);"
+    "time.sleep(30)"
+)
+
+
+class FakeProvider:
+    def __init__(self, processes):
+        self.processes = processes
+
+    def get_gpu_processes(self):
+        return self.processes
+
+
+def wait_for_children(pid, count):
+    for _ in range(100):
+        children = psutil.Process(pid).children(recursive=True)
+        if len(children) >= count:
+            return [c.pid for c in children]
+        time.sleep(0.05)
+    raise AssertionError("no child processes")
+
+
+def test_kernel_usage_covers_the_process_tree():
+    kernel = subprocess.Popen([sys.executable, "-c", KERNEL])
+    try:
+        (worker,) = wait_for_children(kernel.pid, 1)
+        provider = FakeProvider({worker: GpuProcess(worker, (1,), 2048)})
+        monitor = KernelMonitor(provider, interval=60)
+        kernels = [
+            KernelProcess("k1", kernel.pid, "python3", "work/train.ipynb"),
+            KernelProcess("gone", 2 ** 22 + 1),
+        ]
+
+        usage = monitor.get(kernels)
+        assert [u.id for u in usage] == ["k1", "gone"]
+        k1, gone = usage
+        assert (k1.name, k1.path, k1.pid) == ("python3", "work/train.ipynb", kernel.pid)
+        assert set(k1.pids) == {kernel.pid, worker}
+        assert k1.rss > 0
+        assert (k1.gpus, k1.vram) == ((1,), 2048)
+        assert (gone.pids, gone.rss, gone.gpus, gone.vram) == ((), 0, (), -1)
+
+        # Cached until the interval passed or the kernels changed
+        assert monitor.get(kernels) is usage
+        assert monitor.get(kernels[:1]) is not usage
+    finally:
+        for process in psutil.Process(kernel.pid).children(recursive=True):
+            process.kill()
+        kernel.kill()
+        kernel.wait()
+
+
+def test_kernel_usage_without_provider():
+    usage = KernelMonitor().get([KernelProcess("self", os.getpid())])
+    assert usage[0].pids[0] == os.getpid()
+    assert (usage[0].gpus, usage[0].vram) == ((), -1)
+
+
+def test_kernel_usage_when_the_provider_fails(caplog):
+    class Broken:
+        def get_gpu_processes(self):
+            raise FileNotFoundError("rocm-smi")
+
+    monitor = KernelMonitor(Broken(), interval=0)
+    for _ in range(2):
+        (usage,) = monitor.get([KernelProcess("self", os.getpid())])
+        assert usage.rss > 0
+        assert (usage.gpus, usage.vram) == ((), -1)
+    assert len(caplog.records) == 1
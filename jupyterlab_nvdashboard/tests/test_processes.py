@@ -0,0 +1,67 @@
+import os
+
+from jupyterlab_nvdashboard.processes import ProcessCollector, ProcessTable
+from jupyterlab_nvdashboard.rocm import GpuProcess
+
+
+class Provider:
+    def __init__(self, processes):
+        self.processes = processes
+
+    def get_gpu_processes(self):
+        return self.processes
+
+
+def test_table_rereads_only_busy_processes(monkeypatch):
+    table = ProcessTable(idle_rescan=3600)
+    reads = []
+    read = table._read
+    monkeypatch.setattr(table, "_read", lambda entry, now: reads.append(entry) or read(entry, now))
+
+    entries = table.scan()
+    assert os.getpid() in entries
+    assert not reads
+    # New processes are read once more to get a CPU percentage
+    table.scan()
+    assert len(reads) == len(entries)
+
+    for entry in table.entries.values():
+        entry.cpu = 0.0
+    table.entries[1].cpu = 5.0
+    reads.clear()
+    table.scan(always=[os.getpid()])
+    assert {e.process.pid for e in reads} == {1, os.getpid()}
+    # The static attributes are kept
+    assert table.entries[os.getpid()].name
+
+
+def test_collector_lists_gpu_processes_first():
+    pid = os.getpid()
+    collector = ProcessCollector(
+        Provider({pid: GpuProcess(pid, (0, 2), 1024), 999999999: GpuProcess(999999999, (1,))}),
+        top=3,
+    )
+    snapshot = collector()
+    assert snapshot.pid[:2] == (pid, 999999999)
+    assert snapshot.gpus[:2] == ("0,2", "1")
+    assert snapshot.vram[:2] == (1024, -1)
+    assert snapshot.rss[0] > 0
+    # Processes outside this pid namespace have no table entry
+    assert snapshot.name[1] == ""
+    assert len(snapshot.pid) == 5
+    assert all(not gpus for gpus in snapshot.gpus[2:])
+
+
+def test_collector_without_gpu_processes(caplog):
+    class Broken:
+        def get_gpu_processes(self):
+            raise FileNotFoundError("rocm-smi")
+
+    collector = ProcessCollector(Broken(), top=3)
+    for _ in range(2):
+        snapshot = collector()
+        # Still the busiest processes by CPU
+        assert len(snapshot.pid) == 3
+        assert not any(snapshot.gpus)
+    # Logged once, not on every collection
+    assert len(caplog.records) == 1
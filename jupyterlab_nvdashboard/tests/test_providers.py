@@ -0,0 +1,131 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from jupyterlab_nvdashboard.providers import (
+    MetricsProvider,
+    NvmlProvider,
+    RocmProvider,
+    SyntheticProvider,
+    get_provider,
+)
+from jupyterlab_nvdashboard.rocm import GpuProcess, GpuRecord
+
+
+ALL_METRICS = ("utilization", "memory", "clock", "temperature", "power", "voltage", "pcie")
+
+
+class FakeNvml:
+    NVML_CLOCK_SM = 1
+    NVML_TEMPERATURE_GPU = 0
+    NVML_PCIE_UTIL_TX_BYTES = 0
+    NVML_PCIE_UTIL_RX_BYTES = 1
+
+    class NVMLError(Exception):
+        pass
+
+    def __init__(self):
+        self.calls = []
+
+    def nvmlInit(self):
+        pass
+
+    def nvmlShutdown(self):
+        pass
+
+    def nvmlDeviceGetCount(self):
+        return 2
+
+    def nvmlDeviceGetHandleByIndex(self, i):
+        self.calls.append("handle")
+        return i
+
+    def nvmlDeviceGetUtilizationRates(self, h):
+        self.calls.append("utilization")
+        return SimpleNamespace(gpu=10 * (h + 1), memory=0)
+
+    def nvmlDeviceGetMemoryInfo(self, h):
+        return SimpleNamespace(used=250 * (h + 1), total=1000)
+
+    def nvmlDeviceGetClockInfo(self, h, clock):
+        return 1500
+
+    def nvmlDeviceGetTemperature(self, h, sensor):
+        return 40
+
+    def nvmlDeviceGetPowerUsage(self, h):
+        return 75000
+
+    def nvmlDeviceGetPcieThroughput(self, h, counter):
+        if h == 1:
+            raise self.NVMLError("not supported")
+        return 1024
+
+
+def test_nvml_provider():
+    nvml = FakeNvml()
+    provider = NvmlProvider(nvml)
+    assert provider.get_gpu_count() == 2
+    assert provider.get_gpu_metrics(ALL_METRICS) == [
+        GpuRecord(0, 10, 25, 1500, 40.0, 75.0, None, 2.0),
+        GpuRecord(1, 20, 50, 1500, 40.0, 75.0, None, None),
+    ]
+    # Handles are only looked up once and unrequested metrics are skipped
+    nvml.calls.clear()
+    provider.get_gpu_metrics(("memory",))
+    provider.get_gpu_metrics(("utilization",))
+    assert nvml.calls == ["utilization", "utilization"]
+
+
+def test_rocm_provider():
+    properties = MagicMock()
+    properties.gpus = -1
+    properties.get_gpu_metrics.return_value = [GpuRecord(0, 5)]
+    provider = RocmProvider(properties)
+
+    assert provider.get_gpu_count() == 0
+    assert provider.get_gpu_metrics(("utilization",)) == [GpuRecord(0, 5)]
+    properties.get_gpu_metrics.assert_called_once_with(("utilization",))
+
+
+def test_synthetic_provider_is_deterministic():
+    a, b = SyntheticProvider(ngpus=3, seed=1), SyntheticProvider(ngpus=3, seed=1)
+    for _ in range(5):
+        records = a.get_gpu_metrics(ALL_METRICS)
+        assert records == b.get_gpu_metrics(ALL_METRICS)
+    assert len(records) == 3
+    assert all(0 <= r.utilization <= 100 and 5 <= r.memory <= 95 for r in records)
+    assert SyntheticProvider(seed=2).get_gpu_metrics() != SyntheticProvider(seed=1).get_gpu_metrics()
+
+
+def test_get_provider(monkeypatch):
+    monkeypatch.setenv("NVDASHBOARD_PROVIDER", "synthetic")
+    assert isinstance(get_provider(), SyntheticProvider)
+    with pytest.raises(ValueError, match="Unknown metrics provider"):
+        get_provider("cuda")
+
+
+def test_incomplete_provider_fails_when_created():
+    class CountOnly(MetricsProvider):
+        def get_gpu_count(self):
+            return 0
+
+    with pytest.raises(TypeError, match="get_gpu_metrics"):
+        CountOnly()
+
+
+def test_nvml_gpu_processes():
+    nvml = FakeNvml()
+    compute = [SimpleNamespace(pid=7, usedGpuMemory=100)]
+    nvml.nvmlDeviceGetComputeRunningProcesses = lambda h: list(compute)
+    # A process doing graphics too is listed again with the same memory
+    nvml.nvmlDeviceGetGraphicsRunningProcesses = lambda h: (
+        [SimpleNamespace(pid=7, usedGpuMemory=100), SimpleNamespace(pid=9, usedGpuMemory=None)]
+        if h == 1
+        else []
+    )
+    assert NvmlProvider(nvml).get_gpu_processes() == {
+        7: GpuProcess(7, (0, 1), 200),
+        9: GpuProcess(9, (1,), 0),
+    }
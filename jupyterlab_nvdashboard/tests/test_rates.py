@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+import numpy as np
+
+from jupyterlab_nvdashboard.rates import CounterRates, Partitions
+
+
+Counters = namedtuple("Counters", "bytes_recv bytes_sent")
+
+
+def test_rates_per_device():
+    rates = CounterRates(("bytes_recv", "bytes_sent"))
+    names, values = rates.update(0.0, {"eth0": Counters(100, 0), "eth1": Counters(0, 0)})
+    assert names == ["eth0", "eth1"]
+    assert not values.any()
+
+    names, values = rates.update(2.0, {"eth0": Counters(300, 10), "eth1": Counters(4, 0)})
+    np.testing.assert_array_equal(values, [[100, 5], [2, 0]])
+
+
+def test_device_churn_and_counter_reset():
+    rates = CounterRates(("bytes_recv", "bytes_sent"))
+    rates.update(0.0, {"eth0": Counters(100, 100), "eth1": Counters(0, 0)})
+
+    # eth1 was unplugged, usb0 plugged in and eth0's driver reloaded
+    names, values = rates.update(
+        1.0, {"usb0": Counters(500, 500), "eth0": Counters(10, 150)}
+    )
+    assert names == ["usb0", "eth0"]
+    np.testing.assert_array_equal(values, [[0, 0], [0, 50]])
+
+    names, values = rates.update(2.0, {"usb0": Counters(600, 500), "eth0": Counters(20, 150)})
+    np.testing.assert_array_equal(values, [[100, 0], [10, 0]])
+
+    names, values = rates.update(3.0, {})
+    assert names == [] and values.shape == (0, 2)
+
+
+def test_partitions(tmp_path):
+    (tmp_path / "sda").mkdir()
+    (tmp_path / "sda1").mkdir()
+    (tmp_path / "sda1" / "partition").write_text("1\n")
+    partitions = Partitions(str(tmp_path))
+    assert "sda1" in partitions
+    assert "sda" not in partitions
+    assert "nvme0n1" not in partitions
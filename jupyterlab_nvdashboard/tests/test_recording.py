@@ -0,0 +1,93 @@
+import gzip
+
+from jupyterlab_nvdashboard import recording
+from jupyterlab_nvdashboard.processes import ProcessSnapshot
+from jupyterlab_nvdashboard.recording import Recorder, Replay, read_recording
+from jupyterlab_nvdashboard.sampler import DeviceRate, GpuSnapshot, HostSnapshot, Sampler
+
+
+def host(time, cpu):
+    return HostSnapshot(
+        time, cpu, (cpu,), 100, 1.0, 2.0, 3.0, 4.0,
+        disks=(DeviceRate("sda", 1.0, 2.0),), nics=(DeviceRate("eth0", 3.0, 4.0),),
+    )
+
+
+def test_record_and_read(tmp_path):
+    path = str(tmp_path / "metrics.jsonl.gz")
+    gpu, hosts = Sampler(lambda: None, name="gpu"), Sampler(lambda: None, name="host")
+    recorder = Recorder(path)
+    recorder.attach("gpu", gpu)
+    recorder.attach("host", hosts)
+    gpu.publish(GpuSnapshot(1.0, (10, 20), (30, 40), (1000, 1100)))
+    hosts.publish(host(1.2, 5.0))
+    gpu.publish(GpuSnapshot(1.5, (11, 21), (31, 41)))
+    recorder.close()
+    # Detached on close
+    gpu.publish(GpuSnapshot(2.0, (0,), (0,)))
+
+    records = list(read_recording(path))
+    assert records == [
+        ("gpu", GpuSnapshot(1.0, (10, 20), (30, 40), (1000, 1100))),
+        ("host", host(1.2, 5.0)),
+        ("gpu", GpuSnapshot(1.5, (11, 21), (31, 41))),
+    ]
+    assert isinstance(records[1][1].disks[0], DeviceRate)
+
+
+def test_read_appended_and_truncated(tmp_path):
+    path = str(tmp_path / "metrics.jsonl.gz")
+    for start in (1.0, 100.0):
+        recorder = Recorder(path)
+        recorder.write("processes", ProcessSnapshot(start, (1,), ("a",), ("u",), ("a -x",), ("0",), (5,), (1.5,), (9,)))
+        recorder.close()
+    with gzip.open(path, "at") as f:
+        f.write('["processes", 200.0, [1')
+
+    records = list(read_recording(path))
+    assert [snapshot.time for _, snapshot in records] == [1.0, 100.0]
+    assert records[0][1].command == ("a -x",)
+
+
+def test_replay_follows_the_recording(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl.gz")
+    recorder = Recorder(path)
+    for i in range(4):
+        recorder.write("gpu", GpuSnapshot(1000.0 + i, (i,), (0,)))
+    recorder.write("host", host(1001.5, 50.0))
+    # Shortened to MAX_GAP
+    recorder.write("gpu", GpuSnapshot(5000.0, (9,), (0,)))
+    recorder.close()
+
+    now = [0.0]
+    monkeypatch.setattr(recording.time, "monotonic", lambda: now[0])
+    replay = Replay(path, speed=2, max_gap=10)
+    assert sorted(replay.samplers) == ["gpu", "host"]
+    assert replay.duration == 23
+
+    gpu, hosts = replay.collector("gpu"), replay.collector("host")
+    assert gpu().utilization == (0,)
+    assert hosts().cpu == 50.0
+    now[0] = 1.0
+    assert gpu().utilization == (2,)
+    assert gpu().time > 5000
+    now[0] = 6.5
+    assert gpu().utilization == (9,)
+    # Started over
+    now[0] = 11.5
+    assert gpu().utilization == (0,)
+
+
+def test_replay_install(tmp_path):
+    path = str(tmp_path / "metrics.jsonl.gz")
+    recorder = Recorder(path)
+    recorder.write("gpu", GpuSnapshot(1.0, (7,), (8,)))
+    recorder.close()
+    gpu = Sampler(lambda: None, 500, idle_interval=5000, name="gpu")
+    hosts = Sampler(lambda: "live", 200, name="host")
+
+    Replay(path, speed=10).install({"gpu": gpu, "host": hosts})
+    assert gpu.sample().utilization == (7,)
+    assert (gpu.interval, gpu.idle_interval) == (50, 500)
+    assert hosts.sample() == "live"
+    assert hosts.interval == 200
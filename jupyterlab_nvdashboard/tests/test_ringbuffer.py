@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from jupyterlab_nvdashboard.ringbuffer import DeviceHistory, RingBuffer
+
+
+def test_view_before_full():
+    buffer = RingBuffer(["time", "value"], capacity=4)
+    assert len(buffer) == 0
+    assert list(buffer.view()["time"]) == []
+
+    for i in range(3):
+        buffer.append((i, i * 10))
+    assert len(buffer) == 3
+    assert list(buffer.view()["time"]) == [0, 1, 2]
+    assert list(buffer.view()["value"]) == [0, 10, 20]
+
+
+def test_rollover_keeps_last_capacity_rows():
+    buffer = RingBuffer(["time"], capacity=4)
+    data = buffer._data
+    for i in range(11):
+        buffer.append((i,))
+
+    assert len(buffer) == 4
+    assert list(buffer.view()["time"]) == [7, 8, 9, 10]
+    # Storage is never reallocated
+    assert buffer._data is data
+
+
+def test_view_since():
+    buffer = RingBuffer(["time"], capacity=4)
+    for i in range(6):
+        buffer.append((i,))
+    assert list(buffer.view(since=4)["time"]) == [4, 5]
+    assert list(buffer.view(since=6)["time"]) == []
+    # Rows older than the capacity are gone
+    assert list(buffer.view(since=0)["time"]) == [2, 3, 4, 5]
+
+
+def test_view_is_read_only_and_not_copied():
+    buffer = RingBuffer(["time"], capacity=4)
+    for i in range(5):
+        buffer.append((i,))
+    view = buffer.view()["time"]
+
+    assert np.shares_memory(view, buffer._data)
+    with pytest.raises(ValueError):
+        view[0] = 1
+    # A view stays valid for another capacity appends
+    for i in range(4):
+        buffer.append((100 + i,))
+    assert list(view) == [1, 2, 3, 4]
+
+
+def test_extend_matches_append():
+    appended = RingBuffer(["a", "b"], capacity=4)
+    extended = RingBuffer(["a", "b"], capacity=4)
+    appended.append((0, 0))
+    extended.append((0, 0))
+    rows = np.array([(i, -i) for i in range(1, 7)])
+    for row in rows:
+        appended.append(row)
+    extended.extend(rows)
+
+    assert extended.count == appended.count
+    for column in ("a", "b"):
+        assert list(extended.view()[column]) == list(appended.view()[column])
+
+
+def test_device_history_ranks_and_widens():
+    devices = DeviceHistory(capacity=8, window=2)
+    devices.append(0, ["sda", "sdb", "sdc"], np.array([0.0, 5.0, 1.0]))
+    devices.append(1, ["sda", "sdb", "sdc"], np.array([0.0, 5.0, 3.0]))
+    # Idle devices are left out of the ranking
+    assert devices.ranking == ["sdb", "sdc"]
+
+    buffer = devices.buffer
+    devices.append(2, ["sdb", "sdc", "sdd"], np.array([1.0, 2.0, 9.0]))
+    assert devices.buffer is not buffer
+    assert devices.devices == ["sda", "sdb", "sdc", "sdd"]
+    data = devices.buffer.view()
+    assert list(data["time"]) == [0, 1, 2]
+    assert list(data["sdb"]) == [5, 5, 1]
+    assert np.isnan(data["sdd"][:2]).all() and np.isnan(data["sda"][2])
+
+    devices.append(3, ["sdb", "sdc", "sdd"], np.array([1.0, 2.0, 9.0]))
+    assert devices.ranking == ["sdd", "sdc", "sdb"]
@@ -0,0 +1,162 @@
+import json
+import subprocess
+from unittest.mock import MagicMock
+
+import pytest
+
+from jupyterlab_nvdashboard.rocm import (
+    AmdGpuProperties,
+    GpuProcess,
+    GpuRecord,
+    parse_metrics,
+    parse_pids,
+)
+
+
+JSON_OUTPUT = json.dumps(
+    {
+        "card0": {
+            "GPU use (%)": "12",
+            "VRAM Total Memory (B)": "17163091968",
+            "VRAM Total Used Memory (B)": "8581545984",
+            "sclk clock speed:": "(925Mhz)",
+            "sclk clock level:": "0",
+            "Temperature (Sensor edge) (C)": "20.0",
+            "Average Graphics Package Power (W)": "14.0",
+            "Voltage (mV)": "737",
+            "Estimated maximum PCIe bandwidth over the last second (MB/s)": "0.071",
+        },
+        "card1": {
+            "GPU use (%)": "100",
+            "VRAM Total Memory (B)": "17163091968",
+            "VRAM Total Used Memory (B)": "0",
+            "sclk clock speed:": "(1930Mhz)",
+            "sclk clock level:": "1",
+            "Temperature (Sensor edge) (C)": "22.0",
+            "Average Graphics Package Power (W)": "19.0",
+            "Voltage (mV)": "800",
+            "Estimated maximum PCIe bandwidth over the last second (MB/s)": "1501.002",
+        },
+        "system": {"Driver version": "5.11.0"},
+    }
+)
+
+TEXT_OUTPUT = """
+======================= ROCm System Management Interface =======================
+============================== % time GPU is busy ==============================
+GPU[0]\t\t: GPU use (%): 12
+GPU[1]\t\t: GPU use (%): 100
+========================== Current clock frequencies ===========================
+GPU[0]\t\t: sclk clock level: 0 (925Mhz)
+GPU[1]\t\t: sclk clock level: 1 (1930Mhz)
+=============================== Current voltage ================================
+GPU[0]\t\t: Voltage (mV): 737
+GPU[1]\t\t: Voltage (mV): 800
+================================================================================
+============================= End of ROCm SMI Log ==============================
+"""
+
+ALL_METRICS = ("utilization", "memory", "clock", "temperature", "power", "voltage", "pcie")
+
+
+def test_parse_json():
+    records = parse_metrics(b"WARNING: noise\n" + JSON_OUTPUT.encode(), ALL_METRICS)
+    assert records == [
+        GpuRecord(0, 12, 50, 925, 20.0, 14.0, 737, 0.071),
+        GpuRecord(1, 100, 0, 1930, 22.0, 19.0, 800, 1501.002),
+    ]
+
+
+def test_parse_only_requested_metrics():
+    records = parse_metrics(JSON_OUTPUT.encode(), ("utilization",))
+    assert records == [GpuRecord(0, utilization=12), GpuRecord(1, utilization=100)]
+
+
+def test_parse_text_sections():
+    records = parse_metrics(TEXT_OUTPUT.encode(), ("utilization", "clock", "voltage"))
+    assert records == [
+        GpuRecord(0, utilization=12, clock=925, voltage=737),
+        GpuRecord(1, utilization=100, clock=1930, voltage=800),
+    ]
+
+
+@pytest.mark.parametrize("output", [b"", b"rocm-smi: command not found"])
+def test_parse_no_gpus(output):
+    assert parse_metrics(output, ALL_METRICS) == []
+
+
+def test_get_gpu_metrics_single_invocation():
+    bash = MagicMock()
+    bash.run.return_value.stdout = JSON_OUTPUT.encode()
+    amd = AmdGpuProperties(bash=bash)
+    bash.run.reset_mock()
+
+    records = amd.get_gpu_metrics(("utilization", "memory", "voltage"))
+    assert [r.memory for r in records] == [50, 0]
+    bash.run.assert_called_once()
+    assert bash.run.call_args.args[0] == [
+        "rocm-smi", "--showuse", "--showmeminfo", "vram", "--showvoltage", "--json"
+    ]
+
+
+def test_rocm_smi_timeout():
+    bash = MagicMock()
+    bash.run.side_effect = subprocess.TimeoutExpired("rocm-smi", 1)
+    amd = AmdGpuProperties(bash=bash, timeout=1)
+
+    assert amd.get_gpu_metrics() == []
+    assert bash.run.call_args.kwargs["timeout"] == 1
+
+
+def test_rocm_smi_missing(caplog):
+    bash = MagicMock()
+    bash.run.side_effect = FileNotFoundError("rocm-smi")
+    amd = AmdGpuProperties(bash=bash)
+
+    assert amd.gpus == -1
+    assert amd.get_gpu_metrics() == []
+    assert amd.get_gpu_processes() == {}
+    # Reported once, not on every sample
+    assert [r.levelname for r in caplog.records] == ["ERROR"]
+
+
+def test_gpu_count_is_discovered_lazily():
+    bash = MagicMock()
+    bash.run.return_value.stdout = b"rocm-smi: command not found"
+    amd = AmdGpuProperties(bash=bash)
+    bash.run.assert_not_called()
+
+    assert amd.gpus == -1
+    assert amd.gpus == -1
+    bash.run.assert_called_once()
+
+
+PIDS_OUTPUT = b"""
+======================= ROCm System Management Interface =======================
+================================ KFD Processes =================================
+KFD process information:
+PID\tPROCESS NAME\tGPU(s)\tVRAM USED\tSDMA USED\tCU OCCUPANCY
+3212\tpython3\t2\t2147483648\t0\tUNKNOWN
+4410\tresnet\t1\t1048576\t0\tUNKNOWN
+================================================================================
+============================= GPUs Indexed by PID ==============================
+PID 3212 is using 2 DRM device(s):
+0 3
+PID 4410 is using 1 DRM device(s):
+1
+================================================================================
+============================= End of ROCm SMI Log ==============================
+"""
+
+
+def test_get_gpu_processes():
+    bash = MagicMock()
+    bash.run.return_value.stdout = PIDS_OUTPUT
+    amd = AmdGpuProperties(bash=bash)
+
+    assert amd.get_gpu_processes() == {
+        3212: GpuProcess(3212, (0, 3), 2147483648),
+        4410: GpuProcess(4410, (1,), 1048576),
+    }
+    assert bash.run.call_args.args[0] == ["rocm-smi", "--showpids", "--showpidgpus"]
+    assert parse_pids(b"No KFD PIDs currently running") == {}
@@ -0,0 +1,119 @@
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+import rocm_outputs
+from jupyterlab_nvdashboard import rocm_parser
+from jupyterlab_nvdashboard.rocm import AmdGpuProperties
+
+
+def properties(output):
+    bash = MagicMock()
+    bash.run.return_value.stdout = output
+    amd = AmdGpuProperties(bash=bash)
+    # No GPUs are known when rocm-smi is missing
+    amd.gpus = 0
+    return amd
+
+
+@pytest.mark.parametrize("output,expected", rocm_outputs.GPU_COUNT)
+def test_get_gpu_count(output, expected):
+    assert properties(output).get_gpu_count() == expected
+
+
+@pytest.mark.parametrize(
+    "getter,cases",
+    [
+        ("get_gpu_utilization", rocm_outputs.GPU_UTILIZATION),
+        ("get_gpu_clock_freq", rocm_outputs.GPU_CLOCK_FREQ),
+        ("get_gpu_vram_use", rocm_outputs.GPU_VRAM_USE),
+        ("get_gpu_pcie_bandwith", rocm_outputs.GPU_PCIE_BANDWITH),
+        ("get_gpu_voltage", rocm_outputs.GPU_VOLTAGE),
+    ],
+)
+def test_getters(getter, cases):
+    for output, expected_sum, expected_len in cases:
+        values = getattr(properties(output), getter)()
+        assert len(values) == expected_len
+        assert sum(values) == pytest.approx(expected_sum)
+
+
+def test_parse_concise_table():
+    output = rocm_parser.parse(rocm_outputs.GPU_VRAM_USE[0][0])
+    assert output.valid
+    assert len(output.concise) == 8
+    assert output.concise[0]["GPU"] == "0"
+    assert output.concise[0]["SCLK"] == "925Mhz"
+    assert output.column("VRAM%")[:2] == ["100%", "0%"]
+    assert output.sections == {}
+
+
+def test_parse_concise_table_with_units():
+    output = rocm_parser.parse(
+        b"========================= ROCm System Management Interface =========================\n"
+        b"=================================== Concise Info ===================================\n"
+        b"Device  Node  IDs              Temp    Power   Partitions          SCLK    MCLK    Fan  Perf  PwrCap  VRAM%  GPU%\n"
+        b"              (DID,     GUID)  (Edge)  (Avg)   (Mem, Compute, ID)\n"
+        b"====================================================================================\n"
+        b"0       1     0x74a1,   51216  35.0\xc2\xb0C  136.0W  NPS1, SPX, 0        132Mhz  900Mhz  0%   auto  750.0W  3%     7%\n"
+        b"====================================================================================\n"
+    )
+    # The unit line and the separator do not end the table
+    assert output.column("VRAM%") == ["3%"]
+    assert output.column("GPU%") == ["7%"]
+
+
+def test_parse_sections():
+    output = rocm_parser.parse(rocm_outputs.GPU_CLOCK_FREQ[1][0])
+    assert output.sections[2] == {"sclk clock level": "1 (1930Mhz)"}
+    assert [rocm_parser.to_mhz(v) for v in output.label("sclk")] == [
+        925, 930, 1930, 930, 930, 0, 930, 10930
+    ]
+    assert output.concise == []
+
+
+def test_fuzz_never_raises():
+    rng = random.Random(0)
+    samples = [case[0] for cases in (
+        rocm_outputs.GPU_COUNT,
+        rocm_outputs.GPU_UTILIZATION,
+        rocm_outputs.GPU_CLOCK_FREQ,
+        rocm_outputs.GPU_VRAM_USE,
+        rocm_outputs.GPU_PCIE_BANDWITH,
+        rocm_outputs.GPU_VOLTAGE,
+    ) for case in cases]
+    alphabet = b"GPU[]0123456789:%=() \t\nMhzVRAM\xb0\xff"
+    for _ in range(500):
+        sample = bytearray(rng.choice(samples))
+        for _ in range(rng.randint(1, 20)):
+            i = rng.randrange(len(sample) + 1)
+            action = rng.random()
+            if action < 0.4:
+                sample[i:i] = bytes(rng.choice(alphabet) for _ in range(rng.randint(1, 8)))
+            elif action < 0.8:
+                del sample[i:i + rng.randint(1, 8)]
+            else:
+                sample = sample[:i]
+        output = rocm_parser.parse(bytes(sample))
+        for label in ("GPU use", "sclk", "Voltage", "PCIe"):
+            for value in output.label(label):
+                rocm_parser.to_int(value)
+                rocm_parser.to_mhz(value)
+                rocm_parser.to_float(value)
+        for value in output.column("VRAM%"):
+            rocm_parser.to_int(value)
+
+
+def test_fuzz_generated_tables():
+    rng = random.Random(1)
+    for _ in range(100):
+        rows = [(rng.randint(0, 100), rng.randint(0, 100)) for _ in range(rng.randint(1, 16))]
+        output = b"=== ROCm System Management Interface ===\n=== Concise Info ===\n"
+        output += b"GPU  Temp   AvgPwr  SCLK    MCLK    Fan   Perf  PwrCap  VRAM%  GPU%\n"
+        for i, (vram, util) in enumerate(rows):
+            output += b"%d    20.0c  14.0W   925Mhz  350Mhz  0.0%%  auto  225.0W  %d%%  %d%%\n" % (i, vram, util)
+        output += b"================\n"
+        parsed = rocm_parser.parse(output)
+        assert [rocm_parser.to_int(v) for v in parsed.column("VRAM%")] == [r[0] for r in rows]
+        assert [rocm_parser.to_int(v) for v in parsed.column("GPU%")] == [r[1] for r in rows]
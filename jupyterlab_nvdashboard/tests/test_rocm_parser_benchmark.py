@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import rocm_outputs
+from jupyterlab_nvdashboard import rocm_parser
+from jupyterlab_nvdashboard.rocm import AmdGpuProperties
+
+pytest.importorskip("pytest_benchmark")
+
+
+OUTPUTS = {
+    "concise": rocm_outputs.GPU_VRAM_USE[0][0],
+    "utilization": rocm_outputs.GPU_UTILIZATION[2][0],
+    "clock": rocm_outputs.GPU_CLOCK_FREQ[1][0],
+    "pcie": rocm_outputs.GPU_PCIE_BANDWITH[1][0],
+    "voltage": rocm_outputs.GPU_VOLTAGE[1][0],
+}
+
+
+@pytest.mark.parametrize("name", sorted(OUTPUTS))
+def test_bench_parse(benchmark, name):
+    output = benchmark(rocm_parser.parse, OUTPUTS[name])
+    assert output.valid
+
+
+@pytest.mark.parametrize(
+    "getter,name",
+    [
+        ("get_gpu_count", "concise"),
+        ("get_gpu_vram_use", "concise"),
+        ("get_gpu_utilization", "utilization"),
+        ("get_gpu_clock_freq", "clock"),
+        ("get_gpu_pcie_bandwith", "pcie"),
+        ("get_gpu_voltage", "voltage"),
+    ],
+)
+def test_bench_getter(benchmark, getter, name):
+    bash = MagicMock()
+    bash.run.return_value.stdout = OUTPUTS[name]
+    amd = AmdGpuProperties(bash=bash)
+    amd.gpus = 8
+    assert benchmark(getattr(amd, getter))
+
+
+def test_bench_parse_large_host(benchmark):
+    # A 64 GPU host exercises the per-line cost rather than the fixed overhead
+    output = b"\n".join(
+        [b"=== ROCm System Management Interface ===", b"=== % time GPU is busy ==="]
+        + [b"GPU[%d]\t\t: GPU use (%%): %d" % (i, i % 100) for i in range(64)]
+        + [b"=== End of ROCm SMI Log ==="]
+    )
+    output = benchmark(rocm_parser.parse, output)
+    assert len(output.label("GPU use")) == 64
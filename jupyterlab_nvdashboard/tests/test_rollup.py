@@ -0,0 +1,66 @@
+import numpy as np
+
+from jupyterlab_nvdashboard.ringbuffer import RingBuffer
+from jupyterlab_nvdashboard.rollup import Rollup, Tier, lttb
+
+
+def test_tier_aggregates_buckets():
+    tier = Tier(["value"], resolution=1000, capacity=10)
+    for time, value in [(0, 1.0), (500, 3.0), (1000, 10.0), (2500, 7.0)]:
+        tier.add(time, np.array([value]))
+
+    data = tier.buffer.view()
+    assert list(data["time"]) == [500, 1500]
+    assert list(data["value"]) == [2.0, 10.0]
+    assert list(data["value-min"]) == [1.0, 10.0]
+    assert list(data["value-max"]) == [3.0, 10.0]
+
+
+def test_tier_load_matches_incremental():
+    times = np.arange(0, 30000, 500.0)
+    values = np.column_stack([np.sin(times), np.cos(times)])
+    incremental = Tier(["a", "b"], 10000, 10)
+    for t, v in zip(times, values):
+        incremental.add(t, v)
+    loaded = Tier(["a", "b"], 10000, 10)
+    loaded.load(times, values)
+
+    # Both keep the last bucket open
+    incremental.add(30000, values[0])
+    loaded.add(30000, values[0])
+    for column, expected in incremental.buffer.view().items():
+        np.testing.assert_allclose(loaded.buffer.view()[column], expected)
+
+
+def test_select_picks_tier_for_range():
+    columns = ["time", "value"]
+    raw = RingBuffer(columns, capacity=100)
+    rollup = Rollup(columns, tiers=((1000, 1000), (10000, 1000)))
+    for t in np.arange(0, 600000, 500.0):
+        row = (t, t % 7)
+        raw.append(row)
+        rollup.append(row)
+
+    resolution, data = rollup.select(raw, 590000, 599500, max_points=100)
+    assert resolution == 0
+    assert data["time"][-1] == 599500
+
+    resolution, data = rollup.select(raw, 0, 600000, max_points=100)
+    assert resolution == 10000
+    assert len(data["time"]) <= 100
+
+    resolution, data = rollup.select(raw, 0, 600000, max_points=20)
+    assert resolution == 10000
+    assert len(data["time"]) == 20
+
+
+def test_lttb_keeps_peaks():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[437] = 100
+
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert list(lttb(x[:10], y[:10], 50)) == list(range(10))
@@ -0,0 +1,197 @@
+import asyncio
+from collections import namedtuple
+import threading
+from unittest.mock import MagicMock, patch
+
+from jupyterlab_nvdashboard import sampler as sampler_module
+from jupyterlab_nvdashboard.rocm import GpuRecord
+from jupyterlab_nvdashboard.sampler import (
+    GPU_FIELDS,
+    DeviceRate,
+    GpuSnapshot,
+    HostCollector,
+    PcieSnapshot,
+    Sampler,
+    collect_gpu,
+    collect_pcie,
+    set_session_active,
+)
+
+
+def test_collect_gpu():
+    provider = MagicMock()
+    provider.get_gpu_metrics.return_value = [
+        GpuRecord(0, utilization=10, memory=None, clock=800),
+        GpuRecord(1, utilization=20, memory=30, clock=None),
+    ]
+
+    snapshot = collect_gpu(provider)
+    assert snapshot.utilization == (10, 20)
+    assert snapshot.memory == (-1, 30)
+    assert snapshot.clock == (800, -1)
+    assert snapshot.ngpus == 2
+    # Every field comes from a single query
+    provider.get_gpu_metrics.assert_called_once_with(GPU_FIELDS)
+    assert snapshot.voltage == (-1, -1)
+    # The PCIe bandwidth is not read yet
+    assert snapshot.pcie == (-1, -1)
+
+
+def test_collect_pcie():
+    provider = MagicMock()
+    provider.get_gpu_metrics.return_value = [GpuRecord(0, pcie=512.5), GpuRecord(1)]
+
+    pcie = collect_pcie(provider)
+    assert pcie.pcie == (512.5, -1)
+    provider.get_gpu_metrics.assert_called_once_with(("pcie",))
+
+    # Every tick reuses the last reading, which may miss GPUs discovered since
+    provider.get_gpu_metrics.return_value = [GpuRecord(i, utilization=i) for i in range(3)]
+    assert collect_gpu(provider, pcie).pcie == (512.5, -1, -1)
+    assert collect_gpu(provider, PcieSnapshot(0.0, (1.0,) * 4)).pcie == (1.0, 1.0, 1.0)
+
+
+def test_sampler_keeps_last_snapshot_on_failure():
+    snapshot = GpuSnapshot(0.0, (1,), (2,))
+    collect = MagicMock(side_effect=[snapshot, RuntimeError("rocm-smi died")])
+    sampler = Sampler(collect)
+
+    assert sampler.sample() is snapshot
+    assert sampler.sample() is snapshot
+    assert collect.call_count == 2
+
+
+def test_sampler_is_shared_between_sessions():
+    collect = MagicMock(side_effect=lambda: GpuSnapshot(0.0, (), ()))
+    sampler = Sampler(collect, interval=10)
+
+    async def run():
+        # Every session subscribes; only the first one begins polling
+        for session in range(20):
+            sampler.subscribe(session)
+        await asyncio.sleep(0.055)
+        sampler.stop()
+
+    asyncio.run(run())
+    assert not sampler.running
+    assert 3 <= collect.call_count <= 8
+
+
+def test_sampler_skips_ticks_while_collecting():
+    started = threading.Event()
+    release = threading.Event()
+
+    def collect():
+        started.set()
+        release.wait(5)
+        return GpuSnapshot(0.0, (), ())
+
+    collect = MagicMock(side_effect=collect)
+    sampler = Sampler(collect)
+
+    async def run():
+        first = asyncio.ensure_future(sampler.sample_async())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        # The IOLoop stays responsive and later ticks do not pile up
+        for _ in range(5):
+            assert await sampler.sample_async() is None
+        release.set()
+        return await first
+
+    snapshot = asyncio.run(run())
+    assert snapshot == GpuSnapshot(0.0, (), ())
+    assert collect.call_count == 1
+
+
+def test_sampler_notifies_listeners():
+    snapshot = GpuSnapshot(0.0, (1,), (2,))
+    sampler = Sampler(MagicMock(return_value=snapshot))
+    received = []
+    sampler.add_listener(MagicMock(side_effect=RuntimeError("broken listener")))
+    sampler.add_listener(received.append)
+
+    sampler.sample()
+    assert received == [snapshot]
+
+
+CpuTimes = namedtuple("scputimes", "user idle iowait guest guest_nice")
+
+
+def test_host_collector_rates():
+    disk = MagicMock(read_bytes=0, write_bytes=0)
+    net = MagicMock(bytes_recv=0, bytes_sent=0)
+    with patch("jupyterlab_nvdashboard.sampler.psutil") as psutil, patch(
+        "jupyterlab_nvdashboard.sampler.time.time", side_effect=[10.0, 12.0]
+    ):
+        # Partitions are already counted by their disk
+        psutil.disk_io_counters.return_value = {"sda": disk, "sda1": disk}
+        psutil.net_io_counters.return_value = {"eth0": net}
+        psutil.cpu_times.side_effect = [
+            [CpuTimes(0, 100, 0, 0, 0), CpuTimes(0, 100, 0, 0, 0)],
+            # Guest time is part of user time and only counted once
+            [CpuTimes(5, 195, 0, 2, 0), CpuTimes(15, 180, 5, 0, 0)],
+        ]
+        psutil.virtual_memory.return_value.used = 1024
+        collect = HostCollector(partitions={"sda1"})
+
+        first = collect()
+        disk.read_bytes, net.bytes_sent = 200, 50
+        second = collect()
+
+    assert first.disk_read == 0.0
+    assert second.disk_read == 100.0
+    assert second.net_sent == 25.0
+    assert second.cpu == 10.0
+    assert second.cpu_per_core == (5.0, 15.0)
+    assert second.memory == 1024
+    assert second.disks == (DeviceRate("sda", 100.0, 0.0),)
+    assert second.nics == (DeviceRate("eth0", 0.0, 25.0),)
+
+
+def test_sampler_backs_off_without_visible_sessions():
+    sampler = Sampler(MagicMock(return_value=GpuSnapshot(0.0, (), ())), 100, idle_interval=5000)
+
+    async def run():
+        sampler.subscribe("a")
+        assert sampler._callback.callback_time == 100
+        set_session_active("a", False)
+        assert sampler._callback.callback_time == 5000
+        set_session_active("a", True)
+        assert sampler._callback.callback_time == 100
+        sampler.unsubscribe("a")
+        assert sampler._callback.callback_time == 5000
+        # A session hidden before its document was created starts idle
+        set_session_active("b", False)
+        sampler.subscribe("b")
+        assert sampler._callback.callback_time == 5000
+        sampler.stop()
+
+    asyncio.run(run())
+
+
+def test_hidden_sessions_are_forgotten_unless_they_subscribe():
+    sampler = Sampler(MagicMock(return_value=GpuSnapshot(0.0, (), ())), 100, idle_interval=5000)
+
+    async def run():
+        with patch("jupyterlab_nvdashboard.sampler.time.monotonic", return_value=0.0):
+            set_session_active("subscribed", False)
+            sampler.subscribe("subscribed")
+            set_session_active("stray", False)
+        with patch("jupyterlab_nvdashboard.sampler.time.monotonic", return_value=61.0):
+            set_session_active("new", False)
+        assert set(sampler_module._hidden_sessions) == {"subscribed", "new"}
+
+        # Past the cap the oldest strays go first
+        with patch.object(sampler_module, "MAX_PENDING_HIDDEN", 2):
+            for key in ("x", "y", "z"):
+                set_session_active(key, False)
+        assert set(sampler_module._hidden_sessions) == {"subscribed", "y", "z"}
+
+        sampler.unsubscribe("subscribed")
+        for key in ("new", "x", "y", "z"):
+            set_session_active(key, True)
+        assert sampler_module._hidden_sessions == {}
+        sampler.stop()
+
+    with patch.dict(sampler_module._hidden_sessions, clear=True):
+        asyncio.run(run())
@@ -0,0 +1,45 @@
+import pytest
+
+from jupyterlab_nvdashboard import server
+
+
+def test_parse_args_defaults():
+    args = server.parse_args([])
+    assert args.port == server.DEFAULT_PORT
+    assert args.interval == []
+
+
+def test_parse_args_intervals():
+    args = server.parse_args(
+        ["9000", "--interval", "GPU-Resource-Timeline=2000", "--interval", "/GPU-Memory=750"]
+    )
+    assert args.port == 9000
+    assert dict(args.interval) == {"/GPU-Resource-Timeline": 2000, "/GPU-Memory": 750}
+
+
+@pytest.mark.parametrize("value", ["Nope=100", "GPU-Memory", "GPU-Memory=fast"])
+def test_parse_args_rejects_bad_interval(value):
+    with pytest.raises(SystemExit):
+        server.parse_args(["--interval", value])
+
+
+def test_parse_args_replay():
+    args = server.parse_args(["--replay", "incident.jsonl.gz", "--replay-speed", "10"])
+    assert (args.replay, args.replay_speed) == ("incident.jsonl.gz", 10)
+    with pytest.raises(SystemExit):
+        server.parse_args(["--replay", "incident.jsonl.gz", "--replay-speed", "0"])
+
+
+def test_parse_args_alerts(tmp_path):
+    rules = tmp_path / "rules.json"
+    rules.write_text('[{"name": "hot", "when": ["temperature > 85"], "for": 10}]')
+    args = server.parse_args(["--alerts", str(rules), "--alert-webhook", "http://localhost:9/hook"])
+    assert [rule.name for rule in args.alerts] == ["hot"]
+    assert args.alert_webhook == ["http://localhost:9/hook"]
+    rules.write_text('[{"name": "hot", "when": ["temperature is high"]}]')
+    with pytest.raises(SystemExit):
+        server.parse_args(["--alerts", str(rules)])
+    # Would never fire
+    rules.write_text('[{"name": "hot", "when": ["temp >= 85"]}]')
+    with pytest.raises(SystemExit):
+        server.parse_args(["--alerts", str(rules)])
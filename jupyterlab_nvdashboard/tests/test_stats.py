@@ -0,0 +1,71 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from jupyterlab_nvdashboard import stats
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    stats.timings.clear()
+    stats.websocket_bytes.clear()
+
+
+def test_histogram_quantiles():
+    histogram = stats.Histogram()
+    for _ in range(98):
+        histogram.observe(0.00015)
+    histogram.observe(0.5)
+    histogram.observe(20.0)
+
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["max"] == 20.0
+    # Quantiles are bucket bounds
+    assert 0.00015 <= summary["p50"] < 0.0003
+    assert 0.5 <= summary["p99"] < 1.0
+    assert stats.Histogram().summary()["p99"] == 0.0
+
+
+def test_timer_and_timed():
+    with stats.timer("sleep"):
+        time.sleep(0.01)
+
+    def fail():
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        stats.timed("fail", fail)()
+    assert stats.timed("double", lambda x: 2 * x)(3) == 6
+
+    report = stats.report()["timings"]
+    assert report["sleep"]["count"] == 1 and report["sleep"]["max"] >= 0.01
+    assert report["fail"]["count"] == 1
+    assert report["double"]["count"] == 1
+
+
+def test_report_sessions_and_bytes():
+    stats.websocket_bytes["/GPU-Utilization"] += 100
+    server = SimpleNamespace(
+        _tornado=SimpleNamespace(app_paths=["/GPU-Utilization", "/GPU-Memory"]),
+        get_sessions=lambda path: ["a", "b"] if path == "/GPU-Memory" else [],
+    )
+    report = stats.report(server)
+    assert report["sessions"] == {"/GPU-Utilization": 0, "/GPU-Memory": 2}
+    assert report["websocket_bytes"] == {"/GPU-Utilization": 100}
+
+
+def test_watch_ioloop_records_lag():
+    async def run():
+        stats.watch_ioloop(0.01)
+        await asyncio.sleep(0.05)
+        # Block the loop so the next tick runs late
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    lag = stats.timings["ioloop.lag"]
+    assert lag.count >= 3
+    assert lag.max >= 0.03
@@ -0,0 +1,125 @@
+import os
+import time
+
+import pytest
+
+from jupyterlab_nvdashboard.rocm import GpuProcess, GpuRecord
+from jupyterlab_nvdashboard.sysfs import SysfsGpuProperties
+
+
+def make_card(root, n, vendor="0x1002", busy=0, used=0, sclk=1, hwmon=True):
+    device = root / "card{}".format(n) / "device"
+    device.mkdir(parents=True)
+    files = {
+        "vendor": vendor,
+        "gpu_busy_percent": busy,
+        "mem_info_vram_total": 1000,
+        "mem_info_vram_used": used,
+        "pp_dpm_sclk": "".join(
+            "{}: {}Mhz{}\n".format(i, mhz, " *" if i == sclk else "")
+            for i, mhz in enumerate((500, 925, 1500))
+        ),
+        "pcie_bw": "1024 1024 256",
+    }
+    for name, value in files.items():
+        (device / name).write_text("{}\n".format(value))
+    if hwmon:
+        sensors = device / "hwmon" / "hwmon3"
+        sensors.mkdir(parents=True)
+        (sensors / "in0_input").write_text("737\n")
+        (sensors / "power1_average").write_text("14000000\n")
+        (sensors / "temp1_input").write_text("20500\n")
+    return device
+
+
+@pytest.fixture
+def drm(tmp_path):
+    make_card(tmp_path, 1, busy=50, used=250, sclk=2, hwmon=False)
+    make_card(tmp_path, 0, busy=10, used=500)
+    # Connectors and other vendors' cards are ignored
+    (tmp_path / "card0-DP-1").mkdir()
+    make_card(tmp_path, 2, vendor="0x10de")
+    return tmp_path
+
+
+def test_available(drm, tmp_path_factory):
+    assert SysfsGpuProperties.available(str(drm))
+    assert not SysfsGpuProperties.available(str(tmp_path_factory.mktemp("empty")))
+
+
+def test_get_gpu_metrics(drm):
+    amd = SysfsGpuProperties(str(drm))
+    metrics = ("utilization", "memory", "clock", "temperature", "power", "voltage", "pcie")
+    assert amd.gpus == 2
+    assert amd.get_gpu_metrics(metrics) == [
+        GpuRecord(0, 10, 50, 925, 20.5, 14.0, 737, 0.5),
+        GpuRecord(1, 50, 25, 1500, None, None, None, 0.5),
+    ]
+    assert amd.get_gpu_voltage() == [737, -1]
+    amd.close()
+
+
+def test_rereads_open_files(drm):
+    amd = SysfsGpuProperties(str(drm))
+    assert amd.get_gpu_utilization() == [10, 50]
+    fds = len(os.listdir("/proc/self/fd"))
+
+    (drm / "card0" / "device" / "gpu_busy_percent").write_text("99\n")
+    assert amd.get_gpu_utilization() == [99, 50]
+    # Values are re-read through the descriptors opened on the first sample
+    assert len(os.listdir("/proc/self/fd")) == fds
+    amd.close()
+
+
+def make_process(proc, pid, fds):
+    """Fake ``/proc/<pid>`` with ``{fd: (link target, fdinfo text)}``."""
+    (proc / str(pid) / "fd").mkdir(parents=True)
+    (proc / str(pid) / "fdinfo").mkdir()
+    for fd, (target, fdinfo) in fds.items():
+        os.symlink(target, str(proc / str(pid) / "fd" / str(fd)))
+        (proc / str(pid) / "fdinfo" / str(fd)).write_text(fdinfo)
+
+
+def drm_client(client, pdev, vram):
+    return (
+        "pos:\t0\ndrm-driver:\tamdgpu\ndrm-pdev:\t{}\n"
+        "drm-client-id:\t{}\ndrm-memory-vram:\t{} KiB\n"
+    ).format(pdev, client, vram)
+
+
+def test_get_gpu_processes(tmp_path, monkeypatch):
+    drm, proc = tmp_path / "drm", tmp_path / "proc"
+    (tmp_path / "pci").mkdir()
+    for n, slot in enumerate(("0000:03:00.0", "0000:83:00.0")):
+        # card*/device links to the PCI device named in drm-pdev
+        device = make_card(drm, n)
+        os.rename(str(device), str(tmp_path / "pci" / slot))
+        os.symlink(str(tmp_path / "pci" / slot), str(device))
+    render = "/dev/dri/renderD128"
+    make_process(
+        proc,
+        10,
+        {
+            3: (render, drm_client(1, "0000:03:00.0", 1024)),
+            # The same client through a duplicated descriptor is counted once
+            4: (render, drm_client(1, "0000:03:00.0", 1024)),
+            5: (render, drm_client(2, "0000:83:00.0", 2048)),
+            6: ("/tmp/log", ""),
+        },
+    )
+    make_process(proc, 11, {0: ("/dev/null", "")})
+    (proc / "self").mkdir()
+
+    amd = SysfsGpuProperties(str(drm), str(proc))
+    assert amd.get_gpu_processes() == {10: GpuProcess(10, (0, 1), 3072 * 1024)}
+
+    # Processes without GPU clients are not walked again until they are due
+    make_process(proc, 12, {3: (render, drm_client(3, "0000:83:00.0", 1))})
+    os.remove(str(proc / "11" / "fd" / "0"))
+    os.symlink(render, str(proc / "11" / "fd" / "0"))
+    (proc / "11" / "fdinfo" / "0").write_text(drm_client(4, "0000:03:00.0", 1))
+    assert sorted(amd.get_gpu_processes()) == [10, 12]
+    later = time.monotonic() + 2 * amd.fdinfo_interval
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert sorted(amd.get_gpu_processes()) == [10, 11, 12]
+    amd.close()
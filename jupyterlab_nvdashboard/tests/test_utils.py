@@ -5,3 +5,99 @@ def test_format_bytes():
     from jupyterlab_nvdashboard.utils import format_bytes
 
     assert format_bytes(1e13) == "10.00 TB"
+
+
+class FakeSource:
+    def __init__(self, data):
+        self.data = data
+        self.patches = []
+
+    def patch(self, patches):
+        self.patches.append(patches)
+        for column, changes in patches.items():
+            for i, value in changes:
+                self.data[column][i] = value
+
+
+def test_patch_changed():
+    from jupyterlab_nvdashboard.utils import patch_changed
+
+    source = FakeSource({"gpu": [10, 20, 30]})
+    assert patch_changed(source, "gpu", [10, 20, 30], deadband=1)
+    assert patch_changed(source, "gpu", [11, 20, 30], deadband=1)
+    assert source.patches == []
+
+    assert patch_changed(source, "gpu", [10, 25, 30], deadband=1)
+    assert source.patches == [{"gpu": [(1, 25)]}]
+    assert source.data["gpu"] == [10, 25, 30]
+
+    # Different lengths are left to the caller
+    assert not patch_changed(source, "gpu", [1, 2, 3, 4])
+    assert source.data["gpu"] == [10, 25, 30]
+
+
+def test_prebuilt_hands_out_spare_layouts():
+    import asyncio
+
+    from bokeh.models import Range1d
+
+    from jupyterlab_nvdashboard.utils import Prebuilt
+
+    built = []
+
+    def build():
+        built.append(Range1d())
+        return (built[-1],)
+
+    async def run():
+        prebuilt = Prebuilt(build)
+        first = prebuilt.take()
+        await asyncio.sleep(0)
+        # The next layout was built after the first one was handed out
+        assert len(built) == 2
+        second = prebuilt.take()
+        assert second[0] is built[1] and first[0] is built[0]
+        prebuilt.invalidate()
+        await asyncio.sleep(0)
+        assert prebuilt.take()[0] is built[2]
+
+    asyncio.run(run())
+
+
+def test_timeline_stream_swaps_in_rollups_when_zoomed_out():
+    from bokeh.models import ColumnDataSource, DataRange1d
+
+    from jupyterlab_nvdashboard.ringbuffer import RingBuffer
+    from jupyterlab_nvdashboard.rollup import Rollup
+    from jupyterlab_nvdashboard.utils import TimelineStream
+
+    buffer = RingBuffer(["time", "value"], capacity=10)
+    rollup = Rollup(["time", "value"])
+
+    def append(i):
+        buffer.append((i * 1000.0, i))
+        rollup.append((i * 1000.0, i))
+
+    for i in range(100):
+        append(i)
+    source = ColumnDataSource()
+    x_range = DataRange1d(follow="end", follow_interval=2000)
+    timeline = TimelineStream(source, x_range, rollover=10)
+
+    timeline.attach(buffer, rollup)
+    # The visible 2 s and the sample before them
+    assert list(source.data["time"]) == [96000, 97000, 98000, 99000]
+    append(100)
+    timeline.update()
+    assert list(source.data["time"])[-2:] == [99000, 100000]
+
+    # Wider than the raw samples reach: the 1 s tier instead
+    x_range.start, x_range.end = 0, 100000
+    timeline.update()
+    assert timeline.resolution == 1000
+    assert len(source.data["time"]) == 100
+    append(101)
+    timeline.update()
+    # As many rows as were selected are kept while streaming, not just 10
+    assert len(source.data["time"]) == 100
+    assert source.data["time"][-1] == 101000
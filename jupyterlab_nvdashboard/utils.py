@@ -1,3 +1,11 @@
+import time
+
+import numpy as np
+from tornado.ioloop import IOLoop
+
+from jupyterlab_nvdashboard.stats import timer
+
+
 def format_bytes(n):
     """Format bytes as text
 
@@ -15,3 +23,141 @@ def format_bytes(n):
     if n > 1e3:
         return "%0.2f kB" % (n / 1000)
     return "%d B" % n
+
+
+def patch_changed(source, column, values, deadband=0):
+    """Patch only the entries of ``column`` that moved by more than ``deadband``
+
+    Returns False without touching ``source`` when the number of values
+    changed, in which case the caller has to replace the columns.
+
+    """
+    old = source.data[column]
+    if len(old) != len(values):
+        return False
+    moved = np.abs(np.asarray(values, dtype=float) - np.asarray(old, dtype=float)) > deadband
+    patches = [(int(i), values[i]) for i in np.flatnonzero(moved)]
+    if patches:
+        with timer("patch"):
+            source.patch({column: patches})
+    return True
+
+
+def subscribe(doc, sampler):
+    """Subscribe the session of ``doc`` to ``sampler`` until it is destroyed
+
+    The Bokeh session id is the key the frontend uses to report the
+    dashboard panel as hidden or visible.
+
+    """
+    key = doc.session_context.id if doc.session_context is not None else id(doc)
+    sampler.subscribe(key)
+
+    def unsubscribe(session_context):
+        sampler.unsubscribe(key)
+
+    doc.on_session_destroyed(unsubscribe)
+
+
+class TimelineStream:
+    """Keep the ``source`` of a timeline in step with a history buffer
+
+    ``attach`` starts over from a buffer and its ``Rollup`` with the window
+    the following ``x_range`` shows, ending at the newest row. When the user
+    zooms or pans, ``update`` swaps in the columns ``Rollup.select`` picks
+    for the new range, at most once per call, then streams the rows
+    appended since the last call, keeping ``rollover`` rows or all of the
+    selected ones.
+
+    """
+
+    def __init__(self, source, x_range, rollover):
+        self.source = source
+        self.x_range = x_range
+        self.rollover = rollover
+        self.buffer = self.rollup = None
+        self.resolution = 0
+        self._rows = rollover
+        self._cursor = 0
+        # Visible x-range requested by the browser, and the one the data is for
+        self._requested = self._shown = None
+        x_range.on_change("start", self._on_range)
+        x_range.on_change("end", self._on_range)
+
+    def _on_range(self, attr, old, new):
+        self._requested = (self.x_range.start, self.x_range.end)
+
+    def _show(self, resolution, data, rows):
+        self.resolution = resolution
+        self.source.data = data
+        self._cursor = self.buffer.count
+        self._rows = rows
+
+    def attach(self, buffer, rollup):
+        self.buffer, self.rollup = buffer, rollup
+        times = buffer.view()["time"]
+        end = times[-1] if len(times) else time.time() * 1000
+        # The rollup has the rest for when the user zooms out
+        self._show(*rollup.select(buffer, end - self.x_range.follow_interval, end), self.rollover)
+
+    def update(self):
+        if self._requested != self._shown and None not in self._requested:
+            # Zooming and panning are handled once per tick, not per event
+            self._shown = self._requested
+            resolution, data = self.rollup.select(self.buffer, *self._shown)
+            if resolution or self.resolution:
+                self._show(resolution, data, max(self.rollover, len(data["time"])))
+        if self.buffer.count != self._cursor:
+            with timer("stream"):
+                self.source.stream(self.buffer.view(since=self._cursor), self._rows)
+            self._cursor = self.buffer.count
+
+
+class Prebuilt:
+    """Keep one layout built by ``build`` ready for the next session
+
+    Building the figures of a dashboard takes tens of milliseconds. ``take``
+    hands out the spare layout and builds the next one on the IOLoop once
+    the current page has been served. Every layout is used by one document
+    only, so sessions must reset the data of the sources they take. The
+    first item of a layout is its root model.
+
+    """
+
+    instances = []
+
+    def __init__(self, build):
+        self.build = build
+        self._spare = None
+        self._scheduled = False
+        Prebuilt.instances.append(self)
+
+    def take(self):
+        layout, self._spare = self._spare, None
+        if layout is None:
+            layout = self.build()
+        self.schedule()
+        return layout
+
+    def invalidate(self):
+        """Replace the spare layout, for example after more devices were found"""
+        self._spare = None
+        self.schedule()
+
+    def schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            IOLoop.current().add_callback(self._refill)
+
+    def _refill(self):
+        self._scheduled = False
+        if self._spare is None:
+            self._spare = self.build()
+            # Walking the models resolves their property defaults ahead of add_root
+            self._spare[0].references()
+
+
+def prebuild():
+    """Build a spare layout of every dashboard ahead of the first session"""
+    for prebuilt in Prebuilt.instances:
+        prebuilt.schedule()
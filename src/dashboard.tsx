@@ -1,10 +1,10 @@
 import { IFrame, MainAreaWidget } from '@jupyterlab/apputils';
 
-import { URLExt } from '@jupyterlab/coreutils';
+import { PathExt, URLExt } from '@jupyterlab/coreutils';
 
 import { ServerConnection } from '@jupyterlab/services';
 
-import { JSONExt, JSONObject } from '@lumino/coreutils';
+import { JSONExt, JSONObject, UUID } from '@lumino/coreutils';
 
 import { Message } from '@lumino/messaging';
 
@@ -13,6 +13,13 @@ import { Widget, PanelLayout } from '@lumino/widgets';
 import * as React from 'react';
 import * as ReactDOM from 'react-dom';
 
+import { requestAPI } from './handler';
+
+/**
+ * Milliseconds between kernel usage requests until the server sent its interval.
+ */
+const KERNEL_POLL_INTERVAL = 5000;
+
 /**
  * A class for hosting a Bokeh dashboard in an iframe.
  */
@@ -40,6 +47,8 @@ export class BokehDashboard extends MainAreaWidget<IFrame> {
       return;
     }
     this._item = value;
+    // A new Bokeh session is created for every item we show
+    this._sessionId = UUID.uuid4();
     this.update();
   }
 
@@ -56,14 +65,50 @@ export class BokehDashboard extends MainAreaWidget<IFrame> {
     }
     // Make sure the inactive panel is hidden
     this._inactivePanel.style.display = 'none';
-    this.content.url = URLExt.join(
-      ServerConnection.makeSettings({}).baseUrl,
-      '/nvdashboard',
-      this.item.route
-    );
+    this.content.url =
+      URLExt.join(
+        ServerConnection.makeSettings({}).baseUrl,
+        '/nvdashboard',
+        this.item.route
+      ) + URLExt.objectToQueryString({ 'bokeh-session-id': this._sessionId });
+  }
+
+  /**
+   * Let the server sample at full speed again once the panel is shown.
+   */
+  protected onAfterShow(msg: Message): void {
+    super.onAfterShow(msg);
+    this._reportVisibility(true);
+  }
+
+  /**
+   * Let the server back off while the panel is hidden.
+   */
+  protected onAfterHide(msg: Message): void {
+    super.onAfterHide(msg);
+    this._reportVisibility(false);
+  }
+
+  private _reportVisibility(visible: boolean): void {
+    if (!this.item) {
+      return;
+    }
+    const settings = ServerConnection.makeSettings({});
+    ServerConnection.makeRequest(
+      URLExt.join(settings.baseUrl, '/nvdashboard/visibility'),
+      {
+        method: 'POST',
+        body: JSON.stringify({ session: this._sessionId, visible })
+      },
+      settings
+    ).catch(reason => {
+      // The server keeps sampling at full speed
+      console.warn('Could not report dashboard visibility', reason);
+    });
   }
 
   private _item: IDashboardItem | null = null;
+  private _sessionId = '';
   private _inactivePanel: HTMLElement;
 }
 
@@ -83,6 +128,12 @@ export class BokehDashboardLauncher extends Widget {
     header.addClass('bokeh-BokehDashboardLauncher-header');
     layout.addWidget(header);
     layout.addWidget(this._dashboard);
+    const kernelsHeader = new Widget();
+    kernelsHeader.node.textContent = 'Notebook Kernels';
+    kernelsHeader.addClass('bokeh-BokehDashboardLauncher-header');
+    this._kernels = new Widget();
+    layout.addWidget(kernelsHeader);
+    layout.addWidget(this._kernels);
     this.addClass('bokeh-BokehDashboardLauncher');
     this._launchItem = options.launchItem;
     this._connection = ServerConnection.makeSettings({});
@@ -121,16 +172,71 @@ export class BokehDashboardLauncher extends Widget {
       <DashboardListing launchItem={this._launchItem} items={this._items} />,
       this._dashboard.node
     );
+    ReactDOM.render(
+      <KernelUsageListing kernels={this._kernelUsage} />,
+      this._kernels.node
+    );
   }
 
   /**
-   * Rerender after showing.
+   * Rerender and poll the kernel usage while showing.
    */
   protected onAfterShow(msg: Message): void {
     this.update();
+    this._pollKernels();
+  }
+
+  /**
+   * Stop polling the kernel usage while hidden.
+   */
+  protected onAfterHide(msg: Message): void {
+    this._stopPolling();
+  }
+
+  /**
+   * Dispose of the resources held by the widget.
+   */
+  dispose(): void {
+    this._stopPolling();
+    super.dispose();
+  }
+
+  private _pollKernels(): void {
+    this._stopPolling();
+    requestAPI<IKernelUsageReply>('kernels')
+      .then(reply => {
+        this._kernelUsage = reply.kernels;
+        this._kernelInterval = reply.interval * 1000;
+      })
+      .catch(reason => {
+        // The server extension is not enabled, keep the dashboards working
+        console.warn('Could not get the kernel usage', reason);
+        this._kernelUsage = [];
+      })
+      .then(() => {
+        if (!this.isVisible || this.isDisposed) {
+          return;
+        }
+        this.update();
+        this._kernelTimer = window.setTimeout(
+          () => this._pollKernels(),
+          this._kernelInterval
+        );
+      });
+  }
+
+  private _stopPolling(): void {
+    if (this._kernelTimer !== -1) {
+      window.clearTimeout(this._kernelTimer);
+      this._kernelTimer = -1;
+    }
   }
 
   private _dashboard: Widget;
+  private _kernels: Widget;
+  private _kernelUsage: IKernelUsage[] = [];
+  private _kernelInterval = KERNEL_POLL_INTERVAL;
+  private _kernelTimer = -1;
   private _launchItem: (item: IDashboardItem) => void;
   private _items: IDashboardItem[] = [];
   private _connection: ServerConnection.ISettings;
@@ -189,6 +295,100 @@ function DashboardListing(props: IDashboardListingProps) {
   );
 }
 
+/**
+ * A React component for the resource usage of the running kernels,
+ * busiest first.
+ */
+function KernelUsageListing(props: IKernelUsageListingProps) {
+  if (!props.kernels.length) {
+    return <div className="nvdashboardKernels-empty">No running kernels</div>;
+  }
+  const rows = [...props.kernels]
+    .sort((a, b) => b.vram - a.vram || b.cpu - a.cpu)
+    .map(kernel => {
+      return (
+        <tr
+          key={kernel.id}
+          title={`${kernel.path || kernel.name}\nPIDs ${kernel.pids.join(', ')}`}
+        >
+          <td className="nvdashboardKernels-name">
+            {kernel.path ? PathExt.basename(kernel.path) : kernel.name}
+          </td>
+          <td>{kernel.cpu.toFixed(0)}%</td>
+          <td>{Private.formatBytes(kernel.rss)}</td>
+          <td>{kernel.gpus.length ? kernel.gpus.join(',') : '-'}</td>
+          <td>{kernel.vram >= 0 ? Private.formatBytes(kernel.vram) : '-'}</td>
+        </tr>
+      );
+    });
+
+  return (
+    <table className="nvdashboardKernels-table">
+      <thead>
+        <tr>
+          <th>Notebook</th>
+          <th>CPU</th>
+          <th>Memory</th>
+          <th>GPU</th>
+          <th>VRAM</th>
+        </tr>
+      </thead>
+      <tbody>{rows}</tbody>
+    </table>
+  );
+}
+
+/**
+ * Props for the kernel usage component.
+ */
+export interface IKernelUsageListingProps {
+  /**
+   * The usage of every running kernel.
+   */
+  kernels: IKernelUsage[];
+}
+
+/**
+ * The resource usage of a kernel and its child processes.
+ */
+export interface IKernelUsage {
+  id: string;
+  /**
+   * The kernel spec name.
+   */
+  name: string;
+  /**
+   * The notebook path, empty for kernels without a session.
+   */
+  path: string;
+  pid: number;
+  pids: number[];
+  /**
+   * CPU usage in % of one core.
+   */
+  cpu: number;
+  /**
+   * Resident memory in bytes.
+   */
+  rss: number;
+  gpus: number[];
+  /**
+   * GPU memory in bytes, -1 if unknown.
+   */
+  vram: number;
+}
+
+/**
+ * The reply of the kernel usage endpoint.
+ */
+interface IKernelUsageReply {
+  /**
+   * Seconds between two refreshes on the server.
+   */
+  interval: number;
+  kernels: IKernelUsage[];
+}
+
 /**
  * Props for the dashboard listing component.
  */
@@ -228,4 +428,14 @@ namespace Private {
     panel.className = 'bokeh-BokehDashboard-inactive';
     return panel;
   }
+
+  export function formatBytes(bytes: number): string {
+    const units = ['B', 'KiB', 'MiB', 'GiB', 'TiB'];
+    let unit = 0;
+    while (bytes >= 1024 && unit < units.length - 1) {
+      bytes /= 1024;
+      unit++;
+    }
+    return `${bytes.toFixed(unit ? 1 : 0)} ${units[unit]}`;
+  }
 }